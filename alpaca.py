@@ -4,10 +4,9 @@ from datetime import datetime
 
 import logging
 from ttf_logger import debug_logger
+from api_client import client
 
 import requests
-import pandas as pd
-from requests import HTTPError
 
 class Alpaca:
     
@@ -28,14 +27,33 @@ class Alpaca:
     watchlist_url = base_url + '/watchlists/' + str(watchlist_id)
     assets_url = base_url + '/assets/'
     positions_url = base_url + '/positions'
+    calendar_url = base_url + '/calendar'
     
     market_url = 'https://data.alpaca.markets/v1'
     quote_url = market_url + '/last_quote/stocks/'
     
 
+    @classmethod
+    def set_urls(cls, base_url, market_url):
+        """
+        Point the API calls to other hosts (e.g. a local fake server)
+        """
+
+        cls.base_url = base_url
+        cls.orders_url = base_url + '/orders'
+        cls.acct_url = base_url + '/account/'
+        cls.watchlist_url = base_url + '/watchlists/' + str(cls.watchlist_id)
+        cls.assets_url = base_url + '/assets/'
+        cls.positions_url = base_url + '/positions'
+        cls.calendar_url = base_url + '/calendar'
+
+        cls.market_url = market_url
+        cls.quote_url = market_url + '/last_quote/stocks/'
+
+
     def get_watchlist_symbols(self):
             
-        r = requests.get(self.watchlist_url,
+        r = client.get(self.watchlist_url,
                         headers=self.headers,
                         timeout=5)
         
@@ -48,9 +66,53 @@ class Alpaca:
         return watchlist_symbols
 
     
+    def get_tradable_symbols(self):
+        """
+        Return the symbols of all active and tradable US equities
+        """
+
+        params = {
+            'status': 'active',
+            'asset_class': 'us_equity',
+            }
+
+        r = client.get(self.assets_url.rstrip('/'),
+                        params=params,
+                        headers=self.headers,
+                        timeout=30)
+
+        debug_logger.debug("API called for assets")
+
+        assets = json.loads(r.content)
+
+        return {asset['symbol'] for asset in assets if asset['tradable']}
+
+
+    def get_calendar(self, start, end):
+        """
+        Return the market sessions between start and end dates:
+        [{'date': 'YYYY-MM-DD', 'open': 'HH:MM', 'close': 'HH:MM'}, ...]
+        """
+
+        params = {
+            'start': start.strftime('%Y-%m-%d'),
+            'end': end.strftime('%Y-%m-%d'),
+            }
+
+        r = client.get(self.calendar_url,
+                        params=params,
+                        headers=self.headers,
+                        timeout=5)
+        r.raise_for_status()
+        
+        debug_logger.debug("API called for calendar")
+
+        return json.loads(r.content)
+
+    
     def get_positions_symbols(self):
 
-        r = requests.get(self.positions_url,
+        r = client.get(self.positions_url,
                 headers=self.headers,
                 timeout=5)
         
@@ -65,6 +127,27 @@ class Alpaca:
 
     def place_order(self, symbol, side, qty, type='stop_limit', 
                     time_in_force='gtc', order_class='bracket'):
+        """
+        Check that the asset is tradable, price the bracket from the last
+        quote and submit the order. Return whether the order was placed
+        """
+
+        if not self.is_tradable(symbol):
+            return False
+
+        take_profit, stop_loss = self.take_and_stop(symbol)
+
+        return self.submit_order(symbol, side, qty, take_profit, stop_loss,
+                                 type, time_in_force, order_class)
+
+
+    def submit_order(self, symbol, side, qty, take_profit, stop_loss,
+                     type='stop_limit', time_in_force='gtc',
+                     order_class='bracket'):
+        """
+        Submit an order whose bracket prices are already known (see
+        take_and_stop()). Return whether the order was accepted
+        """
 
         params = {
             'symbol': symbol,
@@ -73,37 +156,42 @@ class Alpaca:
             'type': type,
             'time_in_force': time_in_force,
             'order_class': order_class,
-            'take_profit': self.take_and_stop(symbol)[0],
-            'stop_loss': self.take_and_stop(symbol)[1]
+            'take_profit': take_profit,
+            'stop_loss': stop_loss
             }
-        
-        if self.is_tradable(symbol):
-            
-            try:
-                r = requests.post(self.orders_url,
-                                  params=params,
-                                  headers=self.headers,
-                                  timeout=5)
-            except HTTPError:
-                return False
+
+        try:
+            r = client.post(self.orders_url,
+                            params=params,
+                            headers=self.headers,
+                            timeout=5)
+        except requests.RequestException:
+            return False
 
         debug_logger.debug("""API called to place order for '{}'""".format(symbol))
 
-        return True
+        return r.ok
     
 
     def close_position(self, symbol):
-
-        params = {
-            'symbol': symbol,
-            }
-
-        r = requests.delete(positions_url,
-                            params=params,
+        """
+        Close the position of the symbol. A position that does not exist
+        (404, e.g. closed by the take-profit or stop-loss of its bracket)
+        counts as closed. Other rejections raise
+        """
+
+        # DELETE /positions (without symbol) would close every position
+        r = client.delete(self.positions_url + '/' + symbol,
                             headers=self.headers,
                             timeout=5)
 
         debug_logger.debug("""API called to close position for '{}'""".format(symbol))
+
+        if r.status_code == 404:
+            debug_logger.debug("Position of '{}' was already closed".format(symbol))
+            return
+
+        r.raise_for_status()
     
 
     def is_tradable(self, symbol):
@@ -111,9 +199,10 @@ class Alpaca:
         
         asset_url = self.assets_url + symbol
         
-        r = requests.get(asset_url,
+        r = client.get(asset_url,
                         headers=self.headers,
                         timeout=5)
+        r.raise_for_status()
         
         debug_logger.debug("""API called by is_tradable() for '{}'""".format(symbol))
         
@@ -134,9 +223,10 @@ class Alpaca:
 
         last_quote_url = self.quote_url + symbol
 
-        r = requests.get(last_quote_url,
+        r = client.get(last_quote_url,
                         headers=self.headers,
                         timeout=5)
+        r.raise_for_status()
         
         debug_logger.debug("""API called by take_and_stop() for '{}'""".format(symbol))
 
@@ -0,0 +1,283 @@
+import json
+import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from time import monotonic
+from time import sleep
+from urllib.parse import urlparse
+
+from ttf_logger import debug_logger
+
+import requests
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.RequestException):
+    """
+    Raised without calling the API while the circuit of an endpoint is open
+    """
+
+
+class DataError(Exception):
+    """
+    Raised when an API response holds no usable data (e.g. no bars for the
+    requested symbol)
+    """
+
+
+# Errors of an API call or of its response, as opposed to bugs
+API_ERRORS = (requests.RequestException, json.JSONDecodeError, DataError)
+
+
+class CircuitBreaker:
+    """
+    Stop calling an endpoint after failure_threshold consecutive failures.
+    After reset_timeout seconds, a single trial call is let through: its
+    success closes the circuit, its failure opens it again
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+
+    @property
+    def state(self):
+
+        if self.opened_at is None:
+            return 'closed'
+
+        if monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+
+        return 'open'
+
+
+    def allow(self):
+
+        with self.lock:
+
+            state = self.state
+
+            if state == 'closed':
+                return True
+
+            if state == 'half-open' and not self.trial:
+                self.trial = True
+                return True
+
+            return False
+
+
+    def record_success(self):
+
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+
+    def record_failure(self):
+
+        with self.lock:
+
+            self.failures += 1
+
+            if self.trial or self.failures >= self.failure_threshold:
+                self.opened_at = monotonic()
+
+            self.trial = False
+
+
+class ApiClient:
+    """
+    HTTP calls with:
+
+        - a timeout per attempt and a deadline for the whole call,
+          retries included
+        - retries with jittered exponential backoff on connection errors,
+          timeouts, 429 and 5xx responses, for idempotent methods only
+          (Retry-After is honoured when given)
+        - optional hedging of idempotent calls: if no response arrived
+          after hedge_after seconds, a second identical request is sent and
+          the first response is used
+        - a circuit breaker per endpoint (host and first path segments)
+
+    Responses still failing after retries raise requests.HTTPError.
+
+    The timeout applies to each socket operation (connect, each read), as
+    in requests, not to the whole response: a response trickling in slowly
+    can outlast the deadline. The deadline bounds the number and timeouts
+    of the attempts, and the backoff between them.
+    """
+
+    def __init__(self, timeout=5, deadline=15, retries=3, backoff=0.25,
+                 max_backoff=4, hedge_after=None, failure_threshold=5,
+                 reset_timeout=30):
+
+        self.timeout = timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.lock = threading.Lock()
+        self.breakers = {}
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=8,
+                                           thread_name_prefix='hedge')
+
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+
+    def session(self):
+        """
+        One requests session (connection pool) per thread
+        """
+
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+
+        return self.local.session
+
+
+    def breaker(self, endpoint):
+
+        with self.lock:
+
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(self.failure_threshold,
+                                                         self.reset_timeout)
+
+            return self.breakers[endpoint]
+
+
+    @staticmethod
+    def endpoint(url):
+
+        parsed = urlparse(url)
+
+        return parsed.netloc + '/'.join(parsed.path.split('/')[:3])
+
+
+    def request(self, method, url, endpoint=None, deadline=None, hedge=None,
+                **kwargs):
+
+        idempotent = method in IDEMPOTENT_METHODS
+        breaker = self.breaker(endpoint or self.endpoint(url))
+        deadline = monotonic() + (deadline or self.deadline)
+        hedge_after = self.hedge_after if hedge is None else hedge
+        retries = self.retries if idempotent else 0
+        attempt_timeout = kwargs.pop('timeout', self.timeout)
+
+        for attempt in range(retries + 1):
+
+            if not breaker.allow():
+                raise CircuitOpenError("Circuit open for '{}'".format(url))
+
+            timeout = min(attempt_timeout, max(deadline - monotonic(), 0.01))
+
+            try:
+
+                if idempotent and hedge_after:
+                    r = self.hedged(method, url, timeout, hedge_after, kwargs)
+                else:
+                    r = self.session().request(method, url, timeout=timeout,
+                                               **kwargs)
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+                breaker.record_failure()
+                error, r = e, None
+
+            except Exception:
+                # Not retried, but still counted (and ends a half-open trial)
+                breaker.record_failure()
+                raise
+
+            else:
+
+                if r.status_code not in RETRY_STATUSES:
+                    breaker.record_success()
+                    return r
+
+                breaker.record_failure()
+                error = requests.HTTPError(
+                    "{} {} for '{}'".format(r.status_code, r.reason, url),
+                    response=r)
+
+            wait_time = self.backoff_time(attempt, r)
+
+            if attempt == retries or monotonic() + wait_time >= deadline:
+                raise error
+
+            debug_logger.debug("Retrying {} '{}' in {:.2f}s ({})".format(
+                                method, url, wait_time, error))
+            sleep(wait_time)
+
+
+    def backoff_time(self, attempt, response=None):
+
+        if response is not None and 'Retry-After' in response.headers:
+            try:
+                return float(response.headers['Retry-After'])
+            except ValueError:
+                pass
+
+        backoff = min(self.backoff * 2 ** attempt, self.max_backoff)
+
+        return random.uniform(backoff / 2, backoff)
+
+
+    def hedged(self, method, url, timeout, hedge_after, kwargs):
+
+        def call():
+            return self.session().request(method, url, timeout=timeout,
+                                          **kwargs)
+
+        futures = [self.executor.submit(call)]
+        done, _ = wait(futures, timeout=hedge_after)
+
+        if not done:
+            futures.append(self.executor.submit(call))
+            debug_logger.debug("Hedged {} '{}'".format(method, url))
+
+        error = None
+
+        for _ in range(len(futures)):
+
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+            for future in done:
+
+                futures.remove(future)
+
+                try:
+                    return future.result()
+                except requests.RequestException as e:
+                    error = e
+
+        raise error
+
+
+client = ApiClient()
@@ -0,0 +1,357 @@
+"""
+Latest bars and indicator values of the tracked stocks, published in a
+memory-mapped file for other local processes (dashboards, notebooks) to
+read without querying the API.
+
+Layout (little-endian, see HEADER_DTYPE and slot_dtype()):
+
+    header, HEADER_SIZE bytes:
+        magic       8 bytes    b'TTFRING1'
+        version     uint32     LAYOUT_VERSION
+        slots       uint32     number of slots
+        depth       uint32     bars kept per slot
+        used        uint32     slots assigned so far (0 to used - 1)
+        created     float64    epoch time the file was created
+
+    slots[slots], each slot_dtype(depth).itemsize bytes:
+        key         32 bytes   'symbol:timeframe' or
+                               'strategy:symbol:timeframe', NUL padded.
+                               Longer keys are rejected (see slot_key())
+        sequence    uint64     odd while the slot is being written
+        count       uint64     bars written since the slot was assigned
+        updated     float64    epoch time of the last write
+        indicators  float64[]  last values of INDICATORS (NaN: none)
+        bars        float64[depth][6]
+                               ring of bars (time, open, high, low, close,
+                               volume), bar i at index i % depth
+
+A slot is assigned to a key on its first publish and kept for the life
+of the file. Bars are merged by time: bars newer than the last written
+one are appended, a bar with the same time (in progress) is overwritten.
+
+There is a single writer (BarRing). Readers (BarRingReader) take no lock:
+they copy a slot and retry if its sequence was odd or changed meanwhile.
+A new writer replaces the file instead of truncating it, so readers of
+the previous file keep a valid mapping until they reopen (see stale()).
+"""
+import os
+import mmap
+import tempfile
+import threading
+from time import sleep
+from time import time
+
+import logging
+from ttf_logger import debug_logger
+
+from lazy_import import LazyModule
+
+np = LazyModule('numpy')
+
+bar_ring_file = 'latest_bars.ring'
+
+MAGIC = b'TTFRING1'
+LAYOUT_VERSION = 1
+
+HEADER_SIZE = 64
+HEADER_DTYPE = [('magic', 'S8'), ('version', '<u4'), ('slots', '<u4'),
+                ('depth', '<u4'), ('used', '<u4'), ('created', '<f8')]
+
+BAR_FIELDS = ('time', 'open', 'high', 'low', 'close', 'volume')
+INDICATORS = ('sma', 'k', 'd', 'potential', 'distance', 'volatility')
+
+KEY_SIZE = 32
+
+
+def slot_dtype(depth):
+
+    return np.dtype([('key', 'S{}'.format(KEY_SIZE)),
+                     ('sequence', '<u8'),
+                     ('count', '<u8'),
+                     ('updated', '<f8'),
+                     ('indicators', '<f8', (len(INDICATORS),)),
+                     ('bars', '<f8', (depth, len(BAR_FIELDS)))])
+
+
+def slot_key(symbol, timeframe, strategy=None):
+    """
+    Encoded key of a slot. Raise ValueError if it is longer than KEY_SIZE
+    bytes, as it would be truncated in the file and never found again
+    """
+
+    parts = [symbol, timeframe] if strategy is None else [strategy, symbol, timeframe]
+    key = ':'.join(parts).encode()
+
+    if len(key) > KEY_SIZE:
+        raise ValueError("Key '{}' is longer than {} bytes".format(key.decode(),
+                                                                 KEY_SIZE))
+
+    return key
+
+
+def bar_values(data):
+    """
+    (n, 6) float64 array of the bars of a dataframe, with an epoch 'time'
+    column or a datetime index (as built by Stock.alpaca_data_resample())
+    """
+
+    if 'time' in data.columns:
+        times = data['time'].to_numpy(dtype='float64')
+    else:
+        times = np.array([moment.timestamp() for moment in data.index])
+
+    values = np.empty((len(data), len(BAR_FIELDS)))
+    values[:, 0] = times
+
+    for i, field in enumerate(BAR_FIELDS[1:], 1):
+        values[:, i] = data[field].to_numpy(dtype='float64')
+
+    return values
+
+
+class BarRing:
+    """
+    Writer of the bars file. Thread-safe: publishes of the scan threads
+    are serialized
+    """
+
+    def __init__(self, path=bar_ring_file, slots=4096, depth=128):
+
+        self.path = path
+        self.depth = depth
+
+        self.lock = threading.Lock()
+        self.index = {}
+        self.full = False
+        self.rejected = set()
+
+        size = HEADER_SIZE + slots * slot_dtype(depth).itemsize
+        directory = os.path.dirname(os.path.abspath(path))
+
+        # Created aside and moved in place, for readers of a previous file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+        try:
+            os.ftruncate(fd, size)
+            self.mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        self.header = np.ndarray((1,), HEADER_DTYPE, buffer=self.mmap)
+        self.header['magic'] = MAGIC
+        self.header['version'] = LAYOUT_VERSION
+        self.header['slots'] = slots
+        self.header['depth'] = depth
+        self.header['created'] = time()
+
+        self.slots = np.ndarray((slots,), slot_dtype(depth), buffer=self.mmap,
+                                offset=HEADER_SIZE)
+        self.slots['indicators'] = np.nan
+
+        os.replace(tmp_path, path)
+
+
+    def publish(self, symbol, timeframe, data, strategy=None, **indicators):
+        """
+        Write the latest bars of a dataframe and indicator values (named
+        as in INDICATORS) to the slot of the symbol and timeframe. Return
+        False if the key is too long or no slot is left for a new key
+        """
+
+        try:
+            key = slot_key(symbol, timeframe, strategy)
+
+        except ValueError as e:
+
+            if e.args[0] not in self.rejected:
+                debug_logger.debug(e.args[0])
+                self.rejected.add(e.args[0])
+
+            return False
+
+        values = bar_values(data.iloc[-self.depth:])
+
+        with self.lock:
+
+            i = self.slot(key)
+
+            if i is None:
+                return False
+
+            sequence = self.slots['sequence']
+            bars = self.slots['bars'][i]
+            count = int(self.slots['count'][i])
+
+            if count:
+
+                last = bars[(count - 1) % self.depth, 0]
+                values = values[values[:, 0] >= last]
+
+                if len(values) and values[0, 0] == last:
+                    count -= 1
+
+            values = values[-self.depth:]
+
+            sequence[i] += 1
+
+            bars[np.arange(count, count + len(values)) % self.depth] = values
+            self.slots['count'][i] = count + len(values)
+            self.slots['updated'][i] = time()
+            self.slots['indicators'][i] = [indicators.get(name, np.nan)
+                                           for name in INDICATORS]
+
+            sequence[i] += 1
+
+        return True
+
+
+    def slot(self, key):
+        """
+        Index of the slot of a key, assigned if new. Must be called holding
+        the lock
+        """
+
+        if key in self.index:
+            return self.index[key]
+
+        used = int(self.header['used'][0])
+
+        if used == len(self.slots):
+
+            if not self.full:
+                debug_logger.debug("No slot left in '{}'".format(self.path))
+                self.full = True
+
+            return None
+
+        self.slots['key'][used] = key
+        self.index[key] = used
+
+        # Published once the key is written
+        self.header['used'] = used + 1
+
+        return used
+
+
+    def close(self):
+
+        self.mmap.flush()
+        del self.header, self.slots
+        self.mmap.close()
+
+
+class BarRingReader:
+    """
+    Reader of the bars file, for any local process. Reads take no lock and
+    never block the writer
+    """
+
+    def __init__(self, path=bar_ring_file):
+
+        self.path = path
+        self.open()
+
+
+    def open(self):
+
+        with open(self.path, 'rb') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.header = np.ndarray((1,), HEADER_DTYPE, buffer=self.mmap)
+
+        if (self.header['magic'][0] != MAGIC or
+            self.header['version'][0] != LAYOUT_VERSION):
+
+            del self.header
+            self.mmap.close()
+
+            raise ValueError("'{}' is not a bars file of version {}".format(
+                              self.path, LAYOUT_VERSION))
+
+        self.depth = int(self.header['depth'][0])
+        self.slots = np.ndarray((int(self.header['slots'][0]),),
+                                slot_dtype(self.depth), buffer=self.mmap,
+                                offset=HEADER_SIZE)
+        self.index = {}
+
+
+    def keys(self):
+        """
+        Keys ('symbol:timeframe' or 'strategy:symbol:timeframe') of the
+        slots published so far
+        """
+
+        used = int(self.header['used'][0])
+
+        for i in range(len(self.index), used):
+            self.index[bytes(self.slots['key'][i])] = i
+
+        return [key.decode() for key in self.index]
+
+
+    def read(self, symbol, timeframe, strategy=None, retries=1000):
+        """
+        Consistent copy of a slot: a dict of 'bars' ((n, 6) array of the
+        BAR_FIELDS, oldest first), 'updated' and the INDICATORS values.
+        Return None if nothing was published for the key, raise ValueError
+        if the key is too long (see slot_key())
+        """
+
+        key = slot_key(symbol, timeframe, strategy)
+
+        if key not in self.index:
+            self.keys()
+
+        i = self.index.get(key)
+
+        if i is None:
+            return None
+
+        sequences = self.slots['sequence']
+
+        for _ in range(retries):
+
+            sequence = int(sequences[i])
+
+            if sequence % 2 == 0:
+
+                count = int(self.slots['count'][i])
+                bars = self.slots['bars'][i].copy()
+                indicators = self.slots['indicators'][i].copy()
+                updated = float(self.slots['updated'][i])
+
+                if int(sequences[i]) == sequence:
+                    break
+
+            sleep(0)
+
+        else:
+            raise BlockingIOError("Slot '{}' kept changing".format(key.decode()))
+
+        n = min(count, self.depth)
+        record = {'bars': bars[np.arange(count - n, count) % self.depth],
+                  'updated': updated}
+        record.update(zip(INDICATORS, indicators.tolist()))
+
+        return record
+
+
+    def stale(self):
+        """
+        True if the file was replaced by a new writer since it was opened
+        """
+
+        return os.stat(self.path).st_ino != self.inode
+
+
+    def reopen(self):
+
+        self.close()
+        self.open()
+
+
+    def close(self):
+
+        del self.header, self.slots
+        self.mmap.close()
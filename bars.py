@@ -0,0 +1,57 @@
+import json
+from operator import itemgetter
+
+from lazy_import import LazyModule
+
+np = LazyModule('numpy')
+pd = LazyModule('pandas')
+
+# Frame columns and the bar keys of the Alpaca API they are decoded from
+COLUMNS = ('time', 'open', 'high', 'low', 'close', 'volume')
+KEYS = ('t', 'o', 'h', 'l', 'c', 'v')
+
+row = itemgetter(*KEYS)
+
+
+def decode(content):
+    """
+    Decode a bars response straight into columns, without building a
+    DataFrame: {symbol: {column: numpy array}}. Both the multi-symbol shape
+    ({symbol: [bar, ...]}) and the paged one ({'bars': {symbol: [bar, ...]},
+    ...}) are accepted
+    """
+
+    payload = json.loads(content)
+
+    if isinstance(payload.get('bars'), dict):
+        payload = payload['bars']
+
+    return {symbol: columns(bars) for symbol, bars in payload.items()
+            if isinstance(bars, list)}
+
+
+def columns(bars):
+    """
+    Convert a list of bars ({'t', 'o', 'h', 'l', 'c', 'v'}) to a dict of
+    column arrays: epoch 'time' and 'volume' as int64, prices as float64
+    """
+
+    if not bars:
+        rows = np.empty((0, len(KEYS)))
+    else:
+        rows = np.array(list(map(row, bars)), dtype=np.float64)
+
+    data = {column: rows[:, i] for i, column in enumerate(COLUMNS)}
+    data['time'] = data['time'].astype(np.int64)
+    data['volume'] = data['volume'].astype(np.int64)
+
+    return data
+
+
+def frame(data):
+    """
+    Build the bars DataFrame (same columns as Stock.rename_dict gives) from
+    decoded columns
+    """
+
+    return pd.DataFrame(data, columns=COLUMNS)
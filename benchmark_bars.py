@@ -0,0 +1,98 @@
+"""
+Benchmark of the bars decoding, on payloads of 1,000 bars per symbol:
+
+    python benchmark_bars.py --symbols 1 100 --repeat 20
+
+Compares the former path (json.loads + DataFrame.from_dict + rename) with
+bars.decode() alone (columns only, as used by get_bulk_columns()) and with
+bars.decode() + bars.frame() (as used by fetch_data() and get_bulk_data()).
+"""
+import json
+import argparse
+import random
+from timeit import repeat
+
+import pandas as pd
+
+import bars
+from stock_data import Stock
+
+
+def payload(symbols, limit=1000):
+    """
+    Multi-symbol bars response of 'limit' random bars per symbol
+    """
+
+    data = {}
+
+    for i in range(symbols):
+
+        close = random.uniform(20, 800)
+        symbol_bars = []
+
+        for j in range(limit):
+
+            close *= random.uniform(0.99, 1.01)
+            symbol_bars.append({
+                't': 1600000000 + 60 * j,
+                'o': round(close * random.uniform(0.995, 1.005), 2),
+                'h': round(close * 1.01, 2),
+                'l': round(close * 0.99, 2),
+                'c': round(close, 2),
+                'v': random.randint(100, 100000),
+                })
+
+        data['S{}'.format(i)] = symbol_bars
+
+    return json.dumps(data).encode()
+
+
+def from_dict(content):
+
+    frames = {}
+
+    for symbol, symbol_bars in json.loads(content).items():
+
+        data = pd.DataFrame.from_dict(symbol_bars)
+        data.rename(Stock.rename_dict, axis=1, inplace=True)
+        frames[symbol] = data
+
+    return frames
+
+
+def decode_frames(content):
+
+    return {symbol: bars.frame(columns)
+            for symbol, columns in bars.decode(content).items()}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                    formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--symbols', type=int, nargs='+', default=[1, 100])
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    paths = (('from_dict + rename', from_dict),
+             ('decode', bars.decode),
+             ('decode + frame', decode_frames))
+
+    for symbols in args.symbols:
+
+        content = payload(symbols, args.limit)
+        print('{} symbol(s) x {} bars ({:.0f} kB)'.format(
+              symbols, args.limit, len(content) / 1000))
+
+        for name, decode in paths:
+
+            number = max(1, 100 // symbols)
+            best = min(repeat(lambda: decode(content), number=number,
+                              repeat=args.repeat)) / number
+
+            print('  {:<20} {:8.2f} ms'.format(name, best * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+import json
+import math
+import random
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+from time import time
+from urllib.parse import parse_qs, urlparse
+
+from single_flight import timeframe_seconds
+
+
+class FakeAlpaca:
+    """
+    Local HTTP stand-in for the Alpaca endpoints used by Stock and Alpaca:
+
+        - GET /v1/bars/<timeframe>?symbols=...&limit=...
+        - GET /v1/last_quote/stocks/<symbol>
+        - GET /v2/assets, GET /v2/assets/<symbol>
+        - GET /v2/positions, GET /v2/positions/<symbol>
+        - DELETE /v2/positions/<symbol>, DELETE /v2/positions (closes all
+          positions, as the real API does)
+        - POST /v2/orders
+        - GET /v2/watchlists/<id>
+        - GET /v2/calendar
+
+    Prices are deterministic functions of symbol and time. A share of
+    'signal_ratio' symbols trend up (and are likely to show potential), the
+    rest trend down.
+
+    Faults are injected on every request: a delay of latency +/- jitter
+    seconds, '429 Too Many Requests' responses with probability
+    rate_limit_ratio, and responses delayed by timeout_delay seconds with
+    probability timeout_ratio.
+    """
+
+    def __init__(self, symbols, watchlist=(), signal_ratio=0.1, latency=0.,
+                 jitter=0., rate_limit_ratio=0., timeout_ratio=0.,
+                 timeout_delay=10., host='127.0.0.1', port=0, seed=0):
+
+        self.symbols = set(symbols)
+        self.watchlist = sorted(watchlist)
+        self.signal_ratio = signal_ratio
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.timeout_ratio = timeout_ratio
+        self.timeout_delay = timeout_delay
+        self.random = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.faults = Counter()
+        self.orders = []
+        self.positions = {}
+
+        handler = type('FakeAlpacaHandler', (FakeAlpacaHandler,), {'fake': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+
+    @property
+    def url(self):
+
+        host, port = self.server.server_address[:2]
+
+        return 'http://{}:{}'.format(host, port)
+
+
+    @property
+    def trading_url(self):
+
+        return self.url + '/v2'
+
+
+    @property
+    def data_url(self):
+
+        return self.url + '/v1'
+
+
+    def start(self):
+
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+        return self
+
+
+    def stop(self):
+
+        self.server.shutdown()
+        self.server.server_close()
+
+
+    def is_signal(self, symbol):
+
+        return zlib.crc32(symbol.encode()) % 1000 < self.signal_ratio * 1000
+
+
+    def price(self, symbol, t, now):
+
+        crc = zlib.crc32(symbol.encode())
+        base = 30 + crc % 300
+        phase = crc % 97
+
+        days = (t - now) / 86400
+        swing = 0.01 * math.sin(2 * math.pi * days / 4 + phase)
+
+        if self.is_signal(symbol):
+            # Uptrend with a steady rise over the last 6 hours
+            intraday = 0.02 * min(max(days * 4 + 1, 0), 1)
+            drift = 0.004
+        else:
+            intraday = 0.003 * math.sin(2 * math.pi * t / 7200 + phase)
+            drift = -0.004
+
+        return base * math.exp(drift * days) * (1 + swing + intraday)
+
+
+    def bars(self, symbol, timeframe, limit, now):
+
+        seconds = timeframe_seconds(timeframe)
+        limit = min(limit or 100, 1000)
+        last = int(now // seconds * seconds)
+
+        bars = []
+
+        for i in range(limit):
+
+            t = last - seconds * (limit - 1 - i)
+            o = self.price(symbol, t, now)
+            c = self.price(symbol, min(t + seconds, now), now)
+
+            bars.append({
+                't': t,
+                'o': round(o, 4),
+                'h': round(max(o, c) * 1.001, 4),
+                'l': round(min(o, c) * 0.999, 4),
+                'c': round(c, 4),
+                'v': 100 + zlib.crc32('{}{}'.format(symbol, t).encode()) % 10000,
+                })
+
+        return bars
+
+
+    def position(self, symbol, now):
+
+        position = dict(self.positions[symbol])
+        price = self.price(symbol, now, now)
+        entry = float(position['avg_entry_price'])
+
+        position['current_price'] = str(price)
+        position['unrealized_plpc'] = str((price - entry) / entry)
+
+        return position
+
+
+    def stats(self):
+
+        with self.lock:
+
+            return {
+                'requests': dict(self.requests),
+                'faults': dict(self.faults),
+                'orders': list(self.orders),
+                }
+
+
+    def handle(self, method, path, query):
+        """
+        Return (status, body) for a request, after injecting faults
+        """
+
+        endpoint = '/'.join(path.strip('/').split('/')[:2])
+
+        with self.lock:
+
+            self.requests[endpoint] += 1
+            delay = max(self.latency + self.random.uniform(-self.jitter,
+                                                           self.jitter), 0)
+            rate_limited = self.random.random() < self.rate_limit_ratio
+            timed_out = self.random.random() < self.timeout_ratio
+
+            if rate_limited:
+                self.faults['429'] += 1
+            elif timed_out:
+                self.faults['timeout'] += 1
+
+        sleep(delay + (self.timeout_delay if timed_out else 0))
+
+        if rate_limited:
+            return 429, {'code': 42910000, 'message': 'rate limit exceeded'}
+
+        now = time()
+        parts = path.strip('/').split('/')
+        symbol = query.get('symbol', [None])[0]
+
+        if parts[:2] == ['v1', 'bars']:
+
+            symbols = query.get('symbols', [''])[0].split(',')
+            limit = int(query.get('limit', ['100'])[0])
+
+            return 200, {s: self.bars(s, parts[2], limit, now)
+                         for s in symbols if s in self.symbols}
+
+        if parts[:3] == ['v1', 'last_quote', 'stocks']:
+
+            price = self.price(parts[3], now, now)
+
+            return 200, {'symbol': parts[3],
+                         'last': {'bidprice': round(price * 0.9995, 2),
+                                  'askprice': round(price * 1.0005, 2)}}
+
+        if parts[:2] == ['v2', 'assets']:
+
+            if len(parts) == 2:
+                return 200, [{'symbol': s, 'status': 'active', 'tradable': True}
+                             for s in sorted(self.symbols)]
+
+            return 200, {'symbol': parts[2], 'status': 'active',
+                         'tradable': parts[2] in self.symbols}
+
+        if parts[:2] == ['v2', 'positions']:
+
+            with self.lock:
+
+                if len(parts) == 2:
+
+                    if method == 'DELETE':
+                        closed = list(self.positions)
+                        self.positions.clear()
+                        return 207, [{'symbol': s, 'status': 200} for s in closed]
+
+                    return 200, [self.position(s, now) for s in self.positions]
+
+                if parts[2] not in self.positions:
+                    return 404, {'message': 'position does not exist'}
+
+                if method == 'DELETE':
+                    self.positions.pop(parts[2])
+                    return 200, {'symbol': parts[2], 'status': 'accepted'}
+
+                return 200, self.position(parts[2], now)
+
+        if parts[:2] == ['v2', 'orders'] and method == 'POST':
+
+            qty = int(query.get('qty', ['0'])[0])
+            price = self.price(symbol, now, now)
+
+            with self.lock:
+
+                self.orders.append({'symbol': symbol,
+                                    'side': query.get('side', [''])[0],
+                                    'qty': qty,
+                                    'time': now})
+                self.positions[symbol] = {'symbol': symbol,
+                                          'qty': str(qty),
+                                          'avg_entry_price': str(price),
+                                          'cost_basis': str(price * qty)}
+
+            return 200, {'id': str(len(self.orders)), 'symbol': symbol,
+                         'status': 'accepted'}
+
+        if parts[:2] == ['v2', 'watchlists']:
+
+            return 200, {'id': parts[2],
+                         'assets': [{'symbol': s} for s in self.watchlist]}
+
+        if parts[:2] == ['v2', 'calendar']:
+
+            start = datetime.strptime(query['start'][0], '%Y-%m-%d').date()
+            end = datetime.strptime(query['end'][0], '%Y-%m-%d').date()
+            sessions = []
+
+            while start <= end:
+
+                if start.weekday() < 5:
+                    sessions.append({'date': start.strftime('%Y-%m-%d'),
+                                     'open': '09:30', 'close': '16:00'})
+
+                start += timedelta(days=1)
+
+            return 200, sessions
+
+        return 404, {'message': 'not found'}
+
+
+class FakeAlpacaHandler(BaseHTTPRequestHandler):
+
+    fake = None
+
+    def respond(self, method):
+
+        url = urlparse(self.path)
+        status, body = self.fake.handle(method, url.path, parse_qs(url.query))
+        content = json.dumps(body).encode()
+
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+    def do_GET(self):
+        self.respond('GET')
+
+
+    def do_POST(self):
+        self.respond('POST')
+
+
+    def do_DELETE(self):
+        self.respond('DELETE')
+
+
+    def log_message(self, format, *args):
+        pass
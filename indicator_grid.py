@@ -0,0 +1,194 @@
+"""
+Indicator kernels over a grid of window settings.
+
+Sweeping Stock.sma_windows or Stock.stoch_windows normally means a full run
+per setting. These kernels take the bar arrays of one symbol (oldest first)
+and compute every setting of a grid in one call, sharing the rolling work:
+
+- one prefix sum per series serves the rolling means of every window
+- the rolling highs / lows and fast %K of a fast k window are computed once
+  for all the (k, d) windows using it, and %K once for all the d windows
+
+The signal functions return, for each parameter set, the potential the
+matching Stock rule would give at every bar, using the batched rules of
+the signals module.
+"""
+from lazy_import import LazyModule
+
+import signals
+
+np = LazyModule('numpy')
+
+
+def sliding_windows(values, window):
+    """
+    Read-only (len - window + 1, window) view of the windows of a 1D array,
+    one row per window end (as numpy's sliding_window_view, which needs
+    numpy 1.20)
+    """
+
+    values = np.ascontiguousarray(values)
+    stride = values.strides[0]
+
+    return np.lib.stride_tricks.as_strided(
+        values, shape=(len(values) - window + 1, window),
+        strides=(stride, stride), writeable=False)
+
+
+def rolling_means(values, windows):
+    """
+    Rolling means of a 1D array for many windows, as pandas'
+    rolling(window).mean(): {window: array}, NaN until a window is full or
+    while it holds a NaN. The prefix sums are shared by all the windows
+    """
+
+    values = np.asarray(values, dtype=float)
+    valid = np.isfinite(values)
+
+    sums = np.concatenate(([0.], np.cumsum(np.where(valid, values, 0.))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+
+    means = {}
+
+    for window in set(windows):
+
+        mean = np.full(len(values), np.nan)
+
+        if window <= len(values):
+
+            window_sums = sums[window:] - sums[:-window]
+            full = (counts[window:] - counts[:-window]) == window
+            mean[window - 1:] = np.where(full, window_sums / window, np.nan)
+
+        means[window] = mean
+
+    return means
+
+
+def rolling_extremes(highs, lows, window):
+    """
+    Rolling highest high and lowest low over a window, NaN until the
+    window is full
+    """
+
+    highs = np.asarray(highs, dtype=float)
+    lows = np.asarray(lows, dtype=float)
+
+    rolling_high = np.full(len(highs), np.nan)
+    rolling_low = np.full(len(lows), np.nan)
+
+    if window <= len(highs):
+
+        rolling_high[window - 1:] = sliding_windows(highs, window).max(axis=1)
+        rolling_low[window - 1:] = sliding_windows(lows, window).min(axis=1)
+
+    return rolling_high, rolling_low
+
+
+def sma_grid(closes, sma_windows):
+    """
+    Simple moving averages of the closes for every window of every set of
+    sma_windows: {window: array}
+    """
+
+    windows = {window for sma_set in sma_windows for window in sma_set}
+
+    return rolling_means(closes, windows)
+
+
+def stochastic_grid(highs, lows, closes, stoch_windows):
+    """
+    Stochastic %K and %D (as Stock.get_stochastic()) for every
+    (fastk, k, d) set of stoch_windows: {(fastk, k, d): (k array, d array)}
+    """
+
+    closes = np.asarray(closes, dtype=float)
+
+    # {fastk: {k: {d}}}, so that shared stages are computed once
+    tree = {}
+
+    for fastk, k, d in stoch_windows:
+        tree.setdefault(fastk, {}).setdefault(k, set()).add(d)
+
+    stochastics = {}
+
+    for fastk, k_windows in tree.items():
+
+        rolling_high, rolling_low = rolling_extremes(highs, lows, fastk)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fast_k = (closes - rolling_low) / (rolling_high - rolling_low) * 100
+
+        k_means = rolling_means(fast_k, k_windows)
+
+        for k, d_windows in k_windows.items():
+
+            d_means = rolling_means(k_means[k], d_windows)
+
+            for d in d_windows:
+                stochastics[(fastk, k, d)] = (k_means[k], d_means[d])
+
+    return stochastics
+
+
+def trend_signals(closes, lows, sma_windows, rows=60):
+    """
+    Trend potential at every bar for every set of sma_windows, as
+    Stock.get_trend_potential() would give on the last 'rows' bars up to
+    that bar. The first window of a set drives the verdict. Bars with less
+    than 'rows' bars of history get 0.
+
+    Return {sma windows: array of potentials}
+    """
+
+    closes = np.asarray(closes, dtype=float)
+    lows = np.asarray(lows, dtype=float)
+    smas = sma_grid(closes, sma_windows)
+
+    results = {}
+
+    if len(closes) < rows:
+
+        for sma_set in sma_windows:
+            results[tuple(sma_set)] = np.zeros(len(closes), dtype=int)
+
+        return results
+
+    # One row per bar, holding the 'rows' bars up to it
+    windows = sliding_windows
+    close_rows = windows(closes, rows)
+    low_rows = windows(lows, rows)
+
+    # Sets sharing their first window share the verdict
+    verdicts = {}
+
+    for sma_set in sma_windows:
+
+        window = sma_set[0]
+
+        if window not in verdicts:
+
+            potentials = np.zeros(len(closes), dtype=int)
+            potentials[rows - 1:] = signals.trend_potentials(
+                close_rows, windows(smas[window], rows), low_rows)
+
+            verdicts[window] = potentials
+
+        results[tuple(sma_set)] = verdicts[window]
+
+    return results
+
+
+def tactical_signals(highs, lows, closes, stoch_windows):
+    """
+    Tactical potential at every bar for every (fastk, k, d) set of
+    stoch_windows, as Stock.get_tactical_potential() would give with the
+    stochastic values of that bar.
+
+    Return {(fastk, k, d): array of potentials}
+    """
+
+    stochastics = stochastic_grid(highs, lows, closes, stoch_windows)
+
+    return {windows: signals.tactical_potentials(k, d)
+            for windows, (k, d) in stochastics.items()}
@@ -0,0 +1,236 @@
+import os
+import json
+import threading
+from datetime import datetime
+from time import monotonic
+
+import logging
+from ttf_logger import debug_logger
+
+from market_calendar import eastern
+
+journal_file = 'scan_journal.jsonl'
+
+STAGES = ('potential', 'standby', 'buy')
+
+# Events flushed to disk as soon as they are recorded
+DURABLE_EVENTS = ('buy', 'sell')
+
+
+class Journal:
+    """
+    Append-only record of the scan state transitions of a session, one JSON
+    object per line:
+
+        - universe: initial set of symbols of the session
+        - promote: a stock was added to the 'potential', 'standby' or
+          'buy' set
+        - demote: a stock was removed from one of these sets (signal
+          gone, moved up or expired)
+        - buy: a position was opened, with its position record
+        - position: the position record of an open position was updated
+          (sell countdown)
+        - sell: a position was closed
+
+    Lines are flushed to disk (fsync) in batches, every sync_every events or
+    at most sync_interval seconds after the first unflushed event (a timer
+    flushes the tail of a burst), whichever comes first. Position changes
+    (buy, sell) are flushed at once. Once compact_every events have been
+    appended, the journal is rewritten as a single snapshot line.
+    """
+
+    def __init__(self, path=journal_file, sync_every=20, sync_interval=1.0,
+                 compact_every=5000):
+
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+
+        self.lock = threading.Lock()
+        self.file = open(self.path, 'a')
+        self.pending = 0
+        self.appended = 0
+        self.last_sync = monotonic()
+        self.timer = None
+
+
+    def record(self, event, symbol=None, **data):
+
+        entry = {
+            'event': event,
+            'day': datetime.now(eastern).strftime('%Y-%m-%d'),
+            'symbol': symbol,
+            }
+        entry.update(data)
+
+        with self.lock:
+
+            self.file.write(json.dumps(entry) + '\n')
+            self.pending += 1
+            self.appended += 1
+
+            if (event in DURABLE_EVENTS or
+                self.pending >= self.sync_every or
+                monotonic() - self.last_sync >= self.sync_interval):
+
+                self._sync()
+
+            elif self.timer is None:
+                self.timer = threading.Timer(self.sync_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+            if self.appended >= self.compact_every:
+                self._compact()
+
+
+    def flush(self):
+
+        with self.lock:
+            self._sync()
+
+
+    def compact(self):
+
+        with self.lock:
+            self._compact()
+
+
+    def close(self):
+
+        with self.lock:
+            self._sync()
+            self.file.close()
+
+
+    def replay(self):
+        """
+        Rebuild the session state from the journal. Stage sets and universe
+        are only kept for the current day, open positions are always kept
+        """
+
+        with self.lock:
+            self._sync()
+            return replay(self.path)
+
+
+    def _sync(self):
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        if self.pending and not self.file.closed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+        self.pending = 0
+        self.last_sync = monotonic()
+
+
+    def _compact(self):
+        """
+        Replace the journal with a single snapshot of its current state,
+        written to a temporary file and atomically moved into place
+        """
+
+        self._sync()
+        state = replay(self.path)
+
+        tmp_path = self.path + '.tmp'
+
+        with open(tmp_path, 'w') as f:
+
+            f.write(json.dumps(snapshot_entry(state)) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+        self.file.close()
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, 'a')
+        self.appended = 0
+
+        debug_logger.debug("Compacted journal '{}'".format(self.path))
+
+
+def empty_state():
+
+    state = {
+        'day': datetime.now(eastern).strftime('%Y-%m-%d'),
+        'universe': [],
+        'bought': {},
+        }
+
+    for stage in STAGES:
+        state[stage] = set()
+
+    return state
+
+
+def snapshot_entry(state):
+
+    snapshot = dict(state)
+
+    for stage in STAGES:
+        snapshot[stage] = sorted(state[stage])
+
+    return {'event': 'snapshot', 'day': state['day'], 'state': snapshot}
+
+
+def apply_entry(state, entry):
+
+    event = entry.get('event')
+    symbol = entry.get('symbol')
+    today = entry.get('day') == state['day']
+
+    if event == 'snapshot':
+
+        snapshot = entry['state']
+        state['bought'] = dict(snapshot['bought'])
+
+        if today:
+            state['universe'] = list(snapshot['universe'])
+
+            for stage in STAGES:
+                state[stage] = set(snapshot[stage])
+
+    elif event == 'universe' and today:
+        state['universe'] = list(entry['symbols'])
+
+    elif event == 'promote' and today:
+        state[entry['stage']].add(symbol)
+
+    elif event == 'demote' and today:
+        state[entry['stage']].discard(symbol)
+
+    elif event in ('buy', 'position'):
+        state['bought'][symbol] = entry['record']
+
+    elif event == 'sell':
+        state['bought'].pop(symbol, None)
+
+
+def replay(path=journal_file):
+    """
+    Read a journal file and return the resulting state. A partially written
+    last line (crash during a write) is ignored
+    """
+
+    state = empty_state()
+
+    if not os.path.exists(path):
+        return state
+
+    with open(path, 'r') as f:
+
+        for line in f:
+
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+
+            apply_entry(state, entry)
+
+    return state
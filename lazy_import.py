@@ -0,0 +1,38 @@
+import importlib
+
+
+class LazyModule:
+    """
+    Stand-in for a heavy module (pandas, numpy, bs4...) that is imported on
+    first attribute access instead of at import time:
+
+        pd = LazyModule('pandas')
+
+    Importing through importlib is thread-safe (the import lock is held),
+    and after the first access the attributes are read from the module.
+    """
+
+    def __init__(self, name):
+
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+
+    def _load(self):
+
+        if self._module is None:
+            self.__dict__['_module'] = importlib.import_module(self._name)
+
+        return self._module
+
+
+    def __getattr__(self, attr):
+
+        return getattr(self._load(), attr)
+
+
+    def __repr__(self):
+
+        state = 'loaded' if self._module is not None else 'not loaded'
+
+        return "<lazy module '{}' ({})>".format(self._name, state)
@@ -0,0 +1,302 @@
+"""
+Load test of the full scan pipeline against a local fake Alpaca server:
+
+    python load_test.py --symbols 1000 --duration 120 --latency 0.05 \
+        --jitter 0.02 --rate-limit 0.01 --timeouts 0.001
+
+Runs tripletimeframe_main.main() on a single session of 'duration' seconds
+and reports request throughput, injected faults, stage evaluations,
+signal sink records, published bar slots, failed evaluations (logged by
+the stages), evaluations skipped without a new bar, stage demotions,
+uncaught thread errors, signal-to-order latency, and whether the
+pipeline hung (did not finish within a grace time after the session
+close). The pacing sleeps and request pacing of the scan stages are
+scaled by --time-scale so that large universes fit in a short run.
+
+With --strategies N, the session runs N strategies (different stochastic
+windows) in one process over a shared data plane (see strategy_host).
+"""
+import os
+import argparse
+import tempfile
+import threading
+from collections import Counter
+from datetime import timedelta
+from time import sleep
+from time import time
+
+import scan_data as scan
+import tripletimeframe_main as ttf
+from alpaca import Alpaca
+from fake_alpaca import FakeAlpaca
+from market_calendar import MarketCalendar
+from metrics import metrics
+from signal_sink import SignalSink
+from bar_ring import BarRing, BarRingReader
+from rate_limiter import RateLimiter
+from stock_data import Stock
+from strategy_host import DataPlane, Strategy, StrategyHost
+from ttf_logger import setup_logging
+
+POTENTIAL_GETTERS = ('get_trend_potential', 'get_tactical_potential',
+                     'get_execution_potential', 'get_sell_signal')
+
+# Stochastic windows of the strategies of a multi-strategy run, in turn
+STOCH_WINDOWS = ((8, 3, 5), (5, 3, 3), (14, 3, 3))
+
+
+class SessionCalendar(MarketCalendar):
+    """
+    A single market session, from now until 'duration' seconds later
+    """
+
+    def __init__(self, duration):
+
+        MarketCalendar.__init__(self)
+
+        self.session_open = self.now()
+        self.session_close = self.session_open + timedelta(seconds=duration)
+
+
+    def get_sessions(self, start, end):
+
+        return {self.session_open.date(): (self.session_open, self.session_close)}
+
+
+def percentile(values, percent):
+
+    values = sorted(values)
+
+    if not values:
+        return None
+
+    return values[min(int(len(values) * percent / 100), len(values) - 1)]
+
+
+def instrument(evaluations, signals):
+    """
+    Wrap the Stock potential getters to count evaluations and record the
+    time of the first execution signal of each symbol. Return the
+    original methods
+    """
+
+    originals = {name: getattr(Stock, name) for name in POTENTIAL_GETTERS}
+
+    def wrap(name, original):
+
+        def wrapper(stock):
+
+            result = original(stock)
+            evaluations[name] += 1
+
+            if name == 'get_execution_potential' and stock.potential == 2:
+                signals.setdefault(stock.symbol, time())
+
+            return result
+
+        return wrapper
+
+    for name, original in originals.items():
+        setattr(Stock, name, wrap(name, original))
+
+    return originals
+
+
+def count_failures(failures):
+    """
+    Wrap scan_data.evaluate() to count the failed evaluations (logged and
+    swallowed by the stages) per getter. Return the original function
+    """
+
+    evaluate = scan.evaluate
+    lock = threading.Lock()
+
+    def wrapper(stock, getter):
+
+        evaluated = evaluate(stock, getter)
+
+        if not evaluated:
+            with lock:
+                failures[getter] += 1
+
+        return evaluated
+
+    scan.evaluate = wrapper
+
+    return evaluate
+
+
+def count_records(directory):
+    """
+    Number of records in the day files of a signal sink directory
+    """
+
+    if not os.path.isdir(directory):
+        return 0
+
+    records = 0
+
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name)) as f:
+            records += sum(1 for line in f)
+
+    return records
+
+
+def run(symbols=1000, duration=120, latency=0., jitter=0., rate_limit=0.,
+        timeouts=0., timeout_delay=10., signal_ratio=0.1, time_scale=0.01,
+        warm_up=False, grace=60, strategies=1):
+
+    universe = ['S{:04d}'.format(i) for i in range(symbols)]
+
+    fake = FakeAlpaca(universe, watchlist=universe[:10],
+                      signal_ratio=signal_ratio, latency=latency,
+                      jitter=jitter, rate_limit_ratio=rate_limit,
+                      timeout_ratio=timeouts,
+                      timeout_delay=timeout_delay).start()
+
+    Alpaca.set_urls(fake.trading_url, fake.data_url)
+    Stock.data_url = fake.data_url
+    Stock.trading_url = fake.trading_url
+
+    metrics.reset()
+    evaluations = Counter()
+    signals = {}
+    errors = Counter()
+    failures = Counter()
+    originals = instrument(evaluations, signals)
+    evaluate = count_failures(failures)
+
+    scan.calendar = SessionCalendar(duration)
+    scan.sleep = lambda seconds: sleep(seconds * time_scale)
+    scan.RateLimiter = lambda interval: RateLimiter(interval * time_scale)
+
+    excepthook = threading.excepthook
+    threading.excepthook = lambda args: errors.update(
+        ['{}: {}'.format(args.thread.name, args.exc_type.__name__)])
+
+    cwd = os.getcwd()
+    tmp_dir = tempfile.TemporaryDirectory()
+    os.chdir(tmp_dir.name)
+
+    try:
+
+        with open('open_positions.json', 'w') as f:
+            f.write('[]')
+
+        sink = Stock.signal_sink = SignalSink()
+        ring = Stock.bar_ring = BarRing()
+
+        start = time()
+
+        if strategies > 1:
+
+            host = StrategyHost([Strategy('s{}'.format(i),
+                                          stoch_windows=STOCH_WINDOWS[i % len(STOCH_WINDOWS)])
+                                 for i in range(strategies)],
+                                DataPlane(request_interval=0.2 * time_scale))
+            host.initialize(universe=lambda: set(universe))
+
+            if warm_up:
+                host.warm_up()
+
+            target, args = host.run, ()
+
+        else:
+
+            data = scan.initialize_data(universe=lambda: set(universe))
+
+            if warm_up:
+                scan.warm_up(data)
+
+            target, args = ttf.main, (data,)
+
+        # A stage dying while holding the scan lock blocks the others, so
+        # the pipeline is given up on after the session plus a grace time
+        pipeline = threading.Thread(target=target, args=args, daemon=True)
+        pipeline.start()
+        pipeline.join(duration + grace)
+        hung = pipeline.is_alive()
+        elapsed = time() - start
+
+        sink.flush()
+        signal_records = count_records(sink.directory)
+
+        reader = BarRingReader(ring.path)
+        ring_slots = len(reader.keys())
+        reader.close()
+        ring.close()
+
+    finally:
+
+        Stock.signal_sink = None
+        Stock.bar_ring = None
+        os.chdir(cwd)
+        tmp_dir.cleanup()
+        threading.excepthook = excepthook
+        scan.sleep = sleep
+        scan.RateLimiter = RateLimiter
+        scan.evaluate = evaluate
+
+        for name, original in originals.items():
+            setattr(Stock, name, original)
+
+        fake.stop()
+
+    stats = fake.stats()
+    latencies = [order['time'] - signals[order['symbol']]
+                 for order in stats['orders'] if order['symbol'] in signals]
+
+    return {
+        'symbols': symbols,
+        'elapsed': elapsed,
+        'requests': sum(stats['requests'].values()),
+        'requests_per_second': sum(stats['requests'].values()) / elapsed,
+        'requests_by_endpoint': stats['requests'],
+        'faults': stats['faults'],
+        'evaluations': dict(evaluations),
+        'evaluations_per_second': sum(evaluations.values()) / elapsed,
+        'signal_records': signal_records,
+        'ring_slots': ring_slots,
+        'signals': len(signals),
+        'orders': len(stats['orders']),
+        'signal_to_order_p50': percentile(latencies, 50),
+        'signal_to_order_p95': percentile(latencies, 95),
+        'signal_to_order_max': max(latencies) if latencies else None,
+        'evaluation_failures': dict(failures),
+        'skips': metrics.snapshot('skipped.'),
+        'demotions': metrics.snapshot('demoted.'),
+        'errors': dict(errors),
+        'hung': hung,
+        }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--symbols', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=120)
+    parser.add_argument('--latency', type=float, default=0.)
+    parser.add_argument('--jitter', type=float, default=0.)
+    parser.add_argument('--rate-limit', type=float, default=0.)
+    parser.add_argument('--timeouts', type=float, default=0.)
+    parser.add_argument('--timeout-delay', type=float, default=10.)
+    parser.add_argument('--signal-ratio', type=float, default=0.1)
+    parser.add_argument('--time-scale', type=float, default=0.01)
+    parser.add_argument('--warm-up', action='store_true')
+    parser.add_argument('--grace', type=float, default=60)
+    parser.add_argument('--strategies', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_logging()
+    report = run(args.symbols, args.duration, args.latency, args.jitter,
+                 args.rate_limit, args.timeouts, args.timeout_delay,
+                 args.signal_ratio, args.time_scale, args.warm_up,
+                 args.grace, args.strategies)
+
+    for key, value in report.items():
+        print('{:<24} {}'.format(key, value))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+from datetime import datetime
+from datetime import time
+from datetime import timedelta
+from statistics import median
+
+import logging
+from ttf_logger import debug_logger
+
+import pytz
+import requests
+
+eastern = pytz.timezone('America/New_York')
+
+
+class MarketCalendar:
+    """
+    Trading sessions of the exchange and the clock they are compared with.
+
+    Subclasses implement get_sessions(), returning a dict of
+    {date: (open datetime, close datetime)} for trading days only.
+    Sessions are fetched in blocks of 'lookahead' days and cached, unless
+    get_sessions() flagged them as a fallback (self.fallback), in which
+    case they are fetched again on the next lookup.
+    """
+
+    lookahead = 30
+
+    def __init__(self, now=None):
+
+        """
+        Clock source: a callable returning the current timezone-aware time
+        """
+        self.now = now or (lambda: datetime.now(eastern))
+
+        self.sessions = {}
+        self.fallback = False
+
+
+    def get_sessions(self, start, end):
+
+        raise NotImplementedError
+
+
+    def session(self, day):
+        """
+        Return the (open, close) datetimes of the given day, or None if the
+        market does not open that day
+        """
+
+        if day not in self.sessions:
+
+            end = day + timedelta(days=self.lookahead)
+            self.fallback = False
+            sessions = self.get_sessions(day, end)
+
+            if self.fallback:
+                return sessions.get(day)
+
+            cached_day = day
+
+            while cached_day <= end:
+                self.sessions[cached_day] = sessions.get(cached_day)
+                cached_day += timedelta(days=1)
+
+        return self.sessions[day]
+
+
+    def is_open(self):
+
+        now = self.now()
+        session = self.session(now.date())
+
+        return bool(session) and session[0] <= now < session[1]
+
+
+    def is_session_day(self):
+        """
+        True from the start of a trading day until the market closes
+        """
+
+        now = self.now()
+        session = self.session(now.date())
+
+        return bool(session) and now < session[1]
+
+
+    def seconds_to_close(self):
+
+        now = self.now()
+        session = self.session(now.date())
+
+        if not session:
+            return 0
+
+        return max((session[1] - now).total_seconds(), 0)
+
+
+    def next_open(self):
+        """
+        Return the next session open strictly after the current time
+        """
+
+        now = self.now()
+        day = now.date()
+
+        for _ in range(self.lookahead * 12):
+
+            session = self.session(day)
+
+            if session and session[0] > now:
+                return session[0]
+
+            day += timedelta(days=1)
+
+        raise LookupError("No market session found after {}".format(now))
+
+
+class LocalCalendar(MarketCalendar):
+    """
+    Stand-in calendar: every weekday is a session except for the given
+    holidays. Early closes can be given as {date: close time}
+    """
+
+    def __init__(self, holidays=(), early_closes=None, open_time=time(9, 30),
+                 close_time=time(16, 0), now=None):
+
+        MarketCalendar.__init__(self, now)
+
+        self.holidays = set(holidays)
+        self.early_closes = dict(early_closes or {})
+        self.open_time = open_time
+        self.close_time = close_time
+
+
+    def get_sessions(self, start, end):
+
+        sessions = {}
+        day = start
+
+        while day <= end:
+
+            if day.weekday() < 5 and day not in self.holidays:
+
+                close_time = self.early_closes.get(day, self.close_time)
+                sessions[day] = (
+                    eastern.localize(datetime.combine(day, self.open_time)),
+                    eastern.localize(datetime.combine(day, close_time))
+                    )
+
+            day += timedelta(days=1)
+
+        return sessions
+
+
+class AlpacaCalendar(MarketCalendar):
+    """
+    Sessions from the Alpaca calendar endpoint, which accounts for holidays
+    and early closes. Falls back to the local weekday rules (not cached)
+    if the API cannot be reached, and tries the API again after
+    retry_interval
+    """
+
+    retry_interval = timedelta(minutes=1)
+
+    def __init__(self, alpaca=None, now=None):
+
+        MarketCalendar.__init__(self, now)
+
+        self.alpaca = alpaca
+        self.retry_at = None
+
+
+    def get_sessions(self, start, end):
+
+        if self.alpaca is None:
+            from alpaca import Alpaca
+            self.alpaca = Alpaca()
+
+        if self.retry_at is not None and self.now() < self.retry_at:
+            self.fallback = True
+            return LocalCalendar(now=self.now).get_sessions(start, end)
+
+        try:
+            calendar = self.alpaca.get_calendar(start, end)
+
+        except (requests.RequestException, ValueError, KeyError):
+            debug_logger.debug("Calendar API unavailable, using local calendar")
+            self.fallback = True
+            self.retry_at = self.now() + self.retry_interval
+            return LocalCalendar(now=self.now).get_sessions(start, end)
+
+        self.retry_at = None
+
+        sessions = {}
+
+        for day in calendar:
+
+            session_date = datetime.strptime(day['date'], '%Y-%m-%d').date()
+            open_time = datetime.strptime(day['open'], '%H:%M').time()
+            close_time = datetime.strptime(day['close'], '%H:%M').time()
+
+            sessions[session_date] = (
+                eastern.localize(datetime.combine(session_date, open_time)),
+                eastern.localize(datetime.combine(session_date, close_time))
+                )
+
+        return sessions
+
+
+class AdaptiveInterval:
+    """
+    Sleep time between passes of a scan stage.
+
+    The base interval is scaled:
+
+        - by the number of candidates in the stage set, relative to
+          reference_candidates, so that the request rate of the stage stays
+          roughly constant (small sets are rescanned sooner). An empty set
+          waits the maximum interval
+        - by the ratio between the average and the current volatility of
+          the candidates, so that the stage speeds up when prices move
+          faster than usual in the session
+
+    The result is kept between min_factor and max_factor times the base.
+    """
+
+    def __init__(self, base, reference_candidates=10, min_factor=0.25,
+                 max_factor=4, smoothing=0.2):
+
+        self.base = base
+        self.reference_candidates = reference_candidates
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.smoothing = smoothing
+
+        self.average_volatility = None
+
+
+    def next(self, candidates, volatility=None):
+
+        if not candidates:
+            return self.base * self.max_factor
+
+        factor = candidates / self.reference_candidates
+
+        if volatility:
+
+            if self.average_volatility is None:
+                self.average_volatility = volatility
+
+            factor *= self.average_volatility / volatility
+
+            self.average_volatility += (
+                self.smoothing * (volatility - self.average_volatility))
+
+        factor = min(max(factor, self.min_factor), self.max_factor)
+
+        return self.base * factor
+
+
+def stage_volatility(stocks):
+    """
+    Median of the latest volatility measured for the given stocks
+    """
+
+    volatilities = [stock.volatility for stock in stocks
+                    if isinstance(stock.volatility, float)]
+
+    if not volatilities:
+        return None
+
+    return median(volatilities)
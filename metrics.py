@@ -0,0 +1,64 @@
+import threading
+from collections import Counter
+
+
+class Metrics:
+    """
+    Counters and gauges of the scan pipeline, shared by the stage threads.
+    Names are dotted paths, e.g. 'demoted.buy.ttl' (counter) or
+    'stage.buy.size' (gauge)
+    """
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.gauges = {}
+
+
+    def increment(self, name, value=1):
+
+        with self.lock:
+            self.counters[name] += value
+
+
+    def gauge(self, name, value):
+
+        with self.lock:
+            self.gauges[name] = value
+
+
+    def get(self, name):
+
+        with self.lock:
+
+            if name in self.gauges:
+                return self.gauges[name]
+
+            return self.counters[name]
+
+
+    def snapshot(self, prefix=''):
+        """
+        Return a dict of the counters and gauges whose name starts with
+        prefix
+        """
+
+        with self.lock:
+
+            values = dict(self.counters)
+            values.update(self.gauges)
+
+        return {name: value for name, value in sorted(values.items())
+                if name.startswith(prefix)}
+
+
+    def reset(self):
+
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+
+
+# Metrics of the scan session
+metrics = Metrics()
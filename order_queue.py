@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
+from ttf_logger import debug_logger, error_logger
+
+from alpaca import Alpaca
+from api_client import API_ERRORS
+
+
+class OrderQueue:
+    """
+    Submits orders in the background, so that the stage finding a buy can
+    keep evaluating its other candidates while the order is in flight.
+
+    For every order, the pre-trade lookups (asset check and bracket prices
+    from the last quote) run concurrently on the lookups executor, then
+    the order is posted from the orders executor. The outcome is reported
+    with report(stock, placed), called from the order thread: reports
+    updating shared scan state must take the scan lock themselves.
+
+    One order per symbol can be in flight at a time.
+    """
+
+    def __init__(self, workers=2, alpaca=None):
+
+        self.alpaca = alpaca or Alpaca()
+
+        self.orders = ThreadPoolExecutor(workers, thread_name_prefix='Orders')
+        self.lookups = ThreadPoolExecutor(2 * workers,
+                                          thread_name_prefix='Lookups')
+
+        self.lock = threading.Lock()
+        self.in_flight = set()
+
+
+    def submit(self, stock, side, qty, report):
+        """
+        Queue an order for the stock. Return False (and queue nothing) if
+        an order for the symbol is already in flight
+        """
+
+        with self.lock:
+
+            if stock.symbol in self.in_flight:
+                return False
+
+            self.in_flight.add(stock.symbol)
+
+        self.orders.submit(self.place, stock, side, qty, report)
+
+        debug_logger.debug("Order for '{}' queued".format(stock.symbol))
+
+        return True
+
+
+    def place(self, stock, side, qty, report):
+        """
+        Run the pre-trade lookups concurrently, post the order and report
+        the outcome
+        """
+
+        symbol = stock.symbol
+
+        try:
+
+            tradable = self.lookups.submit(self.alpaca.is_tradable, symbol)
+            brackets = self.lookups.submit(self.alpaca.take_and_stop, symbol)
+
+            placed = bool(tradable.result() and
+                          self.alpaca.submit_order(symbol, side, qty,
+                                                   *brackets.result()))
+
+        except API_ERRORS:
+
+            error_logger.error("Order for '{}' failed".format(symbol),
+                               exc_info=True)
+            placed = False
+
+        try:
+            report(stock, placed)
+
+        except Exception:
+            error_logger.error("Order report for '{}' failed".format(symbol),
+                               exc_info=True)
+
+        finally:
+
+            with self.lock:
+                self.in_flight.discard(symbol)
+
+
+    def pending(self, symbol):
+
+        return symbol in self.in_flight
+
+
+    def shutdown(self, wait=True):
+        """
+        Stop accepting orders. With wait, return once the queued orders
+        are placed and reported
+        """
+
+        self.orders.shutdown(wait=wait)
+        self.lookups.shutdown(wait=wait)
@@ -0,0 +1,31 @@
+import threading
+from time import monotonic
+from time import sleep
+
+
+class RateLimiter:
+    """
+    Space calls at least 'interval' seconds apart, across all the threads
+    sharing the limiter. wait() reserves the next free slot and sleeps
+    until it, so N threads sharing a limiter make no more calls than one
+    thread pausing 'interval' seconds between calls
+    """
+
+    def __init__(self, interval):
+
+        self.interval = interval
+
+        self.lock = threading.Lock()
+        self.next_time = 0.
+
+
+    def wait(self):
+
+        with self.lock:
+
+            now = monotonic()
+            slot = max(now, self.next_time)
+            self.next_time = slot + self.interval
+
+        if slot > now:
+            sleep(slot - now)
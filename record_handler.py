@@ -1,10 +1,18 @@
+import os
 import json
+import threading
 from datetime import datetime
 
-from stock_data import Stock
+from stock_registry import registry as stock_registry
 
 positions_file = 'open_positions.json'
-trades_file = 'trades.json'
+trades_file = 'trades.jsonl'
+trades_index_file = 'trades.idx.json'
+
+# Serializes the ledger and index updates of concurrent callers (e.g. the
+# sell stages of several strategies storing their trades, and readers
+# indexing the ledger): an index update may truncate a line being appended
+trades_lock = threading.Lock()
 
 def store_open_positions(bought):
     """
@@ -21,22 +29,160 @@ def store_open_positions(bought):
         json.dump(positions, f, indent=4)
 
 
-def store_new_trades(new_trades):
+def store_new_trades(new_trades, day=None):
+    """
+    - wrap each trade (position record) with its date and symbol
+    - append them to the trades ledger (JSON Lines) in a single write
+    - update the date / symbol index of the ledger
+    """
+    global trades_file
+
+    day = day or datetime.now().strftime('%Y-%m-%d')
+
+    lines = [json.dumps({'date': day,
+                         'symbol': trade_symbol(trade),
+                         'trade': trade}) + '\n'
+             for trade in new_trades]
+
+    if not lines:
+        return
+
+    with trades_lock:
+
+        # Index first, so a line torn by a previous crash is cut off
+        # before appending after it
+        update_trades_index()
+
+        fd = os.open(trades_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        try:
+            os.write(fd, ''.join(lines).encode())
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        update_trades_index()
+
+
+def trade_symbol(trade):
+    """
+    Position records are either flat, or keyed by symbol: {symbol: {...}},
+    possibly next to top level fields such as 'sold on'
+    """
+
+    if 'symbol' in trade:
+        return trade['symbol']
+
+    symbols = [key for key, value in trade.items() if isinstance(value, dict)]
+
+    if len(symbols) == 1:
+        return symbols[0]
+
+    return ''
+
+
+def load_trades_index():
+
+    global trades_index_file
+
+    try:
+        with open(trades_index_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'size': 0, 'dates': {}}
+
+
+def update_trades_index():
+    """
+    Index the lines appended to the ledger since the last update:
+
+        {'size': bytes indexed, 'dates': {date: {symbol: [[offset, length]]}}}
+
+    A last line without newline (torn write) is truncated from the ledger
+    """
+    global trades_file, trades_index_file
+
+    index = load_trades_index()
+
+    if not os.path.exists(trades_file):
+        return index
+
+    if os.path.getsize(trades_file) < index['size']:
+        index = {'size': 0, 'dates': {}}
+
+    offset = index['size']
+
+    with open(trades_file, 'rb+') as f:
+
+        f.seek(offset)
+
+        for line in f:
+
+            if not line.endswith(b'\n'):
+                f.truncate(offset)
+                break
+
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                offset += len(line)
+                continue
+
+            symbols = index['dates'].setdefault(entry['date'], {})
+            symbols.setdefault(entry['symbol'], []).append([offset, len(line)])
+            offset += len(line)
+
+    index['size'] = offset
+
+    tmp_file = trades_index_file + '.tmp'
+
+    with open(tmp_file, 'w') as f:
+        json.dump(index, f)
+
+    os.replace(tmp_file, trades_index_file)
 
+    return index
+
+
+def get_trades(day=None, symbol=None):
+    """
+    Return the ledger entries for the given date and / or symbol, reading
+    only the matching lines
+    """
     global trades_file
 
-    with open(trades_file, 'r') as f:
+    # Indexed lines are complete, they are read outside the lock
+    with trades_lock:
+        index = update_trades_index()
+
+    spans = []
+
+    for date, symbols in index['dates'].items():
+
+        if day is not None and date != day:
+            continue
 
-        trades = json.load(f)
+        for indexed_symbol, symbol_spans in symbols.items():
 
-    trades += new_trades
+            if symbol is None or indexed_symbol == symbol:
+                spans += symbol_spans
 
-    with open(trades_file, 'w') as f:
+    trades = []
 
-        json.dump(trades, f, indent=4)
+    if not spans:
+        return trades
 
+    with open(trades_file, 'rb') as f:
 
-def get_open_positions():
+        for offset, length in sorted(spans):
+
+            f.seek(offset)
+            trades.append(json.loads(f.read(length)))
+
+    return trades
+
+
+def get_open_positions(registry=stock_registry):
 
     global positions_file
     
@@ -44,17 +190,26 @@ def get_open_positions():
 
         positions_list = json.load(f)
     
-    return stocks_from_positions_list(positions_list)
+    return stocks_from_positions_list(positions_list, registry)
     
 
-def stocks_from_positions_list(positions_list):
+def stocks_from_positions_list(positions_list, registry=stock_registry):
+    """
+    Return the registry stocks of the stored position records ({symbol:
+    {...}}), marked open and holding their record
+    """
 
     open_positions = set()
 
     for position in positions_list:
-        for symbol in position.keys():
+        for symbol, position_record in position.items():
+
+            if not isinstance(position_record, dict):
+                continue
             
-            stock = Stock(symbol, open=True)
+            stock = registry.get(symbol)
+            stock.open = True
+            stock.position_record = {symbol: position_record}
             open_positions.add(stock)
     
     return open_positions
\ No newline at end of file
@@ -0,0 +1,137 @@
+from datetime import datetime
+from time import localtime
+
+from lazy_import import LazyModule
+
+pd = LazyModule('pandas')
+
+
+class Resampler:
+    """
+    Incrementally aggregate bars of a base period into bars of a longer
+    period, using the same bins as Stock.alpaca_data_resample():
+
+        - bins of 'period' seconds, shifted by 'offset' seconds, aligned on
+          local time or on the given timezone (e.g. the exchange one for
+          daily bars)
+        - open of the first base bar, high max, low min, close of the last
+          base bar and volume sum of each bin
+        - a bin is completed once its last base bar, or a bar of a later
+          bin, has been received. Only completed bins are returned unless
+          the partial one is asked for
+
+    Bars of a completed bin received again are ignored, bars of the open
+    bin received again replace the previous version (the last bar of a
+    request is usually still being formed).
+
+    With require_open, bins without a base bar at their start time are
+    dropped, as alpaca_data_resample() does (its open is taken with asfreq,
+    so a missing first bar gives NaN and the bin is dropped). The close
+    still differs on gapped data: here it is the last bar of the bin,
+    while alpaca_data_resample() takes the bar three rows after the first
+    one, which belongs to the next bin when bars are missing inside the bin.
+    """
+
+    columns = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, period, offset=0, base_period=60, tz=None,
+                 max_bins=1000, require_open=False):
+
+        self.period = period
+        self.offset = offset
+        self.base_period = base_period
+        self.tz = tz
+        self.max_bins = max_bins
+        self.require_open = require_open
+
+        self.bins = []
+        self.current = {}
+        self.current_start = None
+
+
+    def bin_start(self, t):
+
+        if self.tz is None:
+            gmtoff = localtime(t).tm_gmtoff
+        else:
+            gmtoff = datetime.fromtimestamp(t, self.tz).utcoffset().total_seconds()
+
+        local = t + gmtoff
+
+        return int((local - self.offset) // self.period * self.period
+                   + self.offset - gmtoff)
+
+
+    def seed(self, data):
+        """
+        Preload completed bins (frame with epoch 'time' and OHLCV columns)
+        """
+
+        self.bins = [tuple(row) for row in
+                     zip(*(data[column].values for column in self.columns))]
+        self.bins = self.bins[-self.max_bins:]
+        self.current = {}
+        self.current_start = None
+
+
+    def update(self, data):
+        """
+        Add base bars (frame with epoch 'time' and OHLCV columns)
+        """
+
+        for row in zip(*(data[column].values for column in self.columns)):
+
+            t = int(row[0])
+            start = self.bin_start(t)
+
+            if self.bins and start <= self.bins[-1][0]:
+                continue
+
+            if self.current_start is not None and start > self.current_start:
+                self.close_bin()
+
+            self.current_start = start
+            self.current[t] = row[1:]
+
+        if (self.current and
+            max(self.current) >= self.current_start + self.period - self.base_period):
+
+            self.close_bin()
+
+
+    def aggregate(self):
+
+        times = sorted(self.current)
+        bars = [self.current[t] for t in times]
+
+        return (self.current_start,
+                bars[0][0],
+                max(bar[1] for bar in bars),
+                min(bar[2] for bar in bars),
+                bars[-1][3],
+                sum(bar[4] for bar in bars))
+
+
+    def has_open(self):
+
+        return not self.require_open or self.current_start in self.current
+
+
+    def close_bin(self):
+
+        if self.has_open():
+            self.bins.append(self.aggregate())
+            self.bins = self.bins[-self.max_bins:]
+
+        self.current = {}
+        self.current_start = None
+
+
+    def frame(self, include_partial=False):
+
+        bins = list(self.bins)
+
+        if include_partial and self.current and self.has_open():
+            bins.append(self.aggregate())
+
+        return pd.DataFrame(bins, columns=self.columns)
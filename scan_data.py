@@ -1,40 +1,58 @@
 import threading
-from datetime import datetime
-from datetime import time 
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
 
 import logging
-from ttf_logger import debug_logger, stock_logger
+from ttf_logger import debug_logger, error_logger, stock_logger
 
 import record_handler as record
 from alpaca import Alpaca
+from api_client import API_ERRORS
+from journal import Journal
+from metrics import metrics
+from order_queue import OrderQueue
+from market_calendar import AlpacaCalendar, AdaptiveInterval, stage_volatility
+from symbol_priority import PriorityScheduler
+from rate_limiter import RateLimiter
+from stage_expiry import StageExpiry
 from stock_data import Stock
-from yahoo_parser import yahoo_watchlist
+from stock_registry import registry as stock_registry
+from screener import screened_watchlist
+
+# Exchange calendar and clock source driving the scan loops
+calendar = AlpacaCalendar()
 
 
 class ScanThread(threading.Thread):
 
-    def __init__(self, target, name, args, lock):
+    def __init__(self, target, name, args, lock, workers=1):
 
         threading.Thread.__init__(self)
         self.name = name
         self.target = target
         self.args = args
         self.lock = lock
+        self.workers = workers
 
     def run(self):
         self.lock.acquire()
         self.lock.release()
-        self.target(*self.args)
+        self.target(*self.args, workers=self.workers)
 
 
-def initialize_data():
+def initialize_data(universe=screened_watchlist, registry=stock_registry,
+                    journal=None, watchlist=None, positions=True):
     """    
     Create a dict of:
         
         - initial set of Stock objects from:
             - Manually created Alpaca watchlist            
-            - Automatic selection of stocks from Yahoo Finance watchlists        
+            - Automatic selection of stocks returned by 'universe': by
+              default the screener over all tradable symbols, or e.g.
+              yahoo_parser.yahoo_watchlist for Yahoo Finance watchlists.
+              When called before the open (run_sessions() warm-up), the
+              screener selects on the previous session's change, not the
+              current one's
         
         - 3 empty sets to be populated by stocks that:
             - show strong potential after trend scan
@@ -44,223 +62,753 @@ def initialize_data():
         - a set of dictionaries containing information on open positions
         
         - a list of completed trades to be saved and later analized
+
+        - the journal of state transitions of the session
+
+        - the registry holding the single Stock object of each symbol,
+          shared by the watchlist and the open positions
+
+        - the expiry rules (TTL, maximum size) of the stage sets
+
+    If the journal holds a session from today (e.g. after a crash), the
+    watchlist, stage sets and position records are resumed from it
+    instead of calling the APIs again.
+
+    The journal (default: journal.journal_file), the watchlist (a callable
+    returning the symbols, default: build_watchlist(universe)) and whether
+    the open positions file is read can be given, e.g. by strategy_host
+    for each of its strategies
     """
     
-    trades = {}
-    trades[datetime.now().strftime('%Y-%m-%d')] = set()
+    if journal is None:
+        journal = Journal()
 
-    a = Alpaca()
-    watchlist = a.get_watchlist_symbols()
-    watchlist.update(yahoo_watchlist())
+    state = journal.replay()
 
-    stock_logger.info("Initialized watchlist with '{}' symbols".format(len(watchlist)))
+    if state['universe']:
+
+        symbols = set(state['universe'])
+        stock_logger.info("Resumed watchlist with '{}' symbols from journal".format(len(symbols)))
+
+    else:
+
+        if watchlist is None:
+            symbols = build_watchlist(universe)
+        else:
+            symbols = set(watchlist())
+
+        journal.record('universe', symbols=sorted(symbols))
+
+        stock_logger.info("Initialized watchlist with '{}' symbols".format(len(symbols)))
 
     stocks = {
-        'initial': {Stock(symbol) for symbol in watchlist},
+        'initial': registry.get_many(symbols),
         'potential': set(),
         'standby': set(),
         'buy': set(),
-        'bought': record.get_open_positions(),
-        'trades': trades
+        'bought': record.get_open_positions(registry) if positions else set(),
+        'trades': [],
+        'journal': journal,
+        'registry': registry,
+        'expiry': StageExpiry()
         }
 
+    resume_from_journal(stocks, state)
+
     debug_logger.debug("Created stocks dictionary")
 
     return stocks
 
 
-def trend_scan(stocks, lock, sleep_time=1800):
+def build_watchlist(universe=screened_watchlist):
+    """
+    Symbols of the session: the manually created Alpaca watchlist and the
+    automatic selection returned by 'universe'
+    """
+
+    a = Alpaca()
+    watchlist = a.get_watchlist_symbols()
+    watchlist.update(universe())
+
+    return watchlist
+
+
+def resume_from_journal(stocks, state):
+    """
+    Restore stage sets membership and open position records replayed
+    from the journal into the stocks dictionary
+    """
+
+    by_symbol = {stock.symbol: stock for stock in stocks['initial']}
+    bought = {stock.symbol: stock for stock in stocks['bought']}
+
+    for stage in ('potential', 'standby', 'buy'):
+
+        stocks[stage].update(by_symbol[symbol] for symbol in state[stage]
+                             if symbol in by_symbol)
+
+    for symbol, position_record in state['bought'].items():
+
+        stock = (bought.get(symbol) or by_symbol.get(symbol) or
+                 stocks.get('registry', stock_registry).get(symbol))
+        stock.open = True
+        stock.position_record = position_record
+        stocks['bought'].add(stock)
+
+    debug_logger.debug("Resumed {} open positions from journal".format(len(state['bought'])))
+
+
+def journal_event(stocks, event, stock, **data):
+    """
+    Append a state transition to the session journal, if there is one
+    """
+
+    journal = stocks.get('journal')
+
+    if journal is not None:
+        journal.record(event, stock.symbol, **data)
+
+
+def promote(stocks, stock, stage):
+    """
+    Add the stock to a stage set, journaling the transition only if it
+    was not already there. Either way its signal is confirmed (see
+    confirm())
+    """
+
+    if stock not in stocks[stage]:
+        stocks[stage].add(stock)
+        journal_event(stocks, 'promote', stock, stage=stage)
+
+    confirm(stocks, stock, stage)
+
+
+def confirm(stocks, stock, stage):
+    """
+    Restart the TTL of a stock in a stage set, if there are expiry rules
+    """
+
+    expiry = stocks.get('expiry')
+
+    if expiry is not None:
+        expiry.confirm(stage, stock)
+
+
+def claim(stocks, stock):
+    """
+    Reserve the symbol of the stock for the strategy of the stocks
+    dictionary, when several strategies trade the same account (see
+    strategy_host.SymbolClaims). Return False if another strategy holds it
+    """
+
+    claims = stocks.get('claims')
+
+    if claims is None:
+        return True
+
+    return claims.claim(stock.symbol, stocks.get('strategy'))
+
+
+def release(stocks, stock):
+    """
+    Free the symbol of the stock for the other strategies, once the
+    strategy has no order nor position on it
+    """
+
+    claims = stocks.get('claims')
+
+    if claims is not None:
+        claims.release(stock.symbol, stocks.get('strategy'))
+
+
+def demote(stocks, stock, stage, reason):
+    """
+    Remove the stock from a stage set, journaling and counting the
+    transition by reason:
+
+        - 'signal': the signal of the stage disappeared
+        - 'promoted': moved up to the next stage
+        - 'ttl', 'evicted': expired (see StageExpiry)
+
+    Trend verdicts hold for the whole day, so a stock leaving the
+    potential set also leaves the initial one, instead of being promoted
+    again by the next trend pass
+    """
+
+    if stock not in stocks[stage]:
+        return
+
+    stocks[stage].discard(stock)
+
+    if stage == 'potential':
+        stocks['initial'].discard(stock)
+
+    expiry = stocks.get('expiry')
+
+    if expiry is not None:
+        expiry.forget(stage, stock)
+
+    metrics.increment('demoted.{}.{}'.format(stage, reason))
+    journal_event(stocks, 'demote', stock, stage=stage, reason=reason)
+
+    stock_logger.info("'{}' left the {} set ({})".format(stock.symbol, stage, reason))
+
+
+def settle_trend(stocks, stock):
+    """
+    Act on the trend verdict of an evaluated stock: promote it to the
+    potential set, or drop it from the initial set, as its verdict holds
+    for the whole day (see Stock.get_trend_memo()) and evaluating it again
+    would only wait on the pacer for the same answer. Stocks whose
+    evaluation failed are left in the initial set, to be retried
+    """
+
+    if stock.potential == 2:
+        promote(stocks, stock, 'potential')
+    else:
+        stocks['initial'].discard(stock)
+        metrics.increment('dropped.initial.trend')
+
+
+def expire(stocks, stage):
+    """
+    Apply the expiry rules of a stage set before a pass, and record the
+    size of the set left to scan
+    """
+
+    expiry = stocks.get('expiry')
+
+    if expiry is not None:
+
+        for stock, reason in expiry.expired(stage, stocks[stage]):
+            demote(stocks, stock, stage, reason)
+
+    metrics.gauge('stage.{}.size'.format(stage), len(stocks[stage]))
+
+
+def warm_up(stocks, *others):
+    """
+    Pre-market warm-up of the initial set, so that the first live passes
+    run on data already fetched and verdicts already computed:
+
+        - prefetch the trend history of all stocks, with one request per
+          timeframe and chunk of symbols
+        - compute trend verdicts (memoized for the session) and populate
+          the potential set, then drop the trend bars nobody used
+        - prefetch the tactical history of the potential set only, and
+          seed the tactical resampler of its stocks in single fetch mode
+
+    The stocks dictionaries of other strategies (see strategy_host) are
+    warmed up along, sharing the bulk requests of the symbols they have in
+    common.
+
+    Prefetching is best effort: symbols whose bars could not be fetched
+    in bulk are fetched on demand by the stages
+    """
+
+    stocks_dicts = (stocks,) + others
+    initial = [[stock for stock in stocks['initial'] if not stock.open]
+               for stocks in stocks_dicts]
+
+    prefetch_history([stock for stage_stocks in initial for stock in stage_stocks], 0)
+
+    for stocks, stage_stocks in zip(stocks_dicts, initial):
+
+        for stock in stage_stocks:
+
+            if evaluate(stock, 'get_trend_potential'):
+                settle_trend(stocks, stock)
+
+            stock.prefetched.clear()
+
+    potential = [stock for stocks, stage_stocks in zip(stocks_dicts, initial)
+                 for stock in stage_stocks if stock in stocks['potential']]
+
+    prefetch_history(potential, 1)
+
+    for stock in potential:
+
+        if stock.base_timeframe:
+
+            try:
+                stock.get_resampled_data(stock.tactical_timeframe)
+            except API_ERRORS:
+                error_logger.error("Seeding tactical bars failed for '{}'".format(stock.symbol),
+                                   exc_info=True)
+
+    for stocks in stocks_dicts:
+        stock_logger.info("{} stocks have potential after warm-up".format(len(stocks['potential'])))
+
+
+def prefetch_history(stage_stocks, stage):
+    """
+    Prefetch the history request of the given stage (0: trend, 1: tactical,
+    see Stock.get_history_requests()) for each stock, with one bulk request
+    per timeframe. Failed bulk requests are logged and skipped
+    """
+
+    history_requests = {}
+
+    for stock in stage_stocks:
+        history_request = stock.get_history_requests()[stage]
+        history_requests.setdefault(history_request, []).append(stock)
+
+    for (timeframe, limit), group in history_requests.items():
+
+        try:
+            bulk_data = Stock.get_bulk_data({stock.symbol for stock in group},
+                                            timeframe, limit)
+        except API_ERRORS:
+            error_logger.error("Prefetch of '{}' bars failed for {} symbols".format(
+                                timeframe, len(group)), exc_info=True)
+            continue
+
+        for stock in group:
+            if stock.symbol in bulk_data:
+                stock.prefetch(timeframe, limit, bulk_data[stock.symbol])
+
+
+def evaluate(stock, getter):
+    """
+    Call one of the potential getters of the stock. API errors (failed
+    calls, unusable responses) are logged instead of raised, so that a
+    failing symbol or endpoint does not stop its stage. Other exceptions
+    are bugs and are raised. Return True if the evaluation succeeded
+    """
+
+    try:
+        getattr(stock, getter)()
+    except API_ERRORS:
+        error_logger.error("{}() failed for '{}'".format(getter, stock.symbol),
+                           exc_info=True)
+        return False
+
+    return True
+
+
+def stage_pool(workers):
+    """
+    Bounded pool of threads spreading the per-stock work of a stage, or
+    None to evaluate the stocks in the stage thread
+    """
+
+    if workers > 1:
+        return ThreadPoolExecutor(max_workers=workers,
+                                  thread_name_prefix=threading.current_thread().name)
+
+    return None
+
+
+def evaluate_all(pool, stage_stocks, getter, pacer=None):
+    """
+    Evaluate the stocks with one of their potential getters, on the stage
+    pool if there is one. Evaluations wait for the pacer of the stage,
+    shared by all its workers, so more workers overlap API latency without
+    raising the request rate of the stage.
+
+    Return (stock, evaluated) pairs in the given order. Stage sets are only
+    updated from these results, by the stage thread
+    """
+
+    def task(stock):
+
+        if pacer is not None:
+            pacer.wait()
+
+        evaluated = evaluate(stock, getter)
+        debug_logger.debug("{}() called for '{}'".format(getter, stock.symbol))
+
+        return evaluated
+
+    stage_stocks = list(stage_stocks)
+
+    if pool is None:
+        results = map(task, stage_stocks)
+    else:
+        results = pool.map(task, stage_stocks)
+
+    return list(zip(stage_stocks, results))
+
+
+def due_candidates(priority, stage_stocks):
+    """
+    Start a new pass of the priority scheduler over the stage set and
+    return the due stocks to evaluate. Stocks with an open position stay
+    due on the next pass without being evaluated
+    """
+
+    candidates = []
+
+    for stock in priority.due(stage_stocks):
+
+        if stock.open:
+            priority.skip(stock)
+        else:
+            candidates.append(stock)
+
+    return candidates
+
+
+def trend_scan(stocks, lock, sleep_time=1800, *, workers=1):
     """
     Scan the trend data timeframe for potential, then populate the 
     potential stocks set and discard the stock if it shows no potential
     """
 
+    interval = AdaptiveInterval(sleep_time)
+    pool = stage_pool(workers)
+    pacer = RateLimiter(0.2)
+
     while market_open():
 
-        lock.acquire()
-        debug_logger.debug("Lock acquired by trend_scan()")
+        with lock:
 
-        for stock in stocks['initial']:
+            debug_logger.debug("Lock acquired by trend_scan()")
 
-            if not stock.open:
+            # Potential stocks keep their verdict (memoized for the day) and
+            # are confirmed by the tactical stage from then on
+            candidates = [stock for stock in stocks['initial']
+                          if not stock.open and stock not in stocks['potential']]
 
-                stock.get_trend_potential()
+            for stock, evaluated in evaluate_all(pool, candidates,
+                                                 'get_trend_potential', pacer):
 
-                debug_logger.debug("get_trend_potential() called for '{}'".format(stock.symbol))
+                if evaluated:
+                    settle_trend(stocks, stock)
 
-                if stock.potential == 2:
-                    stocks['potential'].add(stock)
-
-                sleep(0.2)     
-            
-        lock.release()
         debug_logger.debug("Lock released by trend_scan()")
 
         stock_logger.info("{} stocks have potential after trend scan".format(len(stocks['potential'])))
 
-        sleep(sleep_time)
+        stage_sleep(stocks, 'initial', interval)
 
+    if pool is not None:
+        pool.shutdown()
 
-def tactical_scan(stocks, lock, sleep_time=600):
+
+def tactical_scan(stocks, lock, sleep_time=600, *, workers=1):
     """
-    Scan the tactical timeframe data of each stock for potential,
-    discard the stock if it shows no potential, then populate the
-    standby set or buy set
+    Scan the tactical timeframe data of each stock for potential, then
+    populate the standby set or buy set. Stocks whose tactical signal
+    weakened or disappeared are demoted from the buy and standby sets, and
+    potential stocks without tactical signal for too long expire
     """
 
+    interval = AdaptiveInterval(sleep_time)
+    priority = PriorityScheduler(scale=0.1)
+    pool = stage_pool(workers)
+    pacer = RateLimiter(1)
+
     while market_open():
 
-        lock.acquire()
-        debug_logger.debug("Lock acquired by tactical_scan()")
+        with lock:
 
-        for stock in stocks['potential']: 
-        
-            if not stock.open:
-                
-                stock.get_tactical_potential()
+            debug_logger.debug("Lock acquired by tactical_scan()")
+
+            expire(stocks, 'potential')
+            candidates = due_candidates(priority, stocks['potential'])
+
+            for stock, evaluated in evaluate_all(pool, candidates,
+                                                 'get_tactical_potential', pacer):
+
+                if not evaluated:
+                    priority.skip(stock)
+                    continue
 
-                debug_logger.debug("get_tactical_potential() called for '{}'".format(stock.symbol))
+                priority.reschedule(stock, stock.distance)
+
+                if stock.potential:
+                    confirm(stocks, stock, 'potential')
 
                 if stock.potential == 2:
-                    stocks['buy'].add(stock)
+                    promote(stocks, stock, 'buy')
+                    demote(stocks, stock, 'standby', 'promoted')
 
                 elif stock.potential == 1:   
-                    stocks['standby'].add(stock)
+                    promote(stocks, stock, 'standby')
+                    demote(stocks, stock, 'buy', 'signal')
+
+                else:
+                    demote(stocks, stock, 'standby', 'signal')
+                    demote(stocks, stock, 'buy', 'signal')
 
-            sleep(1)
-            
-        lock.release()
         debug_logger.debug("Lock released by tactical_scan()")
 
         stock_logger.info("{} stocks have potential after tactical scan".format(len(stocks['buy'])))
         stock_logger.info("{} stocks remain in standby after tactical scan".format(len(stocks['standby'])))
 
-        sleep(sleep_time)
+        stage_sleep(stocks, 'potential', interval)
+
+    if pool is not None:
+        pool.shutdown()
 
 
 
-def standby_scan(stocks, lock, sleep_time=120):
+def standby_scan(stocks, lock, sleep_time=120, *, workers=1):
     """
-    Re-scan the tactical timeframe for stocks that showed weak potential
+    Re-scan the tactical timeframe for stocks that showed weak potential,
+    moving them to the buy set on a strong signal and dropping them when
+    the signal disappears or expires
     """
 
+    interval = AdaptiveInterval(sleep_time)
+    priority = PriorityScheduler(scale=0.1)
+    pool = stage_pool(workers)
+    pacer = RateLimiter(1)
+
     while market_open():
 
-        lock.acquire()
-        debug_logger.debug("Lock acquired by standby_scan()")
+        with lock:
+
+            debug_logger.debug("Lock acquired by standby_scan()")
+
+            expire(stocks, 'standby')
+            candidates = due_candidates(priority, stocks['standby'])
 
-        for stock in stocks['standby']:
-            
-            if not stock.open:
+            for stock, evaluated in evaluate_all(pool, candidates,
+                                                 'get_tactical_potential', pacer):
 
-                stock.get_tactical_potential()
+                if not evaluated:
+                    priority.skip(stock)
+                    continue
 
-                debug_logger.debug("get_tactical_potential() called for '{}'".format(stock.symbol))
+                priority.reschedule(stock, stock.distance)
 
                 if stock.potential == 2: 
-                    stocks['buy'].add(stock)
+                    promote(stocks, stock, 'buy')
+                    demote(stocks, stock, 'standby', 'promoted')
+
+                elif stock.potential == 1:
+                    confirm(stocks, stock, 'standby')
+
+                else:
+                    demote(stocks, stock, 'standby', 'signal')
 
-            sleep(1)
-            
-        lock.release()
         debug_logger.debug("Lock released by standby_scan()")
 
         stock_logger.info("{} have potential after standby scan".format(len(stocks['buy'])))
         
-        sleep(sleep_time)
+        stage_sleep(stocks, 'standby', interval)
+
+    if pool is not None:
+        pool.shutdown()
     
 
 
-def execute_scan(stocks, lock, sleep_time=60):
+def order_report(stocks, lock, qty):
+    """
+    Return the report callback of the orders queued by execute_scan(): on
+    a placed order, open the position of the stock under the scan lock
+    """
+
+    def report(stock, placed):
+
+        if not placed:
+
+            release(stocks, stock)
+
+            stock_logger.info("Order of {} stocks of '{}' was not placed".format(
+                               qty, stock.symbol))
+            return
+
+        with lock:
+
+            stock.open_position()
+            stocks['bought'].add(stock)
+            journal_event(stocks, 'buy', stock, record=stock.position_record)
+
+        stock_logger.info("Placed order of {} stocks of '{}'".format(qty, stock.symbol))
+
+    return report
+
+
+def execute_scan(stocks, lock, sleep_time=60, *, workers=1, orders=None):
     """
     - Scan price action to find the optimal moment for placing BUY order
-    - Place order
-    - Create dictionary with information on the position
+    - Queue the order, placed in the background (see OrderQueue) while
+      the scan goes on, without holding the lock
+    - Open the position of the stock once its order is placed
     """
 
+    interval = AdaptiveInterval(sleep_time)
+    priority = PriorityScheduler(scale=0.01)
+    pool = stage_pool(workers)
+    pacer = RateLimiter(2)
+
+    if orders is None:
+        orders = OrderQueue()
+
+    # TO-DO! Add functionality to calculate optimal position?
+    # Temporarily, an arbitrary amount of 10 shares is established
+    qty = 10
+    report = order_report(stocks, lock, qty)
+
     while market_open():
 
-        lock.acquire()
-        debug_logger.debug("Lock acquired by execute_scan()")
+        with lock:
 
-        for stock in stocks['buy']: 
-        
-            if not stock.open:
+            debug_logger.debug("Lock acquired by execute_scan()")
+
+            expire(stocks, 'buy')
+            candidates = []
+
+            # Stocks with an order in flight wait for its outcome
+            for stock in due_candidates(priority, stocks['buy']):
 
-                stock.get_execution_potential()
+                if orders.pending(stock.symbol):
+                    priority.skip(stock)
+                else:
+                    candidates.append(stock)
 
-                debug_logger.debug("get_execution_potential() called for '{}'".format(stock.symbol))
+            for stock, evaluated in evaluate_all(pool, candidates,
+                                                 'get_execution_potential', pacer):
+
+                if not evaluated:
+                    priority.skip(stock)
+                    continue
+
+                priority.reschedule(stock, stock.distance)
 
                 if stock.potential == 2:
-                    
-                    a = Alpaca()
-                    # TO-DO! Add functionality to calculate optimal position?
-                    # Temporarily, an arbitrary amount of 10 shares is established
-                    if a.place_order(stock.symbol, 'buy', 10):
-                        
-                        stock.open_position()
-                        stocks['bought'].add(stock)
-                        stock_logger.info("Placed order of 10 stocks of '{}'".format(stock.symbol))
-                        
+
+                    if claim(stocks, stock):
+                        orders.submit(stock, 'buy', qty, report)
                     else:
-                        continue
-                    
-                sleep(2)
-        
-        lock.release()
+                        debug_logger.debug("'{}' is held by another strategy".format(
+                                            stock.symbol))
+
         debug_logger.debug("Lock released by execute_scan()")
         
         stock_logger.info("Stocks of {} symbol were bought".format(len(stocks['bought'])))
 
-        sleep(sleep_time)
+        stage_sleep(stocks, 'buy', interval)
+
+    if pool is not None:
+        pool.shutdown()
+
+    # Queued orders are placed and reported before the stage ends
+    orders.shutdown()
 
 
-def sell_scan(stocks, lock, sleep_time=300):
+def sell_scan(stocks, lock, sleep_time=300, *, workers=1):
     """
     Scans open position's unrealized profit for optimal sell signal
     """
 
+    interval = AdaptiveInterval(sleep_time)
+    pool = stage_pool(workers)
+
     while market_open():
         
-        lock.acquire()
-        debug_logger.debug("Lock acquired by sell_scan()")
+        with lock:
 
-        for stock in stocks['bought']:
+            debug_logger.debug("Lock acquired by sell_scan()")
 
-            stock.get_sell_signal()
-            debug_logger.debug("get_sell_signal() called for '{}'".format(stock.symbol))
+            update_prices(stocks['bought'])
 
-            if stock.sell:
+            for stock, evaluated in evaluate_all(pool, stocks['bought'],
+                                                 'get_sell_signal'):
 
-                a = Alpaca()
-                a.close_position(stock.symbol)
-                stock.close_position()
+                if not evaluated:
+                    continue
+
+                journal_event(stocks, 'position', stock, record=stock.position_record)
+
+                if stock.sell:
+
+                    a = Alpaca()
+
+                    try:
+                        a.close_position(stock.symbol)
+                    except API_ERRORS:
+                        error_logger.error("close_position() failed for '{}'".format(stock.symbol),
+                                           exc_info=True)
+                        continue
+
+                    stock.close_position()
+                    stocks['bought'].discard(stock)
+                    release(stocks, stock)
+                    journal_event(stocks, 'sell', stock)
+
+                    stock_logger.info("Closed position of 10 stocks of '{}'".format(stock.symbol))
+                    stocks['trades'].append(stock.position_record)
+
+                    # Stored at once, not lost if the session crashes
+                    record.store_new_trades([stock.position_record])
+
+                else:
+                    continue
+
+                sleep(2)
 
-                stock_logger.info("Closed position of 10 stocks of '{}'".format(stock.symbol))
-                stocks['trades'].add(stock.position_record)
-            
-            else:
-                continue
-                
-            sleep(2)
-        
-        lock.release()
         debug_logger.debug("Lock released by sell_scan()")
         
         stock_logger.info("{} stocks were sold".format(len(stocks['trades'])))
 
-        sleep(sleep_time)
-    
-    record.store_new_trades(stocks['trades'])
+        stage_sleep(stocks, 'bought', interval)
 
+    if pool is not None:
+        pool.shutdown()
 
-def market_open():
+    if stocks.get('journal') is not None:
+        stocks['journal'].compact()
 
-    market_close = time(17, 00)
-    now = datetime.now()
-    current_time = time(now.hour, now.minute)
 
-    if current_time < market_close:
-        return True
+def update_prices(stage_stocks, timeframe='1Min'):
+    """
+    Set the last price of the stocks (close of their last bar, stamped
+    with the bar time) with one bulk request, so that the sell signals track the unrealized P&L
+    locally instead of reading every position from the broker. A failed
+    request is logged: the sell signals fall back to the broker
+    """
+
+    symbols = {stock.symbol for stock in stage_stocks}
+
+    if not symbols:
+        return
+
+    try:
+        bulk_columns = Stock.get_bulk_columns(symbols, timeframe, limit=1)
+    except API_ERRORS:
+        error_logger.error("Price update failed for {} symbols".format(len(symbols)),
+                           exc_info=True)
+        return
+
+    for stock in stage_stocks:
+
+        columns = bulk_columns.get(stock.symbol)
+
+        if columns is not None and len(columns['close']):
+            stock.set_price(columns['close'][-1], columns['time'][-1])
+
+
+def stage_sleep(stocks, stage, interval):
+    """
+    Sleep between passes of a stage, adapting the interval to the size and
+    volatility of the stage set and never sleeping past the market close.
+    While the set is empty, wake up every base interval to check if it
+    has been populated
+    """
+
+    stage_stocks = stocks[stage]
+    sleep_time = interval.next(len(stage_stocks), stage_volatility(stage_stocks))
+    sleep_time = min(sleep_time, calendar.seconds_to_close())
+
+    debug_logger.debug("Next '{}' scan in {:.0f} seconds".format(stage, sleep_time))
+
+    if stage_stocks:
+        sleep(sleep_time)
+        return
+
+    while sleep_time > 0 and not stocks[stage]:
+        sleep(min(interval.base, sleep_time))
+        sleep_time -= interval.base
+
+
+def market_open():
+    """
+    True on trading days until the market closes, according to the
+    exchange calendar
+    """
 
-    return False
\ No newline at end of file
+    return calendar.is_session_day()
@@ -0,0 +1,83 @@
+import logging
+from ttf_logger import debug_logger
+
+from lazy_import import LazyModule
+
+np = LazyModule('numpy')
+
+from alpaca import Alpaca
+from stock_data import Stock
+
+
+def screen(symbols, closes, previous_closes, min_price=20, max_price=800,
+           min_change=0.5):
+    """
+    Vectorized version of the yahoo_parser.filter_stocks() rules. RULES OUT:
+    - penny stocks
+    - too expensive stocks
+    - stocks with a change lower than min_change since the previous close
+    - crypto symbols (separated by '-')
+
+    Return the set of symbols that pass
+    """
+
+    symbols = np.asarray(symbols, dtype=object)
+    closes = np.asarray(closes, dtype=float)
+    previous_closes = np.asarray(previous_closes, dtype=float)
+
+    change = closes - previous_closes
+    not_crypto = np.array(['-' not in symbol for symbol in symbols], dtype=bool)
+
+    passed = ((min_price < closes) & (closes < max_price) &
+              (change > min_change) & not_crypto)
+
+    return set(symbols[passed])
+
+
+def last_closes(bulk_data):
+    """
+    From a dict of {symbol: daily bars}, return aligned arrays of symbols,
+    last closes and previous closes. Symbols without two bars are left out
+    """
+
+    symbols = []
+    closes = []
+    previous_closes = []
+
+    for symbol in sorted(bulk_data):
+
+        data = bulk_data[symbol]
+
+        if len(data) < 2:
+            continue
+
+        close = data['close'].values
+
+        symbols.append(symbol)
+        closes.append(close[-1])
+        previous_closes.append(close[-2])
+
+    return symbols, closes, previous_closes
+
+
+def screened_watchlist(symbols=None, **rules):
+    """
+    Screen the given symbols (default: every tradable US equity) with their
+    last two daily bars, fetched in multi-symbol requests.
+
+    The change is measured between the last two daily bars. Before the open
+    (e.g. during the pre-market warm-up) these are the previous two
+    sessions, so the screen selects the previous session's gainers, while
+    the Yahoo Finance source ranked the current session's movers
+    """
+
+    if symbols is None:
+        symbols = Alpaca().get_tradable_symbols()
+
+    bulk_data = Stock.get_bulk_data(symbols, 'day', limit=2)
+    watchlist = screen(*last_closes(bulk_data), **rules)
+
+    debug_logger.debug("{} of {} symbols passed the screener".format(
+                        len(watchlist), len(symbols)))
+
+    return watchlist
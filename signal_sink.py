@@ -0,0 +1,175 @@
+import os
+import json
+import threading
+from datetime import datetime
+from datetime import timedelta
+from time import time
+
+import logging
+from ttf_logger import debug_logger
+
+from market_calendar import eastern
+from lazy_import import LazyModule
+
+pd = LazyModule('pandas')
+
+signals_dir = 'signals'
+
+# Compact separators: smaller files, faster to write and read
+encode = json.JSONEncoder(separators=(',', ':')).encode
+
+
+class SignalSink:
+    """
+    Structured record of the signal evaluations (inputs and outputs of the
+    Stock potential getters), replacing the parsing of the free-text stock
+    log for post-session analysis.
+
+    Records are buffered in memory and appended in batches, every
+    flush_every records or at most flush_interval seconds after the first
+    buffered one (a timer flushes the tail of a burst), to JSON Lines files
+    partitioned by trading day (New York time):
+
+        <directory>/signals-YYYY-MM-DD.jsonl
+
+    Each line holds 'time' (epoch seconds), 'event' ('trend', 'tactical',
+    'execution' or 'sell'), 'symbol' and the fields of the event. Read them
+    back with load().
+    """
+
+    def __init__(self, directory=signals_dir, flush_every=1000,
+                 flush_interval=5.0):
+
+        self.directory = directory
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.buffer = []
+        self.timer = None
+
+        # Trading day of the last flushed record and its epoch bounds
+        self.day = (None, 0., 0.)
+
+
+    def emit(self, event, symbol, **fields):
+
+        record = {'time': time(), 'event': event, 'symbol': symbol}
+        record.update(fields)
+
+        with self.lock:
+
+            self.buffer.append(record)
+            full = len(self.buffer) >= self.flush_every
+
+            if not full and self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+        if full:
+            self.flush()
+
+
+    def flush(self):
+        """
+        Append the buffered records to their day files, with one write per
+        day file
+        """
+
+        # Held from taking a batch to writing it, so that batches are
+        # written in order. emit() only waits for the buffer lock
+        with self.write_lock:
+
+            with self.lock:
+
+                if self.timer is not None:
+                    self.timer.cancel()
+                    self.timer = None
+
+                records, self.buffer = self.buffer, []
+
+            if not records:
+                return
+
+            days = {}
+
+            for record in records:
+                days.setdefault(self.day_of(record['time']), []).append(
+                                encode(record) + '\n')
+
+            os.makedirs(self.directory, exist_ok=True)
+
+            for day, lines in days.items():
+                with open(day_path(self.directory, day), 'a') as f:
+                    f.write(''.join(lines))
+
+        debug_logger.debug("Flushed {} signal records".format(len(records)))
+
+
+    def day_of(self, timestamp):
+        """
+        Trading day ('YYYY-MM-DD', New York time) of an epoch timestamp.
+        The bounds of the last day are kept, so that records of the same
+        day are not converted one by one
+        """
+
+        day, start, end = self.day
+
+        if not start <= timestamp < end:
+
+            moment = datetime.fromtimestamp(timestamp, eastern)
+            midnight = eastern.localize(datetime(moment.year, moment.month,
+                                                 moment.day))
+            next_midnight = eastern.localize(datetime.combine(
+                                midnight.date() + timedelta(days=1),
+                                datetime.min.time()))
+
+            day = midnight.strftime('%Y-%m-%d')
+            self.day = (day, midnight.timestamp(), next_midnight.timestamp())
+
+        return day
+
+
+    def close(self):
+
+        self.flush()
+
+
+def day_path(directory, day):
+
+    return os.path.join(directory, 'signals-{}.jsonl'.format(day))
+
+
+def load(day, directory=signals_dir, event=None):
+    """
+    Read the signal records of a trading day ('YYYY-MM-DD') into a
+    DataFrame, one column per field, optionally keeping a single event.
+    The file is parsed in one go; if it holds partially written lines
+    (crash during a write), it is parsed line by line without them
+    """
+
+    with open(day_path(directory, day)) as f:
+        lines = f.read().splitlines()
+
+    if event is not None:
+        # Cheap filter on the raw lines, written with compact separators
+        tag = '"event":{}'.format(encode(event))
+        lines = [line for line in lines if tag in line]
+
+    try:
+        records = json.loads('[' + ','.join(lines) + ']')
+
+    except json.JSONDecodeError:
+        records = list(filter(None, map(decode_line, lines)))
+
+    return pd.DataFrame.from_records(records)
+
+
+def decode_line(line):
+
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
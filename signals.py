@@ -0,0 +1,99 @@
+"""
+Batched versions of the Stock signal rules.
+
+Each function takes one row per symbol and returns one value per row, so the
+decisions of a whole stage can be computed in a single call. Rows must be
+aligned on their last column (most recent bar) and share the same length.
+"""
+from lazy_import import LazyModule
+
+np = LazyModule('numpy')
+
+
+def is_in_range(x, y, range_percent=10):
+    """
+    Vectorized Stock.is_in_range(): boolean mask of x lying within
+    range_percent of y, element by element
+    """
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    bottom = (y / 100) * (100 - range_percent)
+    top = (y / 100) * (100 + range_percent)
+
+    return (((bottom <= x) & (x <= top)) |
+            ((top <= x) & (x <= bottom)))
+
+
+def is_trending_up(array, step=1):
+    """
+    Vectorized Stock.is_trending_up(): boolean mask with one value per row
+    of a 2D array, using the same comparison indexes as the scalar version
+    """
+
+    array = np.atleast_2d(np.asarray(array, dtype=float))
+
+    if step == 1:
+        end = 0
+    else:
+        end = step
+
+    indexes = np.arange(array.shape[1] - 1, end, -step)
+
+    if not len(indexes):
+        return np.zeros(array.shape[0], dtype=bool)
+
+    return (array[:, indexes] >= array[:, indexes - step]).all(axis=1)
+
+
+def trend_potentials(closes, smas, lows):
+    """
+    Trend stage decision for many symbols, as in Stock.get_trend_potential():
+
+    - closes, smas, lows: 2D arrays with the trend rows of each symbol
+    - Return an array of potentials (2 = strong, 0 = none)
+    """
+
+    closes = np.atleast_2d(np.asarray(closes, dtype=float))
+    smas = np.atleast_2d(np.asarray(smas, dtype=float))
+    lows = np.atleast_2d(np.asarray(lows, dtype=float))
+
+    trending = ((closes >= smas).all(axis=1) &
+                is_trending_up(smas[:, -30:], step=10) &
+                ~is_trending_up(lows[:, -6:]) &
+                is_in_range(lows[:, -1], smas[:, -1]))
+
+    return np.where(trending, 2, 0)
+
+
+def tactical_potentials(last_k, last_d):
+    """
+    Tactical stage decision for many symbols, as in
+    Stock.get_tactical_potential():
+
+    - last_k, last_d: 1D arrays with the last stochastic values of each symbol
+    - Return an array of potentials (2 = strong, 1 = weak, 0 = none)
+    """
+
+    last_k = np.asarray(last_k, dtype=float)
+    last_d = np.asarray(last_d, dtype=float)
+
+    in_range = is_in_range(last_k, last_d)
+
+    return np.where(in_range & (last_k >= last_d), 2,
+                    np.where(in_range, 1, 0))
+
+
+def execution_potentials(highs):
+    """
+    Execution stage decision for many symbols, as in
+    Stock.get_execution_potential():
+
+    - highs: 2D array with the execution timeframe highs of each symbol
+    - Return an array of potentials (2 = strong, 0 = none)
+    """
+
+    highs = np.atleast_2d(np.asarray(highs, dtype=float))
+
+    return np.where(is_trending_up(highs[:, -3:]), 2, 0)
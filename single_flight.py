@@ -0,0 +1,111 @@
+import threading
+from time import monotonic
+from time import time
+
+
+class Call:
+
+    def __init__(self):
+
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished = None
+
+
+class SingleFlight:
+    """
+    Coalesce calls with the same key: while a call is in flight, callers
+    with the same key wait for it and share its result instead of making
+    their own. A finished result keeps being shared for max_age seconds,
+    so that near-simultaneous callers are coalesced too. Errors are passed
+    to the waiting callers but never reused.
+    """
+
+    def __init__(self, max_age=0):
+
+        self.max_age = max_age
+
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.shared = 0
+
+
+    def do(self, key, function):
+
+        with self.lock:
+
+            self.purge()
+            call = self.calls.get(key)
+            leader = call is None
+
+            if leader:
+                call = Call()
+                self.calls[key] = call
+            else:
+                self.shared += 1
+
+        if leader:
+
+            try:
+                call.result = function()
+            except Exception as e:
+                call.error = e
+
+            call.finished = monotonic()
+            call.done.set()
+
+            if call.error is not None:
+                with self.lock:
+                    if self.calls.get(key) is call:
+                        del self.calls[key]
+
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+
+        return call.result
+
+
+    def purge(self):
+        """
+        Drop finished calls older than max_age. Must be called holding
+        the lock
+        """
+
+        now = monotonic()
+        expired = [key for key, call in self.calls.items()
+                   if call.done.is_set() and now - call.finished >= self.max_age]
+
+        for key in expired:
+            del self.calls[key]
+
+
+def timeframe_seconds(timeframe):
+    """
+    Length in seconds of an Alpaca bars timeframe ('1Min', '15Min', 'day'...)
+    """
+
+    if timeframe in ('day', '1D'):
+        return 86400
+
+    if timeframe.endswith('Min'):
+        return int(timeframe[:-3]) * 60
+
+    if timeframe.endswith('H'):
+        return int(timeframe[:-1]) * 3600
+
+    raise ValueError("Unknown timeframe '{}'".format(timeframe))
+
+
+def bar_period(timeframe, now=None):
+    """
+    Index of the bar period the given time (default: now) falls in
+    """
+
+    if now is None:
+        now = time()
+
+    return int(now // timeframe_seconds(timeframe))
@@ -0,0 +1,106 @@
+from time import monotonic
+
+
+class StagePolicy:
+    """
+    Expiry rules of a stage set:
+
+        - ttl: seconds a stock stays in the set without its signal being
+          confirmed again (None: no limit)
+        - max_size: maximum number of stocks in the set, the ones furthest
+          from the stage trigger condition being evicted first (None: no
+          limit)
+    """
+
+    def __init__(self, ttl=None, max_size=None):
+
+        self.ttl = ttl
+        self.max_size = max_size
+
+
+# Default rules. A potential stock is confirmed by tactical signals, a
+# standby stock by weak ones and a buy stock by strong ones
+STAGE_POLICIES = {
+    'potential': StagePolicy(ttl=4 * 3600, max_size=300),
+    'standby': StagePolicy(ttl=3600, max_size=100),
+    'buy': StagePolicy(ttl=3600, max_size=30),
+    }
+
+
+class StageExpiry:
+    """
+    Track when the stocks of each stage set were last confirmed and decide
+    which ones have expired under the stage policy. Stocks with an open
+    position never expire and do not count towards the maximum size.
+
+    Not thread-safe: used by the stages under the scan lock.
+    """
+
+    def __init__(self, policies=None, clock=monotonic):
+
+        self.policies = dict(STAGE_POLICIES if policies is None else policies)
+        self.clock = clock
+
+        # {stage: {stock: time of the last confirmation}}
+        self.confirmed = {stage: {} for stage in self.policies}
+
+
+    def confirm(self, stage, stock):
+        """
+        Restart the TTL of a stock in a stage
+        """
+
+        if stage in self.confirmed:
+            self.confirmed[stage][stock] = self.clock()
+
+
+    def forget(self, stage, stock):
+
+        if stage in self.confirmed:
+            self.confirmed[stage].pop(stock, None)
+
+
+    def expired(self, stage, stage_stocks):
+        """
+        Return the (stock, reason) pairs to remove from the stage set:
+
+            - 'ttl': not confirmed for longer than the stage TTL
+            - 'evicted': beyond the maximum size, ranked by Stock.distance
+              (unknown distances rank first, as for PriorityScheduler),
+              then by most recent confirmation
+
+        Stocks seen for the first time (e.g. resumed from the journal)
+        start their TTL now
+        """
+
+        policy = self.policies.get(stage)
+
+        if policy is None:
+            return []
+
+        now = self.clock()
+        confirmed = self.confirmed[stage]
+
+        expired = []
+        live = []
+
+        for stock in stage_stocks:
+
+            if stock.open:
+                continue
+
+            confirmed.setdefault(stock, now)
+
+            if policy.ttl is not None and now - confirmed[stock] > policy.ttl:
+                expired.append((stock, 'ttl'))
+            else:
+                live.append(stock)
+
+        if policy.max_size is not None and len(live) > policy.max_size:
+
+            live.sort(key=lambda stock: (stock.distance or 0.,
+                                         -confirmed[stock]))
+
+            expired.extend((stock, 'evicted') for stock in live[policy.max_size:])
+
+        return expired
@@ -0,0 +1,341 @@
+"""
+On-demand diagnosis of slow scan passes: run one cycle of every stage
+against a data source, with a CPU profile (cProfile) and an allocation
+snapshot (tracemalloc) per stage, and write a report of the top functions
+and allocation sites.
+
+The run never trades nor touches the session files: orders and position
+closes go to DryRunAlpaca, stocks live in a private registry and the
+stages run in a temporary working directory.
+"""
+import os
+import io
+import re
+import pstats
+import threading
+import cProfile
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+import logging
+from ttf_logger import debug_logger
+
+import record_handler as record
+import scan_data as scan
+from alpaca import Alpaca
+from api_client import API_ERRORS
+from order_queue import OrderQueue
+from stock_registry import StockRegistry
+
+# Functions of the package always reported for every stage (when called),
+# besides the top ones
+package_dir = os.path.dirname(os.path.abspath(__file__))
+
+WATCHED_FUNCTIONS = ('get_stochastic', 'alpaca_data_resample', 'get_data',
+                     'fetch_data', 'get_resampled_data', 'get_base_data',
+                     'decode', 'get_open_position')
+
+
+class DryRunAlpaca(Alpaca):
+    """
+    Alpaca client whose trading calls only log: lookups (quotes, assets,
+    positions) are real, orders and position closes are not sent
+    """
+
+    def submit_order(self, symbol, side, qty, take_profit, stop_loss,
+                     *args, **kwargs):
+
+        debug_logger.debug("Dry run: order for '{}' not sent".format(symbol))
+
+        return False
+
+
+    def close_position(self, symbol):
+
+        debug_logger.debug("Dry run: position of '{}' not closed".format(symbol))
+
+
+class OneCycleCalendar:
+    """
+    Calendar seen by the stages during a profile: the market is open for
+    a single pass of each stage (see start()) and closes right after it,
+    so the stages do not sleep
+    """
+
+    def __init__(self):
+
+        self.passes_left = 0
+
+
+    def start(self):
+
+        self.passes_left = 1
+
+
+    def is_session_day(self):
+
+        is_open = self.passes_left > 0
+        self.passes_left -= 1
+
+        return is_open
+
+
+    def seconds_to_close(self):
+
+        return 0
+
+
+class StageProfile:
+    """
+    CPU profile and allocation snapshot of one stage cycle
+    """
+
+    def __init__(self, stage, seconds, profile, snapshot):
+
+        self.stage = stage
+        self.seconds = seconds
+        self.profile = profile
+        self.snapshot = snapshot
+
+
+    def stats(self):
+
+        stream = io.StringIO()
+
+        return pstats.Stats(self.profile, stream=stream), stream
+
+
+    def top_functions(self, top=15):
+
+        stats, stream = self.stats()
+        stats.sort_stats('cumulative').print_stats(top)
+
+        return stream.getvalue()
+
+
+    def watched_functions(self, functions=WATCHED_FUNCTIONS):
+
+        stats, stream = self.stats()
+        pattern = r'^{}.*\((?:{})\)$'.format(re.escape(package_dir),
+                                               '|'.join(functions))
+        stats.sort_stats('cumulative').print_stats(pattern)
+
+        return stream.getvalue()
+
+
+    def top_allocations(self, top=15):
+        """
+        Allocation sites (file:line) still holding the most memory at the
+        end of the cycle, without the profiler's own frames
+        """
+
+        snapshot = self.snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+            ))
+
+        lines = []
+
+        for statistic in snapshot.statistics('lineno')[:top]:
+
+            frame = statistic.traceback[0]
+            lines.append('{:>10.1f} KiB {:>8} blocks  {}:{}'.format(
+                         statistic.size / 1024, statistic.count,
+                         frame.filename, frame.lineno))
+
+        return '\n'.join(lines)
+
+
+def profile_data(symbols, positions=True):
+    """
+    Stocks dictionary of a profile run over the given symbols, built in a
+    private registry (the session stocks are not modified) and without
+    journal. With positions, the open positions of the positions file are
+    included for the sell stage
+    """
+
+    registry = StockRegistry()
+    bought = set()
+
+    if positions:
+
+        try:
+            bought = record.get_open_positions(registry)
+        except FileNotFoundError:
+            debug_logger.debug("No positions file, sell stage has no positions")
+
+    return {
+        'initial': registry.get_many(symbols),
+        'potential': set(),
+        'standby': set(),
+        'buy': set(),
+        'bought': bought,
+        'trades': [],
+        'registry': registry,
+        }
+
+
+def fake_source(count=100, positions=3):
+    """
+    Point the API clients to a local fake Alpaca server with 'count'
+    symbols (see fake_alpaca), and open positions on the first ones of
+    them. Return the started server and the symbols of the universe
+    """
+
+    from fake_alpaca import FakeAlpaca
+    from stock_data import Stock
+
+    symbols = ['S{:04d}'.format(i) for i in range(count)]
+    fake = FakeAlpaca(symbols).start()
+
+    Alpaca.set_urls(fake.trading_url, fake.data_url)
+    Stock.data_url = fake.data_url
+    Stock.trading_url = fake.trading_url
+
+    for symbol in symbols[:positions]:
+        Alpaca().submit_order(symbol, 'buy', 10, {}, {})
+
+    return fake, symbols
+
+
+def open_positions(stocks, symbols):
+    """
+    Mark the stocks of the given symbols as bought (e.g. positions opened
+    on the fake source), for the sell stage to evaluate
+    """
+
+    for symbol in symbols:
+
+        stock = stocks['registry'].get(symbol)
+        stock.open_position()
+        stocks['bought'].add(stock)
+
+
+def stage_cycles():
+    """
+    (stage name, function, kwargs, scanned set) of one cycle of the
+    pipeline, in the order the sets are populated. Every stage runs with a
+    single worker, so its work happens in the profiled thread (except the
+    pre-trade lookups of the dry run orders)
+    """
+
+    orders = OrderQueue(workers=1, alpaca=DryRunAlpaca())
+
+    return [
+        ('Trend', scan.trend_scan, {}, 'initial'),
+        ('Tactical', scan.tactical_scan, {}, 'potential'),
+        ('Standby', scan.standby_scan, {}, 'standby'),
+        ('Execute', scan.execute_scan, {'orders': orders}, 'buy'),
+        ('Sell', scan.sell_scan, {}, 'bought'),
+        ]
+
+
+def profile_stages(stocks, lock=None, fill=False):
+    """
+    Run one cycle of every stage over the stocks dictionary, each under
+    cProfile and tracemalloc. Return a list of StageProfile.
+
+    Each stage scans the stocks promoted by the previous ones. With fill,
+    the potential, standby and buy sets are first filled with every stock
+    of the initial set, so that each stage evaluates the whole universe
+    whatever the signals
+    """
+
+    if lock is None:
+        lock = threading.Lock()
+
+    # Imported lazily by the stages: loaded now, so that the import is not
+    # profiled as part of the first stage
+    import numpy
+    import pandas
+
+    calendar = OneCycleCalendar()
+    originals = (scan.calendar, scan.Alpaca)
+    scan.calendar, scan.Alpaca = calendar, DryRunAlpaca
+
+    cwd = os.getcwd()
+    tmp_dir = tempfile.TemporaryDirectory()
+    os.chdir(tmp_dir.name)
+
+    profiles = []
+
+    # Taken before the trend stage drops the stocks showing no trend
+    universe = [stock for stock in stocks['initial'] if not stock.open]
+
+    try:
+
+        for stage, function, kwargs, stage_set in stage_cycles():
+
+            if fill and stage_set in ('potential', 'standby', 'buy'):
+                stocks[stage_set].update(universe)
+
+            calendar.start()
+            profile = cProfile.Profile()
+            tracemalloc.start()
+            start = perf_counter()
+
+            try:
+                profile.runcall(function, stocks, lock, workers=1, **kwargs)
+
+            except API_ERRORS:
+                debug_logger.debug("Profile of stage '{}' interrupted".format(stage),
+                                   exc_info=True)
+
+            finally:
+                seconds = perf_counter() - start
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+
+            profiles.append(StageProfile(stage, seconds, profile, snapshot))
+
+            debug_logger.debug("Profiled stage '{}' in {:.2f} seconds".format(
+                                stage, seconds))
+
+    finally:
+
+        os.chdir(cwd)
+        tmp_dir.cleanup()
+        scan.calendar, scan.Alpaca = originals
+
+    return profiles
+
+
+def write_report(profiles, output_dir, top=15):
+    """
+    Write the text report of the profiles (report.txt) and the raw profile
+    of each stage (<stage>.prof, for pstats or snakeviz) in output_dir.
+    Return the report path
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    sections = []
+
+    for stage_profile in profiles:
+
+        stage = stage_profile.stage
+        stage_profile.profile.dump_stats(
+            os.path.join(output_dir, '{}.prof'.format(stage.lower())))
+
+        sections.append('\n'.join([
+            '=' * 78,
+            '{} stage: one cycle in {:.3f} seconds'.format(stage,
+                                                          stage_profile.seconds),
+            '=' * 78,
+            '',
+            '--- Top functions (cumulative time) ---',
+            stage_profile.top_functions(top),
+            '--- Watched functions ---',
+            stage_profile.watched_functions(),
+            '--- Top allocation sites (live at the end of the cycle) ---',
+            stage_profile.top_allocations(top),
+            '',
+            ]))
+
+    path = os.path.join(output_dir, 'report.txt')
+
+    with open(path, 'w') as f:
+        f.write('\n'.join(sections))
+
+    return path
@@ -1,13 +1,22 @@
 import os
 import json
+import threading
 from datetime import datetime
 from datetime import timedelta
+from time import time
 
 import logging
 from ttf_logger import debug_logger, stock_logger
+from single_flight import SingleFlight, bar_period, timeframe_seconds
+from resampler import Resampler
+from market_calendar import eastern
+from api_client import client, DataError
+from metrics import metrics
+import bars
 
-import pandas as pd
-import requests
+from lazy_import import LazyModule
+
+pd = LazyModule('pandas')
 
 class Stock:
 
@@ -20,10 +29,56 @@ class Stock:
         'APCA-API-SECRET-KEY': api_secret
         }
 
+    # API URLS
+    data_url = 'https://data.alpaca.markets/v1'
+    trading_url = 'https://paper-api.alpaca.markets/v2'
+
+    # Bars API keys to dataframe columns
+    rename_dict = {
+        't': 'time',
+        'o': 'open',
+        'h': 'high',
+        'l': 'low',
+        'c': 'close',
+        'v': 'volume',
+        }
+
+    # COALESCES REQUESTS FOR THE SAME BARS ACROSS SCAN THREADS
+    # Keyed by (symbol, timeframe, limit, bar period)
+    bars_flight = SingleFlight(max_age=30)
+
+    # SESSION MEMO OF TREND VERDICTS
+    # {trading day: {(symbol, timeframe, sma windows, partial bar): verdict}}
+    trend_memo = {}
+
+    # STRUCTURED RECORD OF THE SIGNAL EVALUATIONS (see signal_sink.SignalSink)
+    # Set by the entry point, None records nothing
+    signal_sink = None
+
+    # LATEST BARS AND INDICATORS SHARED WITH LOCAL READERS (see bar_ring.BarRing)
+    # Set by the entry point, None publishes nothing
+    bar_ring = None
+
+    # RATE BUDGET OF THE BAR REQUESTS (rate_limiter.RateLimiter)
+    # Shared by every caller, e.g. the strategies of a strategy_host.
+    # None leaves the pacing to the stages
+    fetch_pacer = None
+
+    # MAXIMUM AGE (SECONDS) OF PREFETCHED BARS STILL USED BY get_data()
+    prefetch_max_age = 3600
+
+    # SELL SIGNAL: MAXIMUM AGE (SECONDS) OF THE LAST PRICE USED FOR THE LOCAL
+    # UNREALIZED P&L, AND EVALUATIONS BETWEEN BROKER RECONCILIATIONS
+    price_max_age = 300
+    reconcile_every = 10
+    memo_lock = threading.Lock()
+
 
     def __init__(self, symbol, trend_timeframe='day',
                  tactical_timeframe='60Min', execution_timeframe='1Min',
-                 sma_windows=(50,), stoch_windows=(8,3,5), open=False):
+                 sma_windows=(50,), stoch_windows=(8,3,5), open=False,
+                 include_partial_bar=True, base_timeframe=None,
+                 strategy=None):
         
         """
         String representing the symbol of the stock
@@ -48,6 +103,37 @@ class Stock:
         self.sma_windows = tuple(sma_windows)
         self.stoch_windows = tuple(stoch_windows)
 
+        """
+        Whether the in-progress bar of the trend timeframe is used for the
+        trend verdict. Verdicts are memoized per symbol and trading day, so
+        when it is included the verdict reflects that bar as it was on the
+        first trend scan of the session
+        """
+        self.include_partial_bar = include_partial_bar
+
+        """
+        Single fetch mode: when a base timeframe is given (e.g. '1Min'),
+        each timeframe is fetched once to seed its history, then only base
+        bars are requested and the longer timeframes are built from them
+        locally by incremental resamplers
+        """
+        self.base_timeframe = base_timeframe
+        self.base_data = None
+        self.resamplers = {}
+
+        """
+        Name of the strategy the stock is evaluated for, when several
+        strategies run in one process (see strategy_host), recorded with
+        its signal evaluations
+        """
+        self.strategy = strategy
+
+        """
+        Bars fetched in advance (e.g. during the pre-market warm-up), keyed
+        by (timeframe, limit): (bars, time fetched)
+        """
+        self.prefetched = {}
+
         """
         Indicate if data for stock shows potential in each timeframe:
         
@@ -62,6 +148,20 @@ class Stock:
         """
         self.potential = 0
 
+        """
+        Standard deviation of the close-to-close returns of the last data
+        evaluated in the tactical or execution stage, used to adapt scan
+        frequencies
+        """
+        self.volatility = None
+
+        """
+        Relative distance of the last tactical or execution evaluation to
+        its strong buy condition (0 = condition met), used to rescan stocks
+        close to a signal more often than distant ones
+        """
+        self.distance = None
+
         """
         Indicate if the stock position is already open
         """
@@ -70,47 +170,159 @@ class Stock:
 
         self.position_record = {}
 
+        """
+        Last known price of the stock and its epoch time: (price, time),
+        used to track the unrealized P&L of an open position locally, and
+        the number of sell evaluations since the position was last read
+        from the broker
+        """
+        self.last_price = None
+        self.local_updates = 0
+
+        """
+        Outcome of the last tactical and execution evaluations, keyed by
+        (stage, timeframe): (time of the newest bar evaluated, potential,
+        distance, volatility), reused until a new bar arrives
+        """
+        self.evaluated = {}
+
+
+    # Stocks are identified by symbol: one Stock per symbol is kept by
+    # stock_registry.StockRegistry, and sets of stocks are keyed by symbol
+    def __eq__(self, other):
+
+        if not isinstance(other, Stock):
+            return NotImplemented
+
+        return self.symbol == other.symbol
+
+
+    def __hash__(self):
+
+        return hash(self.symbol)
+
+
+    def __repr__(self):
+
+        return "Stock('{}')".format(self.symbol)
+
 
     def get_data(self, timeframe, limit=1000):
+        """
+        Get bars for the stock, sharing one request and one parsed result
+        with concurrent or near-simultaneous callers asking for the same
+        bars in the same bar period. Each caller gets its own copy. Bars
+        prefetched for the same timeframe and limit are used (once) instead
+        of requesting them, unless older than prefetch_max_age
+        """
+
+        prefetched = self.prefetched.pop((timeframe, limit), None)
+
+        if prefetched is not None and time() - prefetched[1] <= self.prefetch_max_age:
+            return prefetched[0].copy()
+
+        key = (self.symbol, timeframe, limit, bar_period(timeframe))
+
+        data = self.bars_flight.do(key,
+                                   lambda: self.fetch_data(timeframe, limit))
+
+        return data.copy()
+
+
+    def fetch_data(self, timeframe, limit=1000):
 
-        url = ('https://data.alpaca.markets/v1/bars/' +
-               timeframe)
+        if self.fetch_pacer is not None:
+            self.fetch_pacer.wait()
+
+        url = self.data_url + '/bars/' + timeframe
 
         params = {
             'symbols': str(self.symbol),
             'limit': limit
             }
-        
-        rename_dict = {
-            't': 'time',
-            'o': 'open',
-            'h': 'high',
-            'l': 'low',
-            'c': 'close',
-            'v': 'volume',
-            }
 
-        r = requests.get(url, params=params, headers=self.headers)
-        data = pd.DataFrame.from_dict(json.loads(r.content)[self.symbol])
+        r = client.get(url, params=params, headers=self.headers)
+        r.raise_for_status()
+        columns = bars.decode(r.content).get(self.symbol)
 
-        # Rename columns for consistency between dataframes
-        data.rename(rename_dict, axis=1, inplace=True)
+        if columns is None or not len(columns['time']):
+            raise DataError("No '{}' bars for '{}'".format(timeframe, self.symbol))
 
-        return data
+        return bars.frame(columns)
 
 
-    def get_open_position(self):
+    @classmethod
+    def get_bulk_data(cls, symbols, timeframe, limit=1000, chunk_size=200):
+        """
+        Get bars for many symbols with one request per chunk of symbols.
+        Return a dict of {symbol: dataframe}
+        """
 
-        url = 'https://paper-api.alpaca.markets/v2/positions'
+        bulk_columns = cls.get_bulk_columns(symbols, timeframe, limit, chunk_size)
 
-        params = {
-            'symbol': self.symbol,
-            }
+        return {symbol: bars.frame(columns)
+                for symbol, columns in bulk_columns.items()}
+
+
+    @classmethod
+    def get_bulk_columns(cls, symbols, timeframe, limit=1000, chunk_size=200):
+        """
+        Same as get_bulk_data() without building the dataframes: return a
+        dict of {symbol: {column: numpy array}} (see bars.decode())
+        """
+
+        url = cls.data_url + '/bars/' + timeframe
+
+        symbols = sorted(symbols)
+        bulk_data = {}
+
+        for i in range(0, len(symbols), chunk_size):
+
+            params = {
+                'symbols': ','.join(symbols[i:i + chunk_size]),
+                'limit': limit
+                }
 
-        r = requests.get(url,
-                        params=params,
+            if cls.fetch_pacer is not None:
+                cls.fetch_pacer.wait()
+
+            r = client.get(url, params=params, headers=cls.headers,
+                           timeout=30, deadline=60)
+            r.raise_for_status()
+
+            bulk_data.update(bars.decode(r.content))
+
+            debug_logger.debug("API called for '{}' bars of {} symbols".format(
+                                timeframe, len(symbols[i:i + chunk_size])))
+
+        return bulk_data
+
+
+    def prefetch(self, timeframe, limit, data):
+        """
+        Store bars fetched in advance, to be used by the next get_data()
+        call for the same timeframe and limit
+        """
+
+        self.prefetched[(timeframe, limit)] = (data, time())
+
+
+    def get_open_position(self):
+        """
+        Return the position of the stock at the broker, or None if it does
+        not exist (closed by the broker, e.g. by the bracket of its order)
+        """
+
+        url = self.trading_url + '/positions/' + self.symbol
+
+        r = client.get(url,
                         headers=self.headers,
                         timeout=5)
+
+        if r.status_code == 404:
+            return None
+
+        r.raise_for_status()
         
         debug_logger.debug("API called for positions")
         
@@ -119,6 +331,9 @@ class Stock:
         position['cost_basis'] = float(position['cost_basis'])
         position['unrealized_plpc'] = float(position['unrealized_plpc'])
 
+        if 'avg_entry_price' in position:
+            position['avg_entry_price'] = float(position['avg_entry_price'])
+
         return position
 
     
@@ -129,7 +344,14 @@ class Stock:
         - Return last 60 rows
         """
 
-        trend = self.get_data(self.trend_timeframe, limit=200)
+        if self.base_timeframe:
+            trend = self.get_resampled_data(self.trend_timeframe,
+                                            include_partial=True)
+        else:
+            trend = self.get_data(self.trend_timeframe, limit=200)
+
+        if not self.include_partial_bar:
+            trend = self.drop_partial_bar(trend)
 
         for sma in self.sma_windows:
             trend['sma' + str(sma)] = trend['close'].rolling(sma).mean()
@@ -137,14 +359,58 @@ class Stock:
         return trend.iloc[-60:]
 
 
+    @staticmethod
+    def drop_partial_bar(data):
+        """
+        Drop the last bar if it belongs to the current (unfinished) day.
+        Daily bars are stamped at midnight New York time, so days are
+        compared in that timezone regardless of the local one
+        """
+
+        if (len(data) and
+            datetime.fromtimestamp(data['time'].iloc[-1], eastern).date() ==
+            datetime.now(eastern).date()):
+
+            return data.iloc[:-1]
+
+        return data
+
+
+    def get_history_requests(self):
+        """
+        Return the (timeframe, limit) of the history requests made by the
+        trend and tactical stages
+        """
+
+        if self.tactical_timeframe == '60Min':
+            tactical = ('15Min', 0)
+        else:
+            tactical = (self.tactical_timeframe, 0)
+
+        return [(self.trend_timeframe, 200), tactical]
+
+
     def get_tactical_data(self):
         """
         - Get data for the second timeframe
         - Calculate stochastic values for the given time windows
         - Return last 20 rows
         """
+
+        if self.base_timeframe:
+
+            data = self.get_resampled_data(self.tactical_timeframe)
+
+            if self.tactical_timeframe == '60Min':
+                data['time'] = data['time'].apply(datetime.fromtimestamp)
+                data.set_index('time', inplace=True)
+
+            tactical = self.get_stochastic(data)
+            debug_logger.debug("Calculated Stochastic for '{}'".format(self.symbol))
+
+            return tactical.iloc[-20:]
         
-        if self.tactical_timeframe == '60Min':
+        elif self.tactical_timeframe == '60Min':
 
             data = self.get_data('15Min', limit=0)
             data_resampled = self.alpaca_data_resample(data)
@@ -167,9 +433,107 @@ class Stock:
         - Get and return real-time price action data
         """
 
+        if self.base_timeframe == self.execution_timeframe:
+            return self.get_base_data().copy()
+
+        if self.base_timeframe:
+            return self.get_resampled_data(self.execution_timeframe,
+                                           include_partial=True)
+
         return self.get_data(self.execution_timeframe)
 
 
+    def get_base_data(self):
+        """
+        Single fetch mode:
+        - Get the latest base timeframe bars (all available on the first call)
+        - Merge them into the stored base series
+        - Feed them to the resamplers of the longer timeframes
+        """
+
+        if self.base_data is None:
+            limit = 1000
+        else:
+            elapsed = time() - self.base_data['time'].iloc[-1]
+            missing = elapsed // timeframe_seconds(self.base_timeframe)
+            limit = 100 if missing < 98 else 1000
+
+        new_data = self.get_data(self.base_timeframe, limit=limit)
+
+        if self.base_data is None:
+            self.base_data = new_data
+        else:
+            self.base_data = (pd.concat([self.base_data, new_data])
+                                .drop_duplicates('time', keep='last')
+                                .sort_values('time')
+                                .tail(1000)
+                                .reset_index(drop=True))
+
+        for resampler in self.resamplers.values():
+            resampler.update(new_data)
+
+        return self.base_data
+
+
+    def get_resampled_data(self, timeframe, include_partial=False):
+        """
+        Single fetch mode: return the bars of a longer timeframe built from
+        the base timeframe, with epoch 'time' column
+        """
+
+        if timeframe not in self.resamplers:
+
+            resampler = self.seed_resampler(timeframe)
+
+            if self.base_data is not None:
+                resampler.update(self.base_data)
+
+            self.resamplers[timeframe] = resampler
+
+        self.get_base_data()
+
+        return self.resamplers[timeframe].frame(include_partial)
+
+
+    def seed_resampler(self, timeframe):
+        """
+        Create the resampler of a timeframe and preload it with the completed
+        bars of a regular request, so that indicators have enough history
+        """
+
+        base_period = timeframe_seconds(self.base_timeframe)
+
+        if timeframe == '60Min':
+
+            # Same bins as alpaca_data_resample()
+            resampler = Resampler(3600, offset=1800, base_period=base_period,
+                                  require_open=True)
+
+            seed = self.alpaca_data_resample(self.get_data('15Min', limit=0))
+            seed.reset_index(inplace=True)
+            seed['time'] = seed['time'].apply(lambda d: int(d.timestamp()))
+
+        else:
+
+            tz = eastern if timeframe == 'day' else None
+            resampler = Resampler(timeframe_seconds(timeframe),
+                                  base_period=base_period, tz=tz)
+
+            limit = 200 if timeframe == self.trend_timeframe else 0
+            seed = self.get_data(timeframe, limit=limit)
+
+        # The last bar may still be forming
+        if len(seed) and seed['time'].iloc[-1] + resampler.period > time():
+            seed = seed.iloc[:-1]
+
+        resampler.seed(seed)
+
+        debug_logger.debug("Seeded '{}' resampler for '{}'".format(timeframe,
+                            self.symbol))
+
+        return resampler
+
+
     def alpaca_data_resample(self, data):
 
         data['time'] = data['time'].apply(datetime.fromtimestamp)
@@ -194,6 +558,7 @@ class Stock:
         position = {
             'bought_on': datetime.now().strftime('%H:%M:%S'),
             'cost_basis': 0,
+            'avg_entry_price': 0,
             'unrealized_plpc': 0,
             'max_unrealized_plpc': 0,
             'scans_left': 5,
@@ -208,11 +573,12 @@ class Stock:
         self.create_position_record()
         self.open = True
         self.potential = 0
+        self.evaluated.clear()
 
 
     def close_position(self):
 
-        self.position_record['sold on'] = datetime.now().strftime('%H:%M:%S')
+        self.position_record[self.symbol]['sold on'] = datetime.now().strftime('%H:%M:%S')
         self.open = False
         self.sell = False
 
@@ -239,33 +605,87 @@ class Stock:
 
     def get_trend_potential(self):
 
-        trend_data = self.get_trend_data()
+        memo = self.get_trend_memo()
+        key = (self.symbol, self.trend_timeframe, self.sma_windows,
+               self.include_partial_bar)
 
-        debug_logger.debug("get_trend_data() called for '{}'".format(
-                            self.symbol))
+        if key in memo:
 
-        last_month_smas = trend_data['sma50'].iloc[-30:].values
-        last_lows = trend_data['low'].iloc[-6:].values
-        last_low = trend_data['low'].iloc[-1]
-        last_sma = trend_data['sma50'].iloc[-1]
-        
-        if (trend_data['close'].ge(trend_data['sma50']).all() and
-            self.is_trending_up(last_month_smas, step=10) and not
-            self.is_trending_up(last_lows) and
-            self.is_in_range(last_low, last_sma)):
+            trending = memo[key]
+
+            debug_logger.debug("Trend verdict for '{}' taken from memo".format(
+                                self.symbol))
+
+        else:
+
+            trend_data = self.get_trend_data()
+
+            debug_logger.debug("get_trend_data() called for '{}'".format(
+                                self.symbol))
+
+            # The first SMA window drives the verdict
+            sma = 'sma' + str(self.sma_windows[0])
+
+            last_month_smas = trend_data[sma].iloc[-30:].values
+            last_lows = trend_data['low'].iloc[-6:].values
+            last_low = trend_data['low'].iloc[-1]
+            last_sma = trend_data[sma].iloc[-1]
+
+            trending = bool(
+                trend_data['close'].ge(trend_data[sma]).all() and
+                self.is_trending_up(last_month_smas, step=10) and not
+                self.is_trending_up(last_lows) and
+                self.is_in_range(last_low, last_sma))
+
+            memo[key] = trending
+
+            self.publish_bars(self.trend_timeframe, trend_data,
+                              sma=trend_data[sma].iloc[-1])
+
+        if trending:
 
             self.potential = 2
             
         stock_logger.info("'{}' potential is now: {}".format(self.symbol,
                             self.potential))
 
+        self.emit_signal('trend', timeframe=self.trend_timeframe,
+                         sma_windows=self.sma_windows, trending=trending,
+                         potential=self.potential)
+
+
+    @classmethod
+    def get_trend_memo(cls):
+        """
+        Return the trend verdicts memoized for the current trading day,
+        discarding those of previous days
+        """
+
+        trading_day = datetime.now(eastern).strftime('%Y-%m-%d')
+
+        with cls.memo_lock:
+
+            if trading_day not in cls.trend_memo:
+                cls.trend_memo.clear()
+                cls.trend_memo[trading_day] = {}
+
+            return cls.trend_memo[trading_day]
+
 
     def get_tactical_potential(self):
 
         self.potential = 0        # Initialize potential signal
 
+        if self.reuse_evaluation('tactical', self.tactical_timeframe):
+            return
+
         tactical_data = self.get_tactical_data()
 
+        if self.reuse_evaluation('tactical', self.tactical_timeframe, tactical_data):
+            return
+
+        self.volatility = self.get_volatility(tactical_data)
+
         debug_logger.debug("get_tactical_data() called for '{}'".format(
                             self.symbol))
 
@@ -275,6 +695,8 @@ class Stock:
         stock_logger.info("'{}' Last K: {}".format(self.symbol, last_k))
         stock_logger.info("'{}' Last D: {}".format(self.symbol, last_d))
 
+        self.distance = self.get_tactical_distance(last_k, last_d)
+
         if self.is_in_range(last_k, last_d):
 
             # Weak buy signal
@@ -286,14 +708,33 @@ class Stock:
 
         stock_logger.info("'{}' potential is now: {}".format(self.symbol,
                             self.potential))
+
+        self.store_evaluation('tactical', self.tactical_timeframe, tactical_data)
+
+        self.publish_bars(self.tactical_timeframe, tactical_data, k=last_k,
+                          d=last_d, potential=self.potential,
+                          distance=self.distance, volatility=self.volatility)
+
+        self.emit_signal('tactical', timeframe=self.tactical_timeframe,
+                         last_k=float(last_k), last_d=float(last_d),
+                         distance=self.distance, volatility=self.volatility,
+                         potential=self.potential)
     
     
     def get_execution_potential(self):
         
         self.potential = 0        # Initialize potential signal
 
+        if self.reuse_evaluation('execution', self.execution_timeframe):
+            return
+
         execution_data = self.get_execution_data()
 
+        if self.reuse_evaluation('execution', self.execution_timeframe, execution_data):
+            return
+
+        self.volatility = self.get_volatility(execution_data)
+
         debug_logger.debug("get_execution_data() called for '{}'".format(
                             self.symbol))
 
@@ -301,6 +742,8 @@ class Stock:
 
         stock_logger.info("'{}' Last 3 highs: {}".format(self.symbol, last_three_highs))
 
+        self.distance = self.get_execution_distance(last_three_highs)
+
         if self.is_trending_up(last_three_highs):
 
             # Strong buy signal
@@ -308,20 +751,141 @@ class Stock:
 
         stock_logger.info("'{}' potential is now: {}".format(self.symbol,
                             self.potential))
+
+        self.store_evaluation('execution', self.execution_timeframe, execution_data)
+
+        self.publish_bars(self.execution_timeframe, execution_data,
+                          potential=self.potential, distance=self.distance,
+                          volatility=self.volatility)
+
+        self.emit_signal('execution', timeframe=self.execution_timeframe,
+                         last_highs=[float(high) for high in last_three_highs],
+                         distance=self.distance, volatility=self.volatility,
+                         potential=self.potential)
     
     
+    def reuse_evaluation(self, stage, timeframe, data=None):
+        """
+        Restore the outcome of the last evaluation of a stage (potential,
+        distance, volatility) if no new bar of its timeframe has arrived
+        since, counting the skip in metrics as 'skipped.<stage>.<reason>':
+
+            - 'period': without data, the period of the newest evaluated
+              bar is not over, so there is nothing new to fetch
+            - 'bar': the newest bar of the fetched data is the one already
+              evaluated
+
+        Return True if the evaluation is skipped
+        """
+
+        evaluated = self.evaluated.get((stage, timeframe))
+
+        if evaluated is None:
+            return False
+
+        bar_time = evaluated[0]
+
+        if data is None:
+            reason = 'period'
+            skip = time() < bar_time + timeframe_seconds(timeframe)
+        else:
+            reason = 'bar'
+            skip = self.last_bar_time(data) == bar_time
+
+        if skip:
+
+            self.potential, self.distance, self.volatility = evaluated[1:]
+            metrics.increment('skipped.{}.{}'.format(stage, reason))
+
+            debug_logger.debug("No new '{}' bar for '{}', potential is still {}".format(
+                                timeframe, self.symbol, self.potential))
+
+        return skip
+
+
+    def store_evaluation(self, stage, timeframe, data):
+
+        self.evaluated[(stage, timeframe)] = (self.last_bar_time(data),
+                                              self.potential, self.distance,
+                                              self.volatility)
+
+
+    @staticmethod
+    def last_bar_time(data):
+        """
+        Epoch time of the newest bar of the data, from its 'time' column or
+        its datetime index (see alpaca_data_resample())
+        """
+
+        if 'time' in data.columns:
+            return float(data['time'].iloc[-1])
+
+        return data.index[-1].timestamp()
+
+
     def get_sell_signal(self):
+        """
+        Update the sell countdown of the open position with its unrealized
+        P&L, computed locally from the average entry price and the last
+        price (see set_price()). The position is read from the broker
+        instead when the entry price is unknown (first evaluation), when
+        the last price is older than price_max_age, and every
+        reconcile_every evaluations, so that local tracking cannot drift
+        """
 
-        current = self.get_open_position()
-        stored = self.position_record
+        stored = self.position_record[self.symbol]
+        entry = stored.get('avg_entry_price')
 
-        if not stored['cost_basis']:
-            stored['cost_basis'] = current['cost_basis']
-        
-        stored['unrealized_plpc'] = current['unrealized_plpc']
+        reconciled = (not entry or self.last_price is None or
+                      time() - self.last_price[1] > self.price_max_age or
+                      self.local_updates >= self.reconcile_every)
+
+        if reconciled:
+
+            current = self.get_open_position()
+
+            if current is None:
+
+                # Closed at the broker: the sell stage closes it here too
+                stock_logger.info("Position of '{}' was closed by the broker".format(self.symbol))
+                self.sell = True
+
+                return
+
+            if not stored['cost_basis']:
+                stored['cost_basis'] = current['cost_basis']
 
-        if current['unrealized_plpc'] > stored['max_unrealized_plpc']:
-            stored['max_unrealized_plpc'] = current['unrealized_plpc']
+            if current.get('avg_entry_price'):
+                stored['avg_entry_price'] = current['avg_entry_price']
+
+            unrealized_plpc = current['unrealized_plpc']
+            self.local_updates = 0
+
+        else:
+
+            unrealized_plpc = (self.last_price[0] - entry) / entry
+            self.local_updates += 1
+
+        self.update_unrealized_plpc(unrealized_plpc)
+
+        self.emit_signal('sell', unrealized_plpc=stored['unrealized_plpc'],
+                         max_unrealized_plpc=stored['max_unrealized_plpc'],
+                         scans_left=stored['scans_left'], reconciled=reconciled,
+                         sell=self.sell)
+
+
+    def update_unrealized_plpc(self, unrealized_plpc):
+        """
+        Record the unrealized P&L of the open position and its maximum.
+        Every evaluation below the maximum counts down the scans left
+        before selling
+        """
+
+        stored = self.position_record[self.symbol]
+        stored['unrealized_plpc'] = unrealized_plpc
+
+        if unrealized_plpc > stored['max_unrealized_plpc']:
+            stored['max_unrealized_plpc'] = unrealized_plpc
 
             stock_logger.info("New max_unrealized_plpc for '{}'".format(self.symbol))
         
@@ -332,8 +896,85 @@ class Stock:
             if stored['scans_left'] <= 0:
                 
                 self.sell = True
+
+
+    def set_price(self, price, timestamp=None):
+        """
+        Store the last known price of the stock (e.g. the close of its last
+        minute bar), stamped with its epoch time (default: now)
+        """
+
+        self.last_price = (float(price),
+                           time() if timestamp is None else float(timestamp))
+
+
+    def publish_bars(self, timeframe, data, **indicators):
+        """
+        Publish the latest bars of a timeframe and indicator values to the
+        bars file, if there is one. None values are published as NaN
+        """
+
+        if self.bar_ring is not None:
+
+            indicators = {name: float('nan') if value is None else float(value)
+                          for name, value in indicators.items()}
+
+            self.bar_ring.publish(self.symbol, timeframe, data,
+                                  strategy=self.strategy, **indicators)
+
+
+    def emit_signal(self, event, **fields):
+        """
+        Record a signal evaluation in the signal sink, if there is one
+        """
+
+        if self.signal_sink is not None:
+
+            if self.strategy is not None:
+                fields['strategy'] = self.strategy
+
+            self.signal_sink.emit(event, self.symbol, **fields)
                 
 
+    @staticmethod
+    def get_volatility(data):
+
+        volatility = data['close'].pct_change().std()
+
+        if pd.isna(volatility):
+            return None
+
+        return float(volatility)
+
+
+    @staticmethod
+    def get_tactical_distance(last_k, last_d):
+        """
+        Relative gap of %K below %D, 0 once %K has crossed %D
+        """
+
+        if pd.isna(last_k) or pd.isna(last_d) or not last_d:
+            return None
+
+        return max(float(last_d - last_k) / abs(last_d), 0.)
+
+
+    @staticmethod
+    def get_execution_distance(highs):
+        """
+        Largest relative drop between consecutive highs, 0 when the highs
+        are trending up
+        """
+
+        drops = [(highs[i-1] - highs[i]) / highs[i-1]
+                 for i in range(1, len(highs)) if highs[i-1]]
+
+        if not drops or any(pd.isna(drop) for drop in drops):
+            return None
+
+        return max(max(drops), 0.)
+
+
     @staticmethod
     def is_in_range(x, y, range_percent=10):
 
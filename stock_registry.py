@@ -0,0 +1,71 @@
+import threading
+
+from stock_data import Stock
+
+
+class StockRegistry:
+    """
+    Central store guaranteeing a single Stock per symbol, so that stage
+    sets, open positions and journal replays share the same object (and
+    its data, resamplers and indicator state) instead of each building
+    their own.
+
+    Stocks are created on first lookup with the registry's Stock settings
+    (stock_kwargs). Stocks compare and hash by symbol, so set membership
+    of a registry Stock is an O(1) symbol lookup.
+    """
+
+    def __init__(self, **stock_kwargs):
+
+        self.stock_kwargs = stock_kwargs
+
+        self.lock = threading.Lock()
+        self.stocks = {}
+
+
+    def get(self, symbol, **kwargs):
+        """
+        Return the Stock of the symbol, created with the registry settings
+        updated by kwargs if it does not exist yet
+        """
+
+        with self.lock:
+
+            if symbol not in self.stocks:
+
+                stock_kwargs = dict(self.stock_kwargs, **kwargs)
+                self.stocks[symbol] = Stock(symbol, **stock_kwargs)
+
+            return self.stocks[symbol]
+
+
+    def find(self, symbol):
+        """
+        Return the Stock of the symbol, or None if it is not registered
+        """
+
+        return self.stocks.get(symbol)
+
+
+    def get_many(self, symbols):
+
+        return {self.get(symbol) for symbol in symbols}
+
+
+    def __contains__(self, symbol):
+
+        return symbol in self.stocks
+
+
+    def __len__(self):
+
+        return len(self.stocks)
+
+
+    def __iter__(self):
+
+        return iter(list(self.stocks.values()))
+
+
+# Registry of the scan session
+registry = StockRegistry()
@@ -0,0 +1,222 @@
+"""
+Several strategy configurations (Stock settings such as trend_timeframe,
+tactical_timeframe or stoch_windows) run in one process, each with its own
+stage sets, Stock objects, journal and orders, over a shared data plane:
+
+    - bar cache: results of Stock.bars_flight are shared by every strategy
+      asking for the same bars (symbol, timeframe, limit) in the same bar
+      period, for cache_age seconds
+    - fetch layer: one HTTP client (api_client.client), one watchlist
+      build and one set of bulk warm-up requests for all the strategies
+    - rate budget: Stock.fetch_pacer spaces the bar requests of all the
+      strategies
+
+so that API usage grows with the symbols (and the distinct timeframes of
+the strategies), not with symbols x strategies.
+
+Strategies are read from a JSON file of {name: Stock settings}, e.g.:
+
+    {
+        "daily": {"tactical_timeframe": "60Min", "stoch_windows": [8, 3, 5]},
+        "fast": {"tactical_timeframe": "15Min", "stoch_windows": [5, 3, 3]}
+    }
+"""
+import json
+import threading
+
+import logging
+from ttf_logger import debug_logger
+
+import scan_data as scan
+import tripletimeframe_main as ttf
+from journal import Journal
+from rate_limiter import RateLimiter
+from screener import screened_watchlist
+from single_flight import SingleFlight
+from stock_data import Stock
+from stock_registry import StockRegistry
+
+
+class Strategy:
+    """
+    One configuration of the scan pipeline: a registry creating its Stock
+    objects with the strategy settings (stock_kwargs), and the stocks
+    dictionary of its stages once initialized
+    """
+
+    def __init__(self, name, **stock_kwargs):
+
+        self.name = name
+        self.stock_kwargs = stock_kwargs
+
+        self.registry = StockRegistry(strategy=name, **stock_kwargs)
+        self.stocks = None
+
+
+    def journal_path(self):
+
+        return 'scan_journal-{}.jsonl'.format(self.name)
+
+
+class SymbolClaims:
+    """
+    Symbols held by each strategy, from the order submission until the
+    position is closed. The strategies trade the same account, where a
+    position is per symbol: a symbol held by one strategy is not bought by
+    the others, so that no strategy sells a position another one opened
+    """
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+        self.owners = {}
+
+
+    def claim(self, symbol, owner):
+        """
+        Reserve the symbol for owner. Return False if another owner holds it
+        """
+
+        with self.lock:
+            holder = self.owners.setdefault(symbol, owner)
+
+        return holder == owner
+
+
+    def release(self, symbol, owner):
+
+        with self.lock:
+
+            if self.owners.get(symbol) == owner:
+                del self.owners[symbol]
+
+
+    def owner(self, symbol):
+
+        return self.owners.get(symbol)
+
+
+class DataPlane:
+    """
+    Bar cache and rate budget shared by the strategies, installed on Stock
+    for the duration of a run
+    """
+
+    def __init__(self, cache_age=60, request_interval=0.2):
+
+        self.bars_flight = SingleFlight(max_age=cache_age)
+        self.fetch_pacer = RateLimiter(request_interval)
+
+        self.originals = None
+
+
+    def install(self):
+
+        self.originals = (Stock.bars_flight, Stock.fetch_pacer)
+        Stock.bars_flight = self.bars_flight
+        Stock.fetch_pacer = self.fetch_pacer
+
+
+    def uninstall(self):
+
+        if self.originals is not None:
+            Stock.bars_flight, Stock.fetch_pacer = self.originals
+            self.originals = None
+
+
+class StrategyHost:
+    """
+    Run the stage threads of every strategy in one process. Each strategy
+    has its own loop lock, so a slow strategy does not hold up the others
+    """
+
+    def __init__(self, strategies, data_plane=None):
+
+        names = [strategy.name for strategy in strategies]
+
+        if len(set(names)) != len(names):
+            raise ValueError("Duplicate strategy names: {}".format(names))
+
+        self.strategies = strategies
+        self.data_plane = data_plane or DataPlane()
+        self.claims = SymbolClaims()
+
+
+    def initialize(self, universe=screened_watchlist):
+        """
+        Create the stocks dictionary of every strategy, resumed from its own
+        journal if it holds a session from today. The watchlist is built
+        once for the strategies starting a new session. The positions of
+        the open positions file go to the first strategy
+        """
+
+        built = []
+
+        def watchlist():
+
+            if not built:
+                built.append(scan.build_watchlist(universe))
+
+            return built[0]
+
+        for i, strategy in enumerate(self.strategies):
+
+            stocks = scan.initialize_data(universe, strategy.registry,
+                                          journal=Journal(strategy.journal_path()),
+                                          watchlist=watchlist,
+                                          positions=i == 0)
+
+            stocks['strategy'] = strategy.name
+            stocks['claims'] = self.claims
+
+            for stock in stocks['bought']:
+
+                if not self.claims.claim(stock.symbol, strategy.name):
+                    debug_logger.debug("'{}' position of '{}' is also held by '{}'".format(
+                                        stock.symbol, strategy.name,
+                                        self.claims.owner(stock.symbol)))
+
+            strategy.stocks = stocks
+
+        debug_logger.debug("Initialized {} strategies".format(len(self.strategies)))
+
+
+    def warm_up(self):
+
+        self.data_plane.install()
+
+        try:
+            scan.warm_up(*[strategy.stocks for strategy in self.strategies])
+        finally:
+            self.data_plane.uninstall()
+
+
+    def run(self):
+        """
+        Run the stages of every strategy until the session ends
+        """
+
+        thread_lock = threading.Lock()
+        threads = []
+
+        for strategy in self.strategies:
+            threads.extend(ttf.stage_threads(strategy.stocks, thread_lock,
+                                             prefix=strategy.name + '-'))
+
+        self.data_plane.install()
+
+        try:
+            ttf.run_threads(threads)
+        finally:
+            self.data_plane.uninstall()
+
+
+def load_strategies(path):
+    """
+    Read the strategies of a JSON file of {name: Stock settings}
+    """
+
+    with open(path) as f:
+        config = json.load(f)
+
+    return [Strategy(name, **stock_kwargs) for name, stock_kwargs in config.items()]
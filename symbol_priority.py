@@ -0,0 +1,88 @@
+import heapq
+from itertools import count
+
+
+class PriorityScheduler:
+    """
+    Decide which stocks of a stage set are scanned on each pass.
+
+    Stocks are kept in a heap ordered by the pass they are due on and by
+    their distance to the stage trigger condition (Stock.distance). After
+    being evaluated, a stock is due again after a number of passes that
+    grows with its distance:
+
+        - distance 0 (condition met) or unknown: next pass
+        - distance >= scale: every max_skip passes
+
+    Stocks new to the set are due immediately.
+    """
+
+    def __init__(self, scale=0.1, max_skip=4):
+
+        self.scale = scale
+        self.max_skip = max_skip
+
+        self.pass_count = 0
+        self.heap = []
+        self.entries = {}
+        self.sequence = count()
+
+
+    def push(self, stock, due, distance):
+
+        entry = next(self.sequence)
+        self.entries[stock] = entry
+        heapq.heappush(self.heap, (due, distance, entry, stock))
+
+
+    def due(self, stocks):
+        """
+        Start a new pass over the given stage set and return the stocks due
+        on it, closest to their trigger condition first
+        """
+
+        self.pass_count += 1
+
+        for stock in stocks:
+
+            if stock not in self.entries:
+                self.push(stock, self.pass_count, 0.)
+
+        due_stocks = []
+
+        while self.heap and self.heap[0][0] <= self.pass_count:
+
+            due, distance, entry, stock = heapq.heappop(self.heap)
+
+            if self.entries.get(stock) != entry:
+                continue
+
+            if stock not in stocks:
+                del self.entries[stock]
+                continue
+
+            due_stocks.append(stock)
+
+        return due_stocks
+
+
+    def reschedule(self, stock, distance):
+        """
+        Schedule the next scan of an evaluated stock based on its distance
+        """
+
+        if distance is None:
+            distance = 0.
+
+        closeness = min(distance / self.scale, 1.)
+        skip = 1 + int(round((self.max_skip - 1) * closeness))
+
+        self.push(stock, self.pass_count + skip, distance)
+
+
+    def skip(self, stock):
+        """
+        Keep an unevaluated stock (e.g. open position) due on the next pass
+        """
+
+        self.push(stock, self.pass_count + 1, 0.)
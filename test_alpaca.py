@@ -1,3 +1,4 @@
+import requests
 import requests_mock
 import unittest
 from unittest.mock import Mock, patch, call
@@ -62,6 +63,51 @@ class TestAlpaca(unittest.TestCase):
         self.assertEqual(actual_result, True)
 
 
+    @patch('alpaca.Alpaca.take_and_stop')
+    @patch('alpaca.Alpaca.is_tradable')
+    @requests_mock.Mocker()
+    def test_place_order_not_tradable(self, mock_is_tradable, mock_take_and_stop,
+                                      mock_request):
+
+        mock_request.post(self._orders_url, text='ok')
+        mock_is_tradable.return_value = False
+
+        actual_result = self.alpaca.place_order('FAKE', 'buy', 15)
+
+        self.assertEqual(actual_result, False)
+        self.assertEqual(mock_request.call_count, 0)
+        mock_take_and_stop.assert_not_called()
+
+
+    @requests_mock.Mocker()
+    def test_submit_order_rejected(self, mock_request):
+
+        mock_request.post(self._orders_url, status_code=403)
+
+        actual_result = self.alpaca.submit_order('FAKE', 'buy', 15, {}, {})
+
+        self.assertEqual(actual_result, False)
+
+
+    @requests_mock.Mocker()
+    def test_close_position_rejected(self, mock_request):
+
+        mock_request.delete(self._positions_url + '/FAKE', status_code=403,
+                            json={'message': 'forbidden'})
+
+        with self.assertRaises(requests.HTTPError):
+            self.alpaca.close_position('FAKE')
+
+
+    @requests_mock.Mocker()
+    def test_close_position_already_closed(self, mock_request):
+
+        mock_request.delete(self._positions_url + '/FAKE', status_code=404,
+                            json={'message': 'position does not exist'})
+
+        self.alpaca.close_position('FAKE')
+
+
     @requests_mock.Mocker()
     def test_is_tradable_true(self, mock_request):
 
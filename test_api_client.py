@@ -0,0 +1,214 @@
+import unittest
+from unittest.mock import Mock, patch
+from time import sleep
+from time import time
+
+import requests
+import requests_mock
+
+import logging
+
+from api_client import ApiClient, CircuitBreaker, CircuitOpenError
+from fake_alpaca import FakeAlpaca
+
+logging.disable(logging.CRITICAL)
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_after_threshold(self):
+
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+        breaker.record_failure()
+        self.assertEqual(breaker.allow(), True)
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertEqual(breaker.allow(), False)
+
+
+    def test_half_open_single_trial(self):
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+
+        self.assertEqual(breaker.allow(), True)
+        self.assertEqual(breaker.allow(), False)
+
+        breaker.record_success()
+
+        self.assertEqual(breaker.state, 'closed')
+        self.assertEqual(breaker.allow(), True)
+
+
+    def test_failed_trial_reopens(self):
+
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0)
+
+        for _ in range(3):
+            breaker.record_failure()
+
+        breaker.allow()
+        breaker.reset_timeout = 30
+        breaker.record_failure()
+
+        self.assertEqual(breaker.state, 'open')
+
+
+class TestApiClient(unittest.TestCase):
+
+    url = 'https://data.alpaca.markets/v1/bars/1Min'
+
+    def setUp(self):
+
+        self.client = ApiClient(backoff=0.001, max_backoff=0.001)
+
+
+    @requests_mock.Mocker()
+    def test_retry_rate_limited(self, mock_requests):
+
+        mock_requests.get(self.url, [{'status_code': 429},
+                                     {'status_code': 503},
+                                     {'status_code': 200, 'json': {}}])
+
+        actual_result = self.client.get(self.url)
+
+        self.assertEqual(actual_result.status_code, 200)
+        self.assertEqual(mock_requests.call_count, 3)
+
+
+    @requests_mock.Mocker()
+    def test_retries_exhausted(self, mock_requests):
+
+        mock_requests.get(self.url, status_code=429)
+
+        with self.assertRaises(requests.HTTPError):
+            self.client.get(self.url)
+
+        self.assertEqual(mock_requests.call_count, self.client.retries + 1)
+
+
+    @requests_mock.Mocker()
+    def test_retry_after(self, mock_requests):
+
+        mock_requests.get(self.url, status_code=429,
+                          headers={'Retry-After': '0.2'})
+        self.client.deadline = 0.1
+
+        start = time()
+
+        with self.assertRaises(requests.HTTPError):
+            self.client.get(self.url)
+
+        # Waiting 0.2s would exceed the deadline, so no retry is made
+        self.assertEqual(mock_requests.call_count, 1)
+        self.assertLess(time() - start, 0.1)
+
+
+    @requests_mock.Mocker()
+    def test_no_retry_not_idempotent(self, mock_requests):
+
+        mock_requests.post(self.url, status_code=503)
+
+        with self.assertRaises(requests.HTTPError):
+            self.client.post(self.url)
+
+        self.assertEqual(mock_requests.call_count, 1)
+
+
+    @requests_mock.Mocker()
+    def test_client_errors_returned(self, mock_requests):
+
+        mock_requests.get(self.url, status_code=404)
+
+        actual_result = self.client.get(self.url)
+
+        self.assertEqual(actual_result.status_code, 404)
+        self.assertEqual(mock_requests.call_count, 1)
+
+
+    @requests_mock.Mocker()
+    def test_circuit_per_endpoint(self, mock_requests):
+
+        other_url = 'https://paper-api.alpaca.markets/v2/positions'
+        mock_requests.get(self.url, exc=requests.ConnectionError)
+        mock_requests.get(other_url, json={})
+
+        self.client.retries = 0
+        self.client.failure_threshold = 2
+
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                self.client.get(self.url)
+
+        with self.assertRaises(CircuitOpenError):
+            self.client.get(self.url)
+
+        self.assertEqual(mock_requests.call_count, 2)
+        self.assertEqual(self.client.get(other_url).status_code, 200)
+
+
+    def test_other_errors_end_half_open_trial(self):
+
+        session = Mock()
+        session.request.side_effect = [requests.exceptions.ChunkedEncodingError,
+                                       Mock(status_code=200)]
+
+        self.client.retries = 0
+        self.client.failure_threshold = 1
+        self.client.reset_timeout = 0
+
+        with patch.object(ApiClient, 'session', return_value=session):
+
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                self.client.get(self.url)
+
+            # The failed trial reopened the circuit, the next one goes through
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+    def test_deadline(self):
+
+        fake = FakeAlpaca(['AAA'], timeout_ratio=1., timeout_delay=1.).start()
+        self.client.timeout = 5
+        self.client.deadline = 0.3
+
+        start = time()
+
+        try:
+            with self.assertRaises(requests.Timeout):
+                self.client.get(fake.data_url + '/bars/1Min',
+                                params={'symbols': 'AAA'})
+        finally:
+            fake.stop()
+
+        self.assertLess(time() - start, 0.6)
+
+
+    def test_hedged(self):
+
+        calls = []
+
+        def request(method, url, timeout, **kwargs):
+
+            calls.append(time())
+
+            # The first request is slow, the hedged one is fast
+            if len(calls) == 1:
+                sleep(0.5)
+                return Mock(status_code=200, content=b'slow')
+
+            return Mock(status_code=200, content=b'fast')
+
+        session = Mock()
+        session.request.side_effect = request
+
+        with patch.object(ApiClient, 'session', return_value=session):
+            actual_result = self.client.get(self.url, hedge=0.05)
+
+        self.assertEqual(actual_result.content, b'fast')
+        self.assertEqual(len(calls), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import unittest
+from unittest.mock import Mock, patch
+import os
+import math
+import tempfile
+from datetime import datetime
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from bar_ring import BarRing, BarRingReader
+from stock_data import Stock
+
+logging.disable(logging.CRITICAL)
+
+def bars_frame(times, close=10.):
+
+    return pd.DataFrame({'time': times,
+                         'open': close, 'high': close + 1, 'low': close - 1,
+                         'close': close, 'volume': 100.})
+
+
+class TestBarRing(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'bars.ring')
+        self.ring = BarRing(self.path, slots=2, depth=4)
+        self.reader = BarRingReader(self.path)
+
+
+    def tearDown(self):
+
+        self.reader.close()
+        self.ring.close()
+        self.tmp_dir.cleanup()
+
+
+    def test_publish_and_read(self):
+
+        self.ring.publish('AAA', '1Min', bars_frame([60, 120]), potential=2,
+                          distance=0.)
+
+        actual_result = self.reader.read('AAA', '1Min')
+
+        np.testing.assert_array_equal(actual_result['bars'][:, 0], [60, 120])
+        self.assertEqual(actual_result['bars'][-1, 4], 10.)
+        self.assertEqual(actual_result['potential'], 2.)
+        self.assertTrue(math.isnan(actual_result['k']))
+        self.assertEqual(self.reader.keys(), ['AAA:1Min'])
+        self.assertIsNone(self.reader.read('BBB', '1Min'))
+
+
+    def test_ring_merges_by_time(self):
+
+        self.ring.publish('AAA', '1Min', bars_frame([60, 120, 180]))
+
+        # In progress bar updated, then more bars than the depth
+        self.ring.publish('AAA', '1Min', bars_frame([120, 180, 240, 300, 360],
+                                                   close=11.))
+
+        bars = self.reader.read('AAA', '1Min')['bars']
+
+        np.testing.assert_array_equal(bars[:, 0], [180, 240, 300, 360])
+        np.testing.assert_array_equal(bars[:, 4], [11.] * 4)
+
+
+    def test_datetime_index(self):
+
+        moments = [datetime(2021, 3, 1, 10, 30), datetime(2021, 3, 1, 11, 30)]
+        data = bars_frame([0, 0]).drop(columns='time')
+        data.index = pd.Index(moments, name='time')
+
+        self.ring.publish('AAA', '60Min', data, strategy='fast', k=50., d=40.)
+
+        actual_result = self.reader.read('AAA', '60Min', strategy='fast')
+
+        self.assertEqual(actual_result['bars'][-1, 0], moments[-1].timestamp())
+        self.assertEqual((actual_result['k'], actual_result['d']), (50., 40.))
+
+
+    def test_full(self):
+
+        self.assertTrue(self.ring.publish('AAA', '1Min', bars_frame([60])))
+        self.assertTrue(self.ring.publish('BBB', '1Min', bars_frame([60])))
+        self.assertFalse(self.ring.publish('CCC', '1Min', bars_frame([60])))
+
+
+    def test_long_key_rejected(self):
+
+        strategy = 'a-strategy-with-a-long-name'
+
+        self.assertFalse(self.ring.publish('AAA', '15Min', bars_frame([60]),
+                                           strategy=strategy))
+        self.assertEqual(self.reader.keys(), [])
+
+        with self.assertRaises(ValueError):
+            self.reader.read('AAA', '15Min', strategy=strategy)
+
+
+    def test_torn_read_retried(self):
+
+        self.ring.publish('AAA', '1Min', bars_frame([60]))
+
+        # Writer in the middle of a write
+        self.ring.slots['sequence'][0] += 1
+
+        with self.assertRaises(BlockingIOError):
+            self.reader.read('AAA', '1Min', retries=3)
+
+
+    def test_new_writer_replaces_file(self):
+
+        self.ring.publish('AAA', '1Min', bars_frame([60]))
+        self.assertFalse(self.reader.stale())
+
+        ring = BarRing(self.path, slots=2, depth=4)
+
+        try:
+            # The old mapping is still readable
+            self.assertTrue(self.reader.stale())
+            self.assertEqual(len(self.reader.read('AAA', '1Min')['bars']), 1)
+
+            self.reader.reopen()
+            self.assertIsNone(self.reader.read('AAA', '1Min'))
+        finally:
+            ring.close()
+
+
+    def test_not_a_bars_file(self):
+
+        with open(self.path + '.other', 'wb') as f:
+            f.write(b'\0' * 128)
+
+        with self.assertRaises(ValueError):
+            BarRingReader(self.path + '.other')
+
+
+class TestStockPublish(unittest.TestCase):
+
+    def test_publish_bars(self):
+
+        stock = Stock('AAA')
+        data = bars_frame([60])
+
+        with patch.object(Stock, 'bar_ring', Mock()) as mock_ring:
+            stock.publish_bars('1Min', data, potential=2, distance=None)
+
+        args, kwargs = mock_ring.publish.call_args
+
+        self.assertEqual(args, ('AAA', '1Min', data))
+        self.assertEqual(kwargs['potential'], 2.)
+        self.assertTrue(math.isnan(kwargs['distance']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import json
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+import bars
+from stock_data import Stock
+
+
+class TestBars(unittest.TestCase):
+
+    def setUp(self):
+
+        self.bars = [
+            {'t': 1600000000, 'o': 10., 'h': 11.5, 'l': 9.5, 'c': 11, 'v': 100},
+            {'t': 1600000060, 'o': 11., 'h': 12., 'l': 10.5, 'c': 11.5, 'v': 250},
+            ]
+
+        self.content = json.dumps({'AAA': self.bars, 'BBB': []}).encode()
+
+
+    def test_decode(self):
+
+        actual_result = bars.decode(self.content)
+
+        self.assertEqual(set(actual_result), {'AAA', 'BBB'})
+        self.assertEqual(len(actual_result['BBB']['time']), 0)
+
+        columns = actual_result['AAA']
+        np.testing.assert_array_equal(columns['close'], [11., 11.5])
+        self.assertEqual(columns['time'].dtype, np.int64)
+        self.assertEqual(columns['volume'].dtype, np.int64)
+        self.assertEqual(columns['open'].dtype, np.float64)
+
+
+    def test_decode_paged_shape(self):
+
+        content = json.dumps({'bars': {'AAA': self.bars},
+                              'next_page_token': None}).encode()
+
+        actual_result = bars.decode(content)
+
+        self.assertEqual(set(actual_result), {'AAA'})
+        np.testing.assert_array_equal(actual_result['AAA']['time'],
+                                      [1600000000, 1600000060])
+
+
+    def test_frame_matches_from_dict(self):
+
+        expected_result = pd.DataFrame.from_dict(self.bars)
+        expected_result.rename(Stock.rename_dict, axis=1, inplace=True)
+        expected_result['close'] = expected_result['close'].astype(float)
+
+        actual_result = bars.frame(bars.decode(self.content)['AAA'])
+
+        assert_frame_equal(actual_result, expected_result)
+
+
+if __name__ == '__main__':
+    unittest.main()
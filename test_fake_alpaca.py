@@ -0,0 +1,107 @@
+import json
+import unittest
+
+import logging
+
+import requests
+
+from alpaca import Alpaca
+from fake_alpaca import FakeAlpaca
+from stock_data import Stock
+
+logging.disable(logging.CRITICAL)
+
+class TestFakeAlpaca(unittest.TestCase):
+
+    def setUp(self):
+
+        self.fake = FakeAlpaca(['AAA', 'BBB'], watchlist=['AAA']).start()
+
+        self.urls = (Alpaca.base_url, Alpaca.market_url,
+                     Stock.data_url, Stock.trading_url)
+
+        Alpaca.set_urls(self.fake.trading_url, self.fake.data_url)
+        Stock.data_url = self.fake.data_url
+        Stock.trading_url = self.fake.trading_url
+        Stock.bars_flight.calls.clear()
+
+
+    def tearDown(self):
+
+        base_url, market_url, Stock.data_url, Stock.trading_url = self.urls
+        Alpaca.set_urls(base_url, market_url)
+
+        self.fake.stop()
+
+    ### ------------------- ENDPOINTS TESTS ------------------- ###
+
+    def test_bars(self):
+
+        actual_result = Stock('AAA').fetch_data('1Min', limit=10)
+
+        self.assertEqual(len(actual_result), 10)
+        self.assertEqual(list(actual_result.columns),
+                         ['time', 'open', 'high', 'low', 'close', 'volume'])
+        self.assertEqual(actual_result['time'].diff().iloc[-1], 60)
+
+
+    def test_bulk_bars(self):
+
+        actual_result = Stock.get_bulk_data({'AAA', 'BBB', 'ZZZ'}, 'day', 5)
+
+        self.assertEqual(sorted(actual_result), ['AAA', 'BBB'])
+
+
+    def test_watchlist(self):
+
+        actual_result = Alpaca().get_watchlist_symbols()
+
+        self.assertEqual(actual_result, {'AAA'})
+
+
+    def test_order_opens_position(self):
+
+        self.assertEqual(Alpaca().place_order('AAA', 'buy', 10), True)
+
+        position = Stock('AAA').get_open_position()
+
+        self.assertEqual(len(self.fake.stats()['orders']), 1)
+        self.assertIsInstance(position['unrealized_plpc'], float)
+
+
+    def test_close_position_closes_one(self):
+
+        a = Alpaca()
+        a.place_order('AAA', 'buy', 10)
+        a.place_order('BBB', 'buy', 10)
+
+        a.close_position('AAA')
+
+        self.assertEqual(set(self.fake.positions), {'BBB'})
+        self.assertEqual(Stock('BBB').get_open_position()['symbol'], 'BBB')
+
+    ### ------------------- FAULTS TESTS ------------------- ###
+
+    def test_rate_limit_injection(self):
+
+        self.fake.rate_limit_ratio = 1.
+
+        r = requests.get(self.fake.data_url + '/bars/1Min',
+                         params={'symbols': 'AAA'})
+
+        self.assertEqual(r.status_code, 429)
+        self.assertEqual(self.fake.stats()['faults'], {'429': 1})
+
+
+    def test_timeout_injection(self):
+
+        self.fake.timeout_ratio = 1.
+        self.fake.timeout_delay = 1.
+
+        with self.assertRaises(requests.Timeout):
+            requests.get(self.fake.data_url + '/bars/1Min',
+                         params={'symbols': 'AAA'}, timeout=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
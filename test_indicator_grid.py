@@ -0,0 +1,120 @@
+import unittest
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+import indicator_grid
+import signals
+from stock_data import Stock
+
+logging.disable(logging.CRITICAL)
+
+class TestIndicatorGrid(unittest.TestCase):
+
+    def setUp(self):
+
+        rng = np.random.default_rng(0)
+
+        closes = 100 * np.cumprod(1 + rng.normal(0.002, 0.01, 300))
+        closes[150:] = closes[150]
+
+        self.data = pd.DataFrame({
+            'close': closes,
+            'high': closes * 1.01,
+            'low': closes * 0.99,
+            })
+
+
+    def test_sliding_windows(self):
+
+        values = self.data['close'].values[::2]
+
+        actual_result = indicator_grid.sliding_windows(values, 3)
+
+        np.testing.assert_array_equal(actual_result,
+                                      [values[i:i + 3] for i in range(len(values) - 2)])
+        self.assertFalse(actual_result.flags.writeable)
+
+
+    def test_rolling_means_match_pandas(self):
+
+        values = self.data['close'].copy()
+        values.iloc[100] = np.nan
+
+        actual_result = indicator_grid.rolling_means(values.values, (1, 5, 50, 400))
+
+        for window, mean in actual_result.items():
+
+            expected_result = values.rolling(window).mean().values
+            np.testing.assert_allclose(mean, expected_result)
+
+
+    def test_stochastic_grid_matches_stock(self):
+
+        stoch_windows = [(8, 3, 5), (8, 3, 3), (14, 3, 3), (5, 1, 3)]
+
+        actual_result = indicator_grid.stochastic_grid(self.data['high'].values,
+                                                       self.data['low'].values,
+                                                       self.data['close'].values,
+                                                       stoch_windows)
+
+        self.assertEqual(set(actual_result), set(stoch_windows))
+
+        for windows in stoch_windows:
+
+            stock = Stock('AAA', stoch_windows=windows)
+            expected_result = stock.get_stochastic(self.data.copy())
+
+            k, d = actual_result[windows]
+            np.testing.assert_allclose(k, expected_result['k'].values)
+            np.testing.assert_allclose(d, expected_result['d'].values)
+
+
+    def test_trend_signals_match_batched_rule(self):
+
+        sma_windows = [(50,), (20, 50), (50, 200)]
+
+        actual_result = indicator_grid.trend_signals(self.data['close'].values,
+                                                     self.data['low'].values,
+                                                     sma_windows)
+
+        # Sets sharing their first window share the verdict
+        self.assertIs(actual_result[(50,)], actual_result[(50, 200)])
+
+        for sma_set in ((50,), (20, 50)):
+
+            sma = self.data['close'].rolling(sma_set[0]).mean()
+
+            for end in (59, 120, 200, 299):
+
+                rows = slice(end - 59, end + 1)
+                expected_result = signals.trend_potentials(
+                    self.data['close'].values[rows], sma.values[rows],
+                    self.data['low'].values[rows])[0]
+
+                self.assertEqual(actual_result[sma_set][end], expected_result)
+
+        self.assertEqual(list(actual_result[(50,)][:59]), [0] * 59)
+
+
+    def test_tactical_signals(self):
+
+        actual_result = indicator_grid.tactical_signals(self.data['high'].values,
+                                                        self.data['low'].values,
+                                                        self.data['close'].values,
+                                                        [(8, 3, 5)])
+
+        k, d = indicator_grid.stochastic_grid(self.data['high'].values,
+                                              self.data['low'].values,
+                                              self.data['close'].values,
+                                              [(8, 3, 5)])[(8, 3, 5)]
+
+        expected_result = signals.tactical_potentials(k, d)
+
+        np.testing.assert_array_equal(actual_result[(8, 3, 5)], expected_result)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,191 @@
+import os
+import json
+import tempfile
+import unittest
+from time import sleep
+from unittest.mock import patch
+
+import logging
+
+import journal
+from journal import Journal
+from market_calendar import eastern
+
+logging.disable(logging.CRITICAL)
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'journal.jsonl')
+        self.journal = Journal(self.path, sync_every=2)
+
+
+    def tearDown(self):
+
+        if not self.journal.file.closed:
+            self.journal.close()
+
+        self.tmp_dir.cleanup()
+
+
+    def record_session(self):
+
+        self.journal.record('universe', symbols=['AAA', 'BBB', 'CCC'])
+        self.journal.record('promote', 'AAA', stage='potential')
+        self.journal.record('promote', 'BBB', stage='potential')
+        self.journal.record('promote', 'AAA', stage='buy')
+        self.journal.record('buy', 'AAA', record={'AAA': {'scans_left': 5}})
+        self.journal.record('position', 'AAA', record={'AAA': {'scans_left': 4}})
+        self.journal.record('promote', 'BBB', stage='standby')
+
+    ### ------------------- REPLAY TESTS ------------------- ###
+
+    def test_replay(self):
+
+        self.record_session()
+
+        actual_result = self.journal.replay()
+
+        self.assertEqual(actual_result['universe'], ['AAA', 'BBB', 'CCC'])
+        self.assertEqual(actual_result['potential'], {'AAA', 'BBB'})
+        self.assertEqual(actual_result['standby'], {'BBB'})
+        self.assertEqual(actual_result['buy'], {'AAA'})
+        self.assertEqual(actual_result['bought'],
+                         {'AAA': {'AAA': {'scans_left': 4}}})
+
+
+    def test_replay_demote(self):
+
+        self.record_session()
+        self.journal.record('demote', 'BBB', stage='standby', reason='ttl')
+
+        actual_result = self.journal.replay()
+
+        self.assertEqual(actual_result['standby'], set())
+        self.assertEqual(actual_result['potential'], {'AAA', 'BBB'})
+
+
+    def test_replay_sell_removes_position(self):
+
+        self.record_session()
+        self.journal.record('sell', 'AAA')
+
+        actual_result = self.journal.replay()
+
+        self.assertEqual(actual_result['bought'], {})
+
+
+    def test_replay_ignores_previous_day_stages(self):
+
+        with patch('journal.datetime') as mock_datetime:
+
+            mock_datetime.now.return_value.strftime.return_value = '2000-01-01'
+            self.record_session()
+
+        actual_result = self.journal.replay()
+
+        self.assertEqual(actual_result['universe'], [])
+        self.assertEqual(actual_result['potential'], set())
+        self.assertEqual(list(actual_result['bought']), ['AAA'])
+
+
+    def test_day_is_eastern(self):
+
+        with patch('journal.datetime') as mock_datetime:
+
+            mock_datetime.now.return_value.strftime.return_value = '2000-01-01'
+            self.journal.record('promote', 'AAA', stage='potential')
+
+        mock_datetime.now.assert_called_once_with(eastern)
+
+
+    def test_replay_ignores_torn_last_line(self):
+
+        self.record_session()
+        self.journal.close()
+
+        with open(self.path, 'a') as f:
+            f.write('{"event": "promote", "sym')
+
+        actual_result = journal.replay(self.path)
+
+        self.assertEqual(actual_result['buy'], {'AAA'})
+
+
+    def test_replay_missing_file(self):
+
+        actual_result = journal.replay(self.path + '.missing')
+
+        self.assertEqual(actual_result['bought'], {})
+
+    ### ------------------- SYNC AND COMPACTION TESTS ------------------- ###
+
+    @patch('journal.os.fsync')
+    def test_record_syncs_in_batches(self, mock_fsync):
+
+        self.journal.sync_interval = 3600
+
+        self.journal.record('promote', 'AAA', stage='potential')
+        self.assertEqual(mock_fsync.call_count, 0)
+
+        self.journal.record('promote', 'BBB', stage='potential')
+        self.assertEqual(mock_fsync.call_count, 1)
+
+
+    @patch('journal.os.fsync')
+    def test_timer_syncs_tail_of_burst(self, mock_fsync):
+
+        self.journal.sync_interval = 0.05
+
+        self.journal.record('promote', 'AAA', stage='potential')
+        self.assertEqual(mock_fsync.call_count, 0)
+
+        sleep(0.2)
+
+        self.assertEqual(mock_fsync.call_count, 1)
+        self.assertIsNone(self.journal.timer)
+
+
+    @patch('journal.os.fsync')
+    def test_buy_syncs_at_once(self, mock_fsync):
+
+        self.journal.sync_interval = 3600
+
+        self.journal.record('buy', 'AAA', record={'AAA': {}})
+
+        self.assertEqual(mock_fsync.call_count, 1)
+
+
+    def test_compact(self):
+
+        self.record_session()
+        expected_result = self.journal.replay()
+
+        self.journal.compact()
+
+        with open(self.path) as f:
+            lines = f.readlines()
+
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['event'], 'snapshot')
+        self.assertEqual(journal.replay(self.path), expected_result)
+
+
+    def test_record_compacts_automatically(self):
+
+        self.journal.compact_every = 4
+
+        self.record_session()
+        self.journal.flush()
+
+        with open(self.path) as f:
+            lines = f.readlines()
+
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(self.journal.replay()['standby'], {'BBB'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+import unittest
+import sys
+
+from lazy_import import LazyModule
+
+
+class TestLazyModule(unittest.TestCase):
+
+    def test_imported_on_first_access(self):
+
+        sys.modules.pop('colorsys', None)
+        colorsys = LazyModule('colorsys')
+
+        self.assertNotIn('colorsys', sys.modules)
+
+        self.assertEqual(colorsys.rgb_to_hsv(1., 0., 0.), (0., 1., 1.))
+        self.assertIn('colorsys', sys.modules)
+
+
+    def test_missing_module(self):
+
+        missing = LazyModule('no_such_module')
+
+        with self.assertRaises(ImportError):
+            missing.anything
+
+
+if __name__ == '__main__':
+    unittest.main()
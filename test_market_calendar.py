@@ -0,0 +1,174 @@
+import unittest
+from unittest.mock import Mock
+from datetime import date, datetime, time
+
+import logging
+
+import requests
+import requests_mock
+
+from alpaca import Alpaca
+from market_calendar import (eastern, LocalCalendar, AlpacaCalendar,
+                             AdaptiveInterval, stage_volatility)
+
+logging.disable(logging.CRITICAL)
+
+
+def clock(*args):
+
+    return lambda: eastern.localize(datetime(*args))
+
+
+class TestLocalCalendar(unittest.TestCase):
+
+    def setUp(self):
+
+        self.holidays = {date(2021, 7, 5)}
+        self.early_closes = {date(2021, 11, 26): time(13, 0)}
+
+    ### ------------------- SESSION TESTS ------------------- ###
+
+    def test_is_open_during_session(self):
+
+        calendar = LocalCalendar(now=clock(2021, 7, 6, 10, 0))
+
+        self.assertEqual(calendar.is_open(), True)
+
+
+    def test_is_open_before_session(self):
+
+        calendar = LocalCalendar(now=clock(2021, 7, 6, 9, 0))
+
+        self.assertEqual(calendar.is_open(), False)
+        self.assertEqual(calendar.is_session_day(), True)
+
+
+    def test_is_session_day_weekend(self):
+
+        calendar = LocalCalendar(now=clock(2021, 7, 3, 10, 0))
+
+        self.assertEqual(calendar.is_session_day(), False)
+
+
+    def test_is_session_day_holiday(self):
+
+        calendar = LocalCalendar(self.holidays, now=clock(2021, 7, 5, 10, 0))
+
+        self.assertEqual(calendar.is_session_day(), False)
+
+
+    def test_seconds_to_close_early_close(self):
+
+        calendar = LocalCalendar(early_closes=self.early_closes,
+                                 now=clock(2021, 11, 26, 12, 0))
+
+        self.assertEqual(calendar.seconds_to_close(), 3600)
+
+
+    def test_next_open_skips_weekend_and_holiday(self):
+
+        calendar = LocalCalendar(self.holidays, now=clock(2021, 7, 2, 17, 0))
+
+        actual_result = calendar.next_open()
+
+        self.assertEqual(actual_result,
+                         eastern.localize(datetime(2021, 7, 6, 9, 30)))
+
+
+class TestAlpacaCalendar(unittest.TestCase):
+
+    def test_sessions_from_api(self):
+
+        alpaca = Mock()
+        alpaca.get_calendar.return_value = [
+            {'date': '2021-11-26', 'open': '09:30', 'close': '13:00'},
+            ]
+        calendar = AlpacaCalendar(alpaca, now=clock(2021, 11, 26, 12, 30))
+
+        self.assertEqual(calendar.is_open(), True)
+        self.assertEqual(calendar.seconds_to_close(), 1800)
+        self.assertEqual(alpaca.get_calendar.call_count, 1)
+
+
+    def test_sessions_fallback_to_local(self):
+
+        alpaca = Mock()
+        alpaca.get_calendar.side_effect = requests.ConnectionError
+        calendar = AlpacaCalendar(alpaca, now=clock(2021, 7, 6, 10, 0))
+
+        self.assertEqual(calendar.is_open(), True)
+
+
+    @requests_mock.Mocker()
+    def test_rejected_calendar_falls_back(self, mock_request):
+
+        mock_request.get(Alpaca.calendar_url, status_code=403,
+                         json={'message': 'forbidden'})
+        calendar = AlpacaCalendar(Alpaca(), now=clock(2021, 7, 6, 10, 0))
+
+        self.assertEqual(calendar.is_session_day(), True)
+        self.assertEqual(calendar.fallback, True)
+
+
+    def test_fallback_not_cached(self):
+
+        now = [eastern.localize(datetime(2021, 11, 26, 14, 0))]
+        alpaca = Mock()
+        alpaca.get_calendar.side_effect = [
+            requests.ConnectionError,
+            [{'date': '2021-11-26', 'open': '09:30', 'close': '13:00'}],
+            ]
+        calendar = AlpacaCalendar(alpaca, now=lambda: now[0])
+
+        # Local rules do not know the early close
+        self.assertEqual(calendar.is_open(), True)
+
+        # Not retried before retry_interval
+        self.assertEqual(calendar.is_open(), True)
+        self.assertEqual(alpaca.get_calendar.call_count, 1)
+
+        now[0] += AlpacaCalendar.retry_interval
+
+        self.assertEqual(calendar.is_open(), False)
+        self.assertEqual(calendar.is_open(), False)
+        self.assertEqual(alpaca.get_calendar.call_count, 2)
+
+
+class TestAdaptiveInterval(unittest.TestCase):
+
+    def test_empty_stage_waits_max(self):
+
+        interval = AdaptiveInterval(60)
+
+        self.assertEqual(interval.next(0), 240)
+
+
+    def test_scales_with_candidates(self):
+
+        interval = AdaptiveInterval(60, reference_candidates=10)
+
+        self.assertEqual(interval.next(10), 60)
+        self.assertEqual(interval.next(5), 30)
+        self.assertEqual(interval.next(1), 15)
+        self.assertEqual(interval.next(1000), 240)
+
+
+    def test_speeds_up_on_higher_volatility(self):
+
+        interval = AdaptiveInterval(60, reference_candidates=10, smoothing=0)
+
+        self.assertEqual(interval.next(10, 0.01), 60)
+        self.assertEqual(interval.next(10, 0.02), 30)
+
+
+    def test_stage_volatility(self):
+
+        stocks = [Mock(volatility=0.01), Mock(volatility=0.03),
+                  Mock(volatility=None)]
+
+        self.assertEqual(stage_volatility(stocks), 0.02)
+        self.assertEqual(stage_volatility([]), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
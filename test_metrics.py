@@ -0,0 +1,27 @@
+import unittest
+
+from metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_counters_and_gauges(self):
+
+        metrics = Metrics()
+
+        metrics.increment('demoted.buy.ttl')
+        metrics.increment('demoted.buy.ttl', 2)
+        metrics.gauge('stage.buy.size', 5)
+        metrics.gauge('stage.buy.size', 3)
+
+        self.assertEqual(metrics.get('demoted.buy.ttl'), 3)
+        self.assertEqual(metrics.get('demoted.buy.signal'), 0)
+        self.assertEqual(metrics.snapshot('stage.'), {'stage.buy.size': 3})
+
+        metrics.reset()
+
+        self.assertEqual(metrics.snapshot(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+from unittest.mock import Mock
+import threading
+
+import logging
+
+import requests
+
+from alpaca import Alpaca
+from order_queue import OrderQueue
+
+logging.disable(logging.CRITICAL)
+
+class TestOrderQueue(unittest.TestCase):
+
+    def setUp(self):
+
+        self.alpaca = Mock(spec=Alpaca)
+        self.alpaca.is_tradable.return_value = True
+        self.alpaca.take_and_stop.return_value = ({'limit_price': '130'},
+                                                  {'stop_price': '90',
+                                                   'limit_price': '88'})
+        self.alpaca.submit_order.return_value = True
+
+        self.orders = OrderQueue(alpaca=self.alpaca)
+        self.stock = Mock(symbol='FAKE')
+        self.report = Mock()
+
+
+    def tearDown(self):
+
+        self.orders.shutdown()
+
+
+    def test_order_placed_and_reported(self):
+
+        self.assertEqual(self.orders.submit(self.stock, 'buy', 10, self.report), True)
+        self.orders.shutdown()
+
+        self.alpaca.submit_order.assert_called_once_with(
+            'FAKE', 'buy', 10, {'limit_price': '130'},
+            {'stop_price': '90', 'limit_price': '88'})
+        self.report.assert_called_once_with(self.stock, True)
+        self.assertEqual(self.orders.pending('FAKE'), False)
+
+
+    def test_lookups_run_concurrently(self):
+
+        # Each lookup waits for the other one to start
+        barrier = threading.Barrier(2, timeout=2)
+
+        def lookup(result):
+
+            def wait(symbol):
+                barrier.wait()
+                return result
+
+            return wait
+
+        self.alpaca.is_tradable.side_effect = lookup(True)
+        self.alpaca.take_and_stop.side_effect = lookup(({}, {}))
+
+        self.orders.submit(self.stock, 'buy', 10, self.report)
+        self.orders.shutdown()
+
+        self.report.assert_called_once_with(self.stock, True)
+
+
+    def test_not_tradable(self):
+
+        self.alpaca.is_tradable.return_value = False
+
+        self.orders.submit(self.stock, 'buy', 10, self.report)
+        self.orders.shutdown()
+
+        self.alpaca.submit_order.assert_not_called()
+        self.report.assert_called_once_with(self.stock, False)
+
+
+    def test_api_error_reported(self):
+
+        self.alpaca.take_and_stop.side_effect = requests.ConnectionError
+
+        self.orders.submit(self.stock, 'buy', 10, self.report)
+        self.orders.shutdown()
+
+        self.report.assert_called_once_with(self.stock, False)
+        self.assertEqual(self.orders.pending('FAKE'), False)
+
+
+    def test_one_order_in_flight_per_symbol(self):
+
+        placing = threading.Event()
+        release = threading.Event()
+
+        def submit_order(*args):
+            placing.set()
+            release.wait(2)
+            return True
+
+        self.alpaca.submit_order.side_effect = submit_order
+
+        self.orders.submit(self.stock, 'buy', 10, self.report)
+        placing.wait(2)
+
+        self.assertEqual(self.orders.pending('FAKE'), True)
+        self.assertEqual(self.orders.submit(self.stock, 'buy', 10, self.report), False)
+
+        release.set()
+        self.orders.shutdown()
+
+        self.assertEqual(self.report.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import threading
+import unittest
+from time import monotonic
+
+from rate_limiter import RateLimiter
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_first_call_immediate(self):
+
+        start = monotonic()
+        RateLimiter(1).wait()
+
+        self.assertLess(monotonic() - start, 0.05)
+
+
+    def test_shared_across_threads(self):
+
+        limiter = RateLimiter(0.05)
+        calls = []
+
+        def worker():
+            for _ in range(3):
+                limiter.wait()
+                calls.append(monotonic())
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        calls.sort()
+        gaps = [b - a for a, b in zip(calls, calls[1:])]
+
+        # 12 calls by 4 threads take as long as 12 calls by one thread
+        self.assertGreaterEqual(calls[-1] - calls[0], 11 * 0.05 * 0.9)
+        self.assertGreater(min(gaps), 0.03)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import os
+import json
+import tempfile
+import unittest
+import threading
+from unittest.mock import patch
+
+import logging
+
+import record_handler as record
+from stock_data import Stock
+
+logging.disable(logging.CRITICAL)
+
+class TestTradesLedger(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.trades_file = os.path.join(self.tmp_dir.name, 'trades.jsonl')
+        self.index_file = os.path.join(self.tmp_dir.name, 'trades.idx.json')
+
+        self.patches = [
+            patch('record_handler.trades_file', self.trades_file),
+            patch('record_handler.trades_index_file', self.index_file),
+            ]
+
+        for p in self.patches:
+            p.start()
+
+
+    def tearDown(self):
+
+        for p in self.patches:
+            p.stop()
+
+        self.tmp_dir.cleanup()
+
+
+    def store_history(self):
+
+        record.store_new_trades([{'AAA': {'max_unrealized_plpc': 0.1}},
+                                 {'BBB': {'max_unrealized_plpc': 0.2}}],
+                                day='2021-01-04')
+        record.store_new_trades([{'AAA': {'max_unrealized_plpc': 0.3}}],
+                                day='2021-01-05')
+
+    ### ------------------- STORE TESTS ------------------- ###
+
+    def test_store_new_trades_appends_lines(self):
+
+        self.store_history()
+
+        with open(self.trades_file) as f:
+            lines = [json.loads(line) for line in f]
+
+        self.assertEqual([(l['date'], l['symbol']) for l in lines],
+                         [('2021-01-04', 'AAA'),
+                          ('2021-01-04', 'BBB'),
+                          ('2021-01-05', 'AAA')])
+
+
+    def test_store_new_trades_no_trades(self):
+
+        record.store_new_trades([])
+
+        self.assertFalse(os.path.exists(self.trades_file))
+
+
+    def test_store_new_trades_cuts_torn_line(self):
+
+        self.store_history()
+
+        with open(self.trades_file, 'a') as f:
+            f.write('{"date": "2021-01-05", "sym')
+
+        record.store_new_trades([{'CCC': {}}], day='2021-01-06')
+
+        actual_result = record.get_trades()
+
+        self.assertEqual([t['symbol'] for t in actual_result],
+                         ['AAA', 'BBB', 'AAA', 'CCC'])
+
+    ### ------------------- QUERY TESTS ------------------- ###
+
+    def test_get_trades_by_day(self):
+
+        self.store_history()
+
+        actual_result = record.get_trades(day='2021-01-04')
+
+        self.assertEqual([t['symbol'] for t in actual_result], ['AAA', 'BBB'])
+
+
+    def test_get_trades_by_symbol(self):
+
+        self.store_history()
+
+        actual_result = record.get_trades(symbol='AAA')
+
+        self.assertEqual([t['trade'] for t in actual_result],
+                         [{'AAA': {'max_unrealized_plpc': 0.1}},
+                          {'AAA': {'max_unrealized_plpc': 0.3}}])
+
+
+    def test_get_trades_by_day_and_symbol(self):
+
+        self.store_history()
+
+        actual_result = record.get_trades(day='2021-01-05', symbol='BBB')
+
+        self.assertEqual(actual_result, [])
+
+
+    def test_get_trades_rebuilds_missing_index(self):
+
+        self.store_history()
+        os.remove(self.index_file)
+
+        actual_result = record.get_trades(day='2021-01-05')
+
+        self.assertEqual(len(actual_result), 1)
+
+
+    def test_get_trades_waits_for_append(self):
+
+        self.store_history()
+        line = json.dumps({'date': '2021-01-05', 'symbol': 'CCC', 'trade': {}}) + '\n'
+        trades = []
+
+        with record.trades_lock:
+
+            # Append in progress: the reader must not cut it off
+            with open(self.trades_file, 'a') as f:
+                f.write(line[:10])
+
+            reader = threading.Thread(target=lambda: trades.extend(
+                record.get_trades(day='2021-01-05')))
+            reader.start()
+            reader.join(0.1)
+
+            with open(self.trades_file, 'a') as f:
+                f.write(line[10:])
+
+        reader.join()
+
+        self.assertEqual([t['symbol'] for t in trades], ['AAA', 'CCC'])
+
+
+    def test_trade_symbol(self):
+
+        self.assertEqual(record.trade_symbol({'symbol': 'AAA', 'qty': 1}), 'AAA')
+        self.assertEqual(record.trade_symbol({'AAA': {}}), 'AAA')
+        self.assertEqual(record.trade_symbol({'a': 1, 'b': 2}), '')
+
+
+    def test_store_closed_position_record(self):
+
+        stock = Stock('AAPL')
+        stock.open_position()
+        stock.close_position()
+
+        record.store_new_trades([stock.position_record])
+
+        actual_result = record.get_trades(symbol='AAPL')
+
+        self.assertEqual(len(actual_result), 1)
+        self.assertEqual(actual_result[0]['trade'], stock.position_record)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+from datetime import datetime
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from resampler import Resampler
+from stock_data import Stock
+
+logging.disable(logging.CRITICAL)
+
+
+def make_bars(start, periods, seconds):
+
+    times = [int(start.timestamp()) + i * seconds for i in range(periods)]
+    closes = 100 + np.sin(np.arange(periods)) * 5
+
+    return pd.DataFrame({
+        'time': times,
+        'open': closes - 0.5,
+        'high': closes + 1,
+        'low': closes - 1,
+        'close': closes,
+        'volume': np.arange(periods) * 10 + 100,
+        })
+
+
+class TestResampler(unittest.TestCase):
+
+    def setUp(self):
+
+        # 15Min bars from 09:30 to 15:45 (local time), 26 bars
+        self.bars_15min = make_bars(datetime(2021, 3, 1, 9, 30), 26, 900)
+
+    ### ------------------- CONSISTENCY TESTS ------------------- ###
+
+    def test_matches_alpaca_data_resample(self):
+
+        # Missing 10:30 and 11:00 bars (thinly traded symbol): the 10:30
+        # bin has no first bar and is dropped by both
+        gapped = self.bars_15min.drop([4, 6]).reset_index(drop=True)
+
+        for bars in (self.bars_15min, gapped):
+
+            with self.subTest(bars=len(bars)):
+
+                expected_result = Stock('FAKE').alpaca_data_resample(bars.copy())
+
+                resampler = Resampler(3600, offset=1800, base_period=900,
+                                      require_open=True)
+                resampler.update(bars)
+                actual_result = resampler.frame()
+                actual_result['time'] = actual_result['time'].apply(datetime.fromtimestamp)
+                actual_result.set_index('time', inplace=True)
+
+                pd.testing.assert_frame_equal(actual_result, expected_result,
+                                              check_dtype=False, check_freq=False,
+                                              check_index_type=False)
+
+
+    def test_missing_open_kept_without_require_open(self):
+
+        gapped = self.bars_15min.drop([4]).reset_index(drop=True)
+
+        resampler = Resampler(3600, offset=1800, base_period=900)
+        resampler.update(gapped)
+
+        self.assertEqual(len(resampler.frame()), 6)
+
+
+    def test_incremental_updates_match_single_update(self):
+
+        expected_result = Resampler(3600, offset=1800, base_period=900)
+        expected_result.update(self.bars_15min)
+
+        resampler = Resampler(3600, offset=1800, base_period=900)
+
+        for start in range(0, 26, 3):
+            resampler.update(self.bars_15min.iloc[max(start - 1, 0):start + 3])
+
+        pd.testing.assert_frame_equal(resampler.frame(),
+                                      expected_result.frame())
+
+
+    def test_minute_bars_offset_bins(self):
+
+        bars = make_bars(datetime(2021, 3, 1, 9, 30), 90, 60)
+        resampler = Resampler(3600, offset=1800)
+
+        resampler.update(bars)
+        actual_result = resampler.frame()
+        partial = resampler.frame(include_partial=True)
+
+        self.assertEqual(list(actual_result['time']), [bars['time'][0]])
+        self.assertEqual(actual_result['open'][0], bars['open'][0])
+        self.assertEqual(actual_result['close'][0], bars['close'][59])
+        self.assertEqual(actual_result['volume'][0], bars['volume'][:60].sum())
+        self.assertEqual(list(partial['time']), [bars['time'][0], bars['time'][60]])
+
+    ### ------------------- UPDATE RULES TESTS ------------------- ###
+
+    def test_open_bin_bar_replaced(self):
+
+        bars = make_bars(datetime(2021, 3, 1, 9, 30), 3, 60)
+        resampler = Resampler(3600, offset=1800)
+
+        resampler.update(bars)
+        updated = bars.iloc[-1:].copy()
+        updated['close'] = 50.
+        updated['low'] = 49.
+        resampler.update(updated)
+        actual_result = resampler.frame(include_partial=True)
+
+        self.assertEqual(actual_result['close'][0], 50.)
+        self.assertEqual(actual_result['low'][0], 49.)
+        self.assertEqual(actual_result['volume'][0], bars['volume'].sum())
+
+
+    def test_seeded_bins_not_overwritten(self):
+
+        seed = make_bars(datetime(2021, 3, 1, 9, 30), 2, 3600)
+        bars = make_bars(datetime(2021, 3, 1, 10, 30), 120, 60)
+        resampler = Resampler(3600, offset=1800)
+
+        resampler.seed(seed)
+        resampler.update(bars)
+        actual_result = resampler.frame()
+
+        self.assertEqual(len(actual_result), 3)
+        self.assertEqual(actual_result['close'][1], seed['close'][1])
+        self.assertEqual(actual_result['close'][2], bars['close'][119])
+
+
+if __name__ == '__main__':
+    unittest.main()
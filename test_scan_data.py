@@ -2,11 +2,21 @@ import unittest
 from unittest.mock import Mock, patch, call
 
 import logging
+import threading
 from threading import Lock
 
+import requests
+import numpy as np
+
 import scan_data as scan_data
 from alpaca import Alpaca
+from metrics import metrics
+from order_queue import OrderQueue
+from api_client import DataError
 from stock_data import Stock
+from symbol_priority import PriorityScheduler
+from stage_expiry import StageExpiry, StagePolicy
+from strategy_host import SymbolClaims
 
 logging.disable(logging.CRITICAL)
 
@@ -22,6 +32,414 @@ class TestInitializeData(unittest.TestCase):
         self.assertEqual(mock_get_watchlist.call_count, 1)
 
 
+class TestResumeFromJournal(unittest.TestCase):
+
+    def test_resume_from_journal(self):
+
+        stocks = {
+            'initial': {Stock('AAA'), Stock('BBB')},
+            'potential': set(),
+            'standby': set(),
+            'buy': set(),
+            'bought': set(),
+            }
+        state = {
+            'potential': {'AAA', 'BBB'},
+            'standby': {'BBB'},
+            'buy': {'AAA', 'ZZZ'},
+            'bought': {'AAA': {'AAA': {'scans_left': 3}}},
+            }
+
+        scan_data.resume_from_journal(stocks, state)
+
+        self.assertEqual({s.symbol for s in stocks['potential']}, {'AAA', 'BBB'})
+        self.assertEqual({s.symbol for s in stocks['standby']}, {'BBB'})
+        self.assertEqual({s.symbol for s in stocks['buy']}, {'AAA'})
+
+        bought, = stocks['bought']
+        self.assertEqual(bought.symbol, 'AAA')
+        self.assertEqual(bought.open, True)
+        self.assertEqual(bought.position_record, {'AAA': {'scans_left': 3}})
+        self.assertIn(bought, stocks['initial'])
+
+
+class TestPromote(unittest.TestCase):
+
+    def test_promote_journals_transitions_only(self):
+
+        stock = Stock('AAA')
+        stocks = {'potential': set(), 'journal': Mock()}
+
+        scan_data.promote(stocks, stock, 'potential')
+        scan_data.promote(stocks, stock, 'potential')
+
+        self.assertEqual(stocks['potential'], {stock})
+        stocks['journal'].record.assert_called_once_with('promote', 'AAA',
+                                                         stage='potential')
+
+
+class TestStageExpiry(unittest.TestCase):
+
+    def setUp(self):
+
+        metrics.reset()
+
+        self.stock = Mock(symbol='AAA', open=False, distance=0.)
+        self.stocks = {
+            'initial': {self.stock},
+            'potential': {self.stock},
+            'standby': {self.stock},
+            'buy': set(),
+            'expiry': StageExpiry(),
+            }
+
+
+    @patch('scan_data.stage_sleep')
+    @patch('scan_data.market_open', side_effect=[True, False])
+    def test_tactical_demotes_lost_signal(self, mock_market_open, mock_stage_sleep):
+
+        self.stock.potential = 0
+
+        scan_data.tactical_scan(self.stocks, Lock())
+
+        self.assertEqual(self.stocks['standby'], set())
+        self.assertEqual(self.stocks['potential'], {self.stock})
+        self.assertEqual(metrics.get('demoted.standby.signal'), 1)
+
+
+    @patch('scan_data.stage_sleep')
+    @patch('scan_data.market_open', side_effect=[True, False])
+    def test_standby_moves_to_buy(self, mock_market_open, mock_stage_sleep):
+
+        self.stock.potential = 2
+
+        scan_data.standby_scan(self.stocks, Lock())
+
+        self.assertEqual(self.stocks['standby'], set())
+        self.assertEqual(self.stocks['buy'], {self.stock})
+        self.assertEqual(metrics.get('demoted.standby.promoted'), 1)
+
+
+    @patch('scan_data.stage_sleep')
+    @patch('scan_data.market_open', side_effect=[True, True, False])
+    def test_trend_drops_settled_verdicts(self, mock_market_open, mock_stage_sleep):
+
+        self.stocks['potential'] = set()
+        self.stock.potential = 0
+
+        failing = Mock(symbol='BBB', open=False)
+        failing.get_trend_potential.side_effect = requests.Timeout
+        self.stocks['initial'].add(failing)
+
+        scan_data.trend_scan(self.stocks, Lock())
+
+        # Not trending for the day: evaluated once, failures are retried
+        self.assertEqual(self.stock.get_trend_potential.call_count, 1)
+        self.assertEqual(failing.get_trend_potential.call_count, 2)
+        self.assertEqual(self.stocks['initial'], {failing})
+        self.assertEqual(metrics.get('dropped.initial.trend'), 1)
+
+
+    def test_expired_potential_leaves_initial(self):
+
+        self.stocks['expiry'] = StageExpiry({'potential': StagePolicy(ttl=-1)})
+
+        scan_data.expire(self.stocks, 'potential')
+
+        self.assertEqual(self.stocks['potential'], set())
+        self.assertEqual(self.stocks['initial'], set())
+        self.assertEqual(metrics.get('demoted.potential.ttl'), 1)
+        self.assertEqual(metrics.get('stage.potential.size'), 0)
+
+
+class TestWarmUp(unittest.TestCase):
+
+    def setUp(self):
+
+        self.aaa, self.bbb = Stock('AAA'), Stock('BBB')
+        self.opened = Stock('OPEN', open=True)
+        self.stocks = {
+            'initial': {self.aaa, self.bbb, self.opened},
+            'potential': set(),
+            }
+
+
+    @patch.object(Stock, 'get_trend_potential', autospec=True)
+    @patch.object(Stock, 'get_bulk_data')
+    def test_warm_up(self, mock_get_bulk_data, mock_get_trend_potential):
+
+        mock_get_bulk_data.side_effect = lambda symbols, timeframe, limit: {
+            symbol: timeframe for symbol in symbols}
+
+        def trend_potential(stock):
+            stock.potential = 2 if stock.symbol == 'AAA' else 0
+
+        mock_get_trend_potential.side_effect = trend_potential
+
+        scan_data.warm_up(self.stocks)
+
+        requested = [(tuple(sorted(c[0][0])), c[0][1], c[0][2])
+                     for c in mock_get_bulk_data.call_args_list]
+
+        # Tactical history only for the potential set
+        self.assertEqual(requested, [(('AAA', 'BBB'), 'day', 200),
+                                     (('AAA',), '15Min', 0)])
+        self.assertEqual(self.stocks['potential'], {self.aaa})
+        self.assertEqual(list(self.aaa.prefetched), [('15Min', 0)])
+
+        # Unused trend bars are dropped
+        self.assertEqual(self.bbb.prefetched, {})
+        self.assertEqual(self.opened.prefetched, {})
+
+
+    @patch.object(Stock, 'get_trend_potential', autospec=True)
+    @patch.object(Stock, 'get_bulk_data')
+    def test_warm_up_prefetch_failure(self, mock_get_bulk_data,
+                                      mock_get_trend_potential):
+
+        mock_get_bulk_data.side_effect = requests.Timeout
+
+        def trend_potential(stock):
+            stock.potential = 2
+
+        mock_get_trend_potential.side_effect = trend_potential
+
+        scan_data.warm_up(self.stocks)
+
+        self.assertEqual(self.stocks['potential'], {self.aaa, self.bbb})
+        self.assertEqual(mock_get_bulk_data.call_count, 2)
+
+
+class TestEvaluate(unittest.TestCase):
+
+    def test_api_errors_logged(self):
+
+        stock = Mock(symbol='AAA')
+        stock.get_trend_potential.side_effect = DataError
+
+        self.assertEqual(scan_data.evaluate(stock, 'get_trend_potential'), False)
+
+
+    def test_bugs_raised(self):
+
+        stock = Mock(symbol='AAA')
+        stock.get_trend_potential.side_effect = TypeError
+
+        with self.assertRaises(TypeError):
+            scan_data.evaluate(stock, 'get_trend_potential')
+
+
+    @patch('scan_data.market_open', side_effect=[True, False])
+    def test_stage_releases_lock_on_error(self, mock_market_open):
+
+        stock = Mock(symbol='AAA', open=False)
+        stock.get_trend_potential.side_effect = TypeError
+        lock = Lock()
+
+        with self.assertRaises(TypeError):
+            scan_data.trend_scan({'initial': {stock}, 'potential': set()}, lock)
+
+        self.assertEqual(lock.locked(), False)
+
+
+class TestExecuteOrders(unittest.TestCase):
+
+    def setUp(self):
+
+        self.stock = Mock(symbol='AAA', open=False, potential=2, distance=1.)
+        self.stocks = {'buy': {self.stock}, 'bought': set()}
+        self.lock = Lock()
+
+        self.alpaca = Mock(spec=Alpaca)
+        self.alpaca.is_tradable.return_value = True
+        self.alpaca.take_and_stop.return_value = ({}, {})
+
+
+    @patch('scan_data.stage_sleep')
+    @patch('scan_data.market_open', side_effect=[True, False])
+    def test_order_placed_in_background(self, mock_market_open, mock_stage_sleep):
+
+        threads = []
+
+        def submit_order(*args):
+            threads.append(threading.current_thread().name)
+            return True
+
+        self.alpaca.submit_order.side_effect = submit_order
+
+        scan_data.execute_scan(self.stocks, self.lock,
+                               orders=OrderQueue(alpaca=self.alpaca))
+
+        self.assertTrue(threads[0].startswith('Orders'))
+        self.stock.open_position.assert_called_once_with()
+        self.assertEqual(self.stocks['bought'], {self.stock})
+        self.assertEqual(self.lock.locked(), False)
+
+
+    @patch('scan_data.stage_sleep')
+    @patch('scan_data.market_open', side_effect=[True, False])
+    def test_failed_order_leaves_stock(self, mock_market_open, mock_stage_sleep):
+
+        self.alpaca.submit_order.return_value = False
+
+        scan_data.execute_scan(self.stocks, self.lock,
+                               orders=OrderQueue(alpaca=self.alpaca))
+
+        self.stock.open_position.assert_not_called()
+        self.assertEqual(self.stocks['bought'], set())
+
+
+    @patch('scan_data.stage_sleep')
+    @patch('scan_data.market_open', side_effect=[True, False])
+    def test_pending_order_not_evaluated(self, mock_market_open, mock_stage_sleep):
+
+        orders = Mock(spec=OrderQueue)
+        orders.pending.return_value = True
+
+        scan_data.execute_scan(self.stocks, self.lock, orders=orders)
+
+        self.stock.get_execution_potential.assert_not_called()
+        orders.submit.assert_not_called()
+
+
+    @patch('scan_data.stage_sleep')
+    @patch('scan_data.market_open', side_effect=[True, False])
+    def test_claimed_symbol_not_ordered(self, mock_market_open, mock_stage_sleep):
+
+        orders = Mock(spec=OrderQueue)
+        orders.pending.return_value = False
+        self.stocks['claims'] = SymbolClaims()
+        self.stocks['claims'].claim('AAA', 'other')
+        self.stocks['strategy'] = 'fast'
+
+        scan_data.execute_scan(self.stocks, self.lock, orders=orders)
+
+        self.stock.get_execution_potential.assert_called_once_with()
+        orders.submit.assert_not_called()
+
+
+class TestSellScan(unittest.TestCase):
+
+    @patch('scan_data.sleep')
+    @patch('scan_data.stage_sleep')
+    @patch('scan_data.update_prices')
+    @patch('scan_data.record.store_new_trades')
+    @patch('scan_data.Alpaca')
+    @patch('scan_data.market_open', side_effect=[True, False])
+    def test_trade_stored_when_sold(self, mock_market_open, mock_alpaca,
+                                    mock_store_new_trades, *mocks):
+
+        stock = Mock(symbol='AAA', sell=True, position_record={'AAA': {}})
+        stocks = {'bought': {stock}, 'trades': []}
+
+        def close_position():
+            stock.position_record['sold on'] = '2021-01-04'
+
+        stock.close_position.side_effect = close_position
+
+        scan_data.sell_scan(stocks, Lock())
+
+        mock_alpaca.return_value.close_position.assert_called_once_with('AAA')
+        mock_store_new_trades.assert_called_once_with(
+            [{'AAA': {}, 'sold on': '2021-01-04'}])
+        self.assertEqual(stocks['bought'], set())
+
+
+class TestUpdatePrices(unittest.TestCase):
+
+    @patch.object(Stock, 'get_bulk_columns')
+    def test_update_prices(self, mock_get_bulk_columns):
+
+        stocks = {Stock('AAA'), Stock('BBB')}
+        mock_get_bulk_columns.return_value = {
+            'AAA': {'time': np.array([60]), 'close': np.array([10.5])}}
+
+        scan_data.update_prices(stocks)
+
+        prices = {stock.symbol: stock.last_price for stock in stocks}
+
+        self.assertEqual(prices, {'AAA': (10.5, 60.), 'BBB': None})
+        self.assertEqual(mock_get_bulk_columns.call_count, 1)
+
+
+    @patch.object(Stock, 'get_bulk_columns', side_effect=requests.Timeout)
+    def test_update_prices_failure(self, mock_get_bulk_columns):
+
+        stock = Stock('AAA')
+
+        scan_data.update_prices({stock})
+
+        self.assertIsNone(stock.last_price)
+
+
+class TestStagePool(unittest.TestCase):
+
+    def setUp(self):
+
+        self.stocks = [Mock(symbol=symbol, open=False) for symbol in 'ABCD']
+
+
+    def test_stage_pool(self):
+
+        self.assertIsNone(scan_data.stage_pool(1))
+
+        pool = scan_data.stage_pool(3)
+        self.assertEqual(pool._max_workers, 3)
+        pool.shutdown()
+
+
+    def test_evaluate_all_in_order(self):
+
+        pool = scan_data.stage_pool(4)
+
+        try:
+            actual_result = scan_data.evaluate_all(pool, self.stocks,
+                                                   'get_trend_potential')
+        finally:
+            pool.shutdown()
+
+        self.assertEqual(actual_result, [(stock, True) for stock in self.stocks])
+
+        for stock in self.stocks:
+            self.assertEqual(stock.get_trend_potential.call_count, 1)
+
+
+    def test_evaluate_all_failure(self):
+
+        self.stocks[1].get_tactical_potential.side_effect = requests.Timeout
+
+        actual_result = scan_data.evaluate_all(None, self.stocks,
+                                               'get_tactical_potential')
+
+        self.assertEqual([evaluated for _, evaluated in actual_result],
+                         [True, False, True, True])
+
+
+    def test_evaluate_all_paced(self):
+
+        pacer = Mock()
+
+        scan_data.evaluate_all(None, self.stocks, 'get_trend_potential', pacer)
+
+        self.assertEqual(pacer.wait.call_count, len(self.stocks))
+
+
+    def test_due_candidates(self):
+
+        priority = PriorityScheduler()
+        self.stocks[0].open = True
+
+        actual_result = scan_data.due_candidates(priority, set(self.stocks))
+
+        self.assertEqual(set(actual_result), set(self.stocks[1:]))
+
+        # The open stock stays due on the next pass
+        self.assertEqual(scan_data.due_candidates(priority, set(self.stocks)), [])
+        self.stocks[0].open = False
+        self.assertEqual(scan_data.due_candidates(priority, set(self.stocks)),
+                         [self.stocks[0]])
+
+
 class TestScanData(unittest.TestCase):
     """
     For all of the scan methods:
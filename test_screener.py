@@ -0,0 +1,84 @@
+import unittest
+from unittest.mock import patch
+
+import logging
+
+import pandas as pd
+
+import screener
+
+logging.disable(logging.CRITICAL)
+
+class TestScreener(unittest.TestCase):
+
+    def setUp(self):
+
+        self.bulk_data = {
+            'GOOD': pd.DataFrame({'close': [100., 101.]}),
+            'CHEAP': pd.DataFrame({'close': [10., 11.]}),
+            'PRICY': pd.DataFrame({'close': [900., 910.]}),
+            'FLAT': pd.DataFrame({'close': [50., 50.2]}),
+            'DOWN': pd.DataFrame({'close': [50., 48.]}),
+            'BTC-USD': pd.DataFrame({'close': [100., 110.]}),
+            'NEW': pd.DataFrame({'close': [100.]}),
+            'EMPTY': pd.DataFrame(),
+            }
+
+    ### ------------------- FILTER TESTS ------------------- ###
+
+    def test_screen(self):
+
+        actual_result = screener.screen(['GOOD', 'CHEAP', 'PRICY', 'FLAT'],
+                                        [101., 11., 910., 50.2],
+                                        [100., 10., 900., 50.])
+
+        self.assertEqual(actual_result, {'GOOD'})
+
+
+    def test_screen_custom_rules(self):
+
+        actual_result = screener.screen(['CHEAP', 'FLAT'], [11., 50.2],
+                                        [10., 50.], min_price=5,
+                                        min_change=0.1)
+
+        self.assertEqual(actual_result, {'CHEAP', 'FLAT'})
+
+
+    def test_last_closes(self):
+
+        actual_result = screener.last_closes(self.bulk_data)
+
+        self.assertEqual(actual_result[0], ['BTC-USD', 'CHEAP', 'DOWN',
+                                            'FLAT', 'GOOD', 'PRICY'])
+        self.assertEqual(actual_result[1][4], 101.)
+        self.assertEqual(actual_result[2][4], 100.)
+
+    ### ------------------- WATCHLIST TESTS ------------------- ###
+
+    @patch('screener.Stock.get_bulk_data')
+    def test_screened_watchlist(self, mock_get_bulk_data):
+
+        mock_get_bulk_data.return_value = self.bulk_data
+
+        actual_result = screener.screened_watchlist(set(self.bulk_data))
+
+        mock_get_bulk_data.assert_called_once_with(set(self.bulk_data),
+                                                   'day', limit=2)
+        self.assertEqual(actual_result, {'GOOD'})
+
+
+    @patch('screener.Alpaca.get_tradable_symbols')
+    @patch('screener.Stock.get_bulk_data')
+    def test_screened_watchlist_all_tradable(self, mock_get_bulk_data,
+                                             mock_get_tradable_symbols):
+
+        mock_get_tradable_symbols.return_value = {'GOOD', 'DOWN'}
+        mock_get_bulk_data.return_value = self.bulk_data
+
+        screener.screened_watchlist()
+
+        self.assertEqual(mock_get_bulk_data.call_args[0][0], {'GOOD', 'DOWN'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import Mock, patch
+import os
+import tempfile
+from datetime import datetime
+from time import sleep
+
+import logging
+
+from market_calendar import eastern
+from signal_sink import SignalSink, day_path, load
+from stock_data import Stock
+
+logging.disable(logging.CRITICAL)
+
+class TestSignalSink(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.sink = SignalSink(self.tmp_dir.name, flush_every=3,
+                               flush_interval=60)
+
+
+    def tearDown(self):
+
+        self.sink.close()
+        self.tmp_dir.cleanup()
+
+
+    def timestamp(self, *args):
+
+        return eastern.localize(datetime(*args)).timestamp()
+
+
+    def test_batches_partitioned_by_day(self):
+
+        times = [self.timestamp(2021, 3, 1, 23, 59),
+                 self.timestamp(2021, 3, 2, 0, 1),
+                 self.timestamp(2021, 3, 2, 9, 30)]
+
+        with patch('signal_sink.time', side_effect=times):
+
+            self.sink.emit('tactical', 'AAA', last_k=50., potential=2)
+            self.sink.emit('tactical', 'BBB', last_k=20., potential=0)
+
+            # Not flushed before the batch is full
+            self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+            self.sink.emit('execution', 'AAA', last_highs=[1., 2., 3.])
+
+        first_day = load('2021-03-01', self.tmp_dir.name)
+        second_day = load('2021-03-02', self.tmp_dir.name)
+
+        self.assertEqual(list(first_day['symbol']), ['AAA'])
+        self.assertEqual(list(second_day['event']), ['tactical', 'execution'])
+        self.assertEqual(second_day['last_highs'].iloc[1], [1., 2., 3.])
+
+
+    def test_timer_flushes_tail(self):
+
+        self.sink.flush_interval = 0.05
+        self.sink.emit('trend', 'AAA', potential=2)
+
+        sleep(0.3)
+
+        self.assertEqual(len(os.listdir(self.tmp_dir.name)), 1)
+
+
+    def test_load_event_and_partial_line(self):
+
+        with patch('signal_sink.time', return_value=self.timestamp(2021, 3, 1, 10)):
+
+            self.sink.emit('tactical', 'AAA', potential=2)
+            self.sink.emit('sell', 'AAA', sell=False)
+            self.sink.flush()
+
+        with open(day_path(self.tmp_dir.name, '2021-03-01'), 'a') as f:
+            f.write('{"time":1614610800,"event":"tact')
+
+        actual_result = load('2021-03-01', self.tmp_dir.name, event='tactical')
+
+        self.assertEqual(list(actual_result['potential']), [2])
+        self.assertEqual(len(load('2021-03-01', self.tmp_dir.name)), 2)
+
+
+class TestStockSignals(unittest.TestCase):
+
+    @patch.object(Stock, 'get_open_position')
+    def test_sell_signal_emitted(self, mock_get_open_position):
+
+        stock = Stock('AAA')
+        stock.open_position()
+        mock_get_open_position.return_value = {'cost_basis': 100.,
+                                               'unrealized_plpc': 0.01}
+
+        with patch.object(Stock, 'signal_sink', Mock()) as mock_sink:
+            stock.get_sell_signal()
+
+        mock_sink.emit.assert_called_once_with('sell', 'AAA', unrealized_plpc=0.01,
+                                               max_unrealized_plpc=0.01,
+                                               scans_left=5, reconciled=True,
+                                               sell=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+
+import logging
+
+import numpy as np
+
+import signals
+from stock_data import Stock
+
+logging.disable(logging.CRITICAL)
+
+class TestSignals(unittest.TestCase):
+
+    def setUp(self):
+
+        self.arrays = [
+            [1, 2, 3, 4, 5, 6, 7, 6, 9, 10],
+            [1, 2, 3, 8, 5, 6, 7, 8, 9, 10],
+            [10, 9, 8, 7, 6, 5, 4, 3, 2, 1],
+            [1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
+            [3, 1, 2, 4, 5, 6, 7, 8, 9, 10],
+            ]
+
+    ### ------------------- BATCHED RULES TESTS ------------------- ###
+
+    def test_is_in_range_matches_scalar(self):
+
+        x = [95, 89, 111, 100, -5, 0]
+        y = [105, 111, 100, 100, -5.4, 0]
+
+        for range_percent in (10, 20):
+
+            expected_result = [Stock.is_in_range(a, b, range_percent)
+                               for a, b in zip(x, y)]
+
+            actual_result = signals.is_in_range(x, y, range_percent)
+
+            self.assertEqual(list(actual_result), expected_result)
+
+
+    def test_is_trending_up_matches_scalar(self):
+
+        for step in (1, 2, 3, 10):
+
+            expected_result = [Stock.is_trending_up(array, step)
+                               for array in self.arrays]
+
+            actual_result = signals.is_trending_up(self.arrays, step)
+
+            self.assertEqual(list(actual_result), expected_result)
+
+
+    def test_is_trending_up_too_short(self):
+
+        actual_result = signals.is_trending_up([[1], [2]])
+
+        self.assertEqual(list(actual_result), [False, False])
+
+    ### ------------------- STAGE DECISIONS TESTS ------------------- ###
+
+    def test_trend_potentials(self):
+
+        closes = np.arange(100., 160.)
+        smas = closes - 5
+        lows = np.concatenate([closes[:-6], [157., 156., 155., 154., 153., 152.]])
+
+        actual_result = signals.trend_potentials([closes, closes],
+                                                 [smas, smas + 10],
+                                                 [lows, lows])
+
+        self.assertEqual(list(actual_result), [2, 0])
+
+
+    def test_tactical_potentials(self):
+
+        actual_result = signals.tactical_potentials([50, 47, 20],
+                                                    [48, 50, 50])
+
+        self.assertEqual(list(actual_result), [2, 1, 0])
+
+
+    def test_execution_potentials(self):
+
+        highs = [[1, 2, 3, 4], [1, 4, 3, 5]]
+
+        actual_result = signals.execution_potentials(highs)
+
+        self.assertEqual(list(actual_result), [2, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
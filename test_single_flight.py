@@ -0,0 +1,105 @@
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+import logging
+
+from single_flight import SingleFlight, bar_period, timeframe_seconds
+
+logging.disable(logging.CRITICAL)
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_calls_share_one_call(self):
+
+        flight = SingleFlight()
+        release = threading.Event()
+        function = Mock(side_effect=lambda: release.wait() and 'bars')
+        results = []
+
+        def call():
+            results.append(flight.do('key', function))
+
+        threads = [threading.Thread(target=call) for _ in range(5)]
+
+        for thread in threads:
+            thread.start()
+
+        while flight.shared < 4:
+            threading.Event().wait(0.001)
+
+        release.set()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(function.call_count, 1)
+        self.assertEqual(results, ['bars'] * 5)
+
+
+    def test_finished_result_shared_within_max_age(self):
+
+        flight = SingleFlight(max_age=60)
+        function = Mock(return_value='bars')
+
+        flight.do('key', function)
+        actual_result = flight.do('key', function)
+
+        self.assertEqual(actual_result, 'bars')
+        self.assertEqual(function.call_count, 1)
+
+
+    def test_finished_result_not_shared_without_max_age(self):
+
+        flight = SingleFlight()
+        function = Mock(return_value='bars')
+
+        flight.do('key', function)
+        flight.do('key', function)
+
+        self.assertEqual(function.call_count, 2)
+
+
+    def test_different_keys_not_shared(self):
+
+        flight = SingleFlight(max_age=60)
+        function = Mock(return_value='bars')
+
+        flight.do(('FAKE', '1Min'), function)
+        flight.do(('FAKE', '15Min'), function)
+
+        self.assertEqual(function.call_count, 2)
+
+
+    def test_errors_not_reused(self):
+
+        flight = SingleFlight(max_age=60)
+        function = Mock(side_effect=[ValueError, 'bars'])
+
+        with self.assertRaises(ValueError):
+            flight.do('key', function)
+
+        actual_result = flight.do('key', function)
+
+        self.assertEqual(actual_result, 'bars')
+
+    ### ------------------- BAR PERIOD TESTS ------------------- ###
+
+    def test_timeframe_seconds(self):
+
+        self.assertEqual(timeframe_seconds('1Min'), 60)
+        self.assertEqual(timeframe_seconds('15Min'), 900)
+        self.assertEqual(timeframe_seconds('day'), 86400)
+
+        with self.assertRaises(ValueError):
+            timeframe_seconds('week')
+
+
+    def test_bar_period(self):
+
+        self.assertEqual(bar_period('15Min', 899), bar_period('15Min', 0))
+        self.assertNotEqual(bar_period('15Min', 900), bar_period('15Min', 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from unittest.mock import Mock
+
+from stage_expiry import StageExpiry, StagePolicy
+
+
+class TestStageExpiry(unittest.TestCase):
+
+    def setUp(self):
+
+        self.now = 0.
+        self.expiry = StageExpiry({'buy': StagePolicy(ttl=60, max_size=2)},
+                                  clock=lambda: self.now)
+
+        self.stocks = [Mock(symbol=symbol, open=False, distance=distance)
+                       for symbol, distance in (('A', 0.3), ('B', None),
+                                                ('C', 0.1), ('D', 0.2))]
+
+
+    def test_ttl(self):
+
+        a, b = self.stocks[:2]
+
+        self.expiry.confirm('buy', a)
+        self.expiry.confirm('buy', b)
+
+        self.now = 50.
+        self.expiry.confirm('buy', b)
+
+        self.now = 61.
+        actual_result = self.expiry.expired('buy', {a, b})
+
+        self.assertEqual(actual_result, [(a, 'ttl')])
+
+
+    def test_first_seen_starts_ttl(self):
+
+        a = self.stocks[0]
+        self.now = 1000.
+
+        self.assertEqual(self.expiry.expired('buy', {a}), [])
+
+        self.now = 1061.
+        self.assertEqual(self.expiry.expired('buy', {a}), [(a, 'ttl')])
+
+
+    def test_ranked_eviction(self):
+
+        a, b, c, d = self.stocks
+
+        actual_result = self.expiry.expired('buy', self.stocks)
+
+        # Unknown distance ranks first, then the closest ones are kept
+        self.assertEqual(sorted(stock.symbol for stock, _ in actual_result),
+                         ['A', 'D'])
+        self.assertEqual({reason for _, reason in actual_result}, {'evicted'})
+
+
+    def test_open_positions_kept(self):
+
+        for stock in self.stocks:
+            stock.open = True
+
+        self.now = 1000.
+
+        self.assertEqual(self.expiry.expired('buy', self.stocks), [])
+
+
+    def test_stage_without_policy(self):
+
+        self.assertEqual(self.expiry.expired('standby', self.stocks), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import Mock, patch
+import os
+import tempfile
+
+import logging
+
+import scan_data
+import stage_profiler
+from rate_limiter import RateLimiter
+
+logging.disable(logging.CRITICAL)
+
+class TestStageProfiler(unittest.TestCase):
+
+    def setUp(self):
+
+        self.stock = Mock(symbol='AAA', open=False, potential=0, distance=0.,
+                          sell=False, volatility=None)
+        self.stocks = {
+            'initial': {self.stock},
+            'potential': set(),
+            'standby': set(),
+            'buy': set(),
+            'bought': set(),
+            'trades': [],
+            }
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+
+        self.tmp_dir.cleanup()
+
+
+    @patch('scan_data.RateLimiter', return_value=Mock(spec=RateLimiter))
+    def test_profile_stages(self, mock_rate_limiter):
+
+        calendar, alpaca, cwd = scan_data.calendar, scan_data.Alpaca, os.getcwd()
+
+        profiles = stage_profiler.profile_stages(self.stocks, fill=True)
+
+        self.assertEqual([profile.stage for profile in profiles],
+                         ['Trend', 'Tactical', 'Standby', 'Execute', 'Sell'])
+
+        # One pass of each stage, every set filled with the stock
+        self.stock.get_trend_potential.assert_called_once_with()
+        self.assertEqual(self.stock.get_tactical_potential.call_count, 2)
+        self.stock.get_execution_potential.assert_called_once_with()
+
+        self.assertIs(scan_data.calendar, calendar)
+        self.assertIs(scan_data.Alpaca, alpaca)
+        self.assertEqual(os.getcwd(), cwd)
+
+        path = stage_profiler.write_report(profiles, self.tmp_dir.name)
+
+        with open(path) as f:
+            report = f.read()
+
+        self.assertIn('Trend stage: one cycle', report)
+        self.assertIn('Top allocation sites', report)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir.name, 'sell.prof')))
+
+
+    def test_dry_run_does_not_trade(self):
+
+        alpaca = stage_profiler.DryRunAlpaca()
+
+        with patch('alpaca.client') as mock_client:
+
+            self.assertEqual(alpaca.submit_order('AAA', 'buy', 10, {}, {}), False)
+            alpaca.close_position('AAA')
+
+        mock_client.post.assert_not_called()
+        mock_client.delete.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
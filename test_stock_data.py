@@ -1,4 +1,5 @@
 import os
+import time
 import unittest
 import datetime as dt
 import requests_mock
@@ -13,6 +14,8 @@ import requests
 import scan_data as scan_data
 from alpaca import Alpaca
 from stock_data import Stock
+from market_calendar import eastern
+from metrics import metrics
 
 logging.disable(logging.CRITICAL)
 
@@ -93,6 +96,107 @@ class TestStockData(unittest.TestCase):
 
         self.assertIsInstance(actual_result, pd.DataFrame)
         
+    @patch.object(Stock, 'fetch_data')
+    def test_get_data_shares_fetch_and_copies(self, mock_fetch_data):
+
+        Stock.bars_flight.calls.clear()
+        mock_fetch_data.return_value = self.mock_dataframe
+
+        first = Stock('FAKE').get_data('15Min', limit=0)
+        second = Stock('FAKE').get_data('15Min', limit=0)
+        first['k'] = 1
+
+        self.assertEqual(mock_fetch_data.call_count, 1)
+        self.assertNotIn('k', second.columns)
+
+        
+    @patch.object(Stock, 'get_data')
+    def test_base_timeframe_single_fetch(self, mock_get_data):
+
+        start = int(dt.datetime(2021, 3, 1, 9, 30).timestamp())
+        bars_15min = pd.DataFrame({
+            'time': [start + i * 900 for i in range(40)],
+            'open': 100., 'high': 101., 'low': 99., 'close': 100., 'volume': 10,
+            })
+        bars_1min = pd.DataFrame({
+            'time': [start + 40 * 900 + i * 60 for i in range(61)],
+            'open': 100., 'high': 102., 'low': 98., 'close': 101., 'volume': 1,
+            })
+        mock_get_data.side_effect = lambda timeframe, limit: (
+            bars_15min.copy() if timeframe == '15Min' else bars_1min.copy())
+
+        stock = Stock('FAKE', base_timeframe='1Min')
+
+        stock.get_tactical_data()
+        actual_result = stock.get_tactical_data()
+        stock.get_execution_data()
+
+        timeframes = [c[0][0] for c in mock_get_data.call_args_list]
+        self.assertEqual(timeframes.count('15Min'), 1)
+        self.assertEqual(set(timeframes), {'15Min', '1Min'})
+        self.assertEqual(actual_result['close'].iloc[-1], 101.)
+        self.assertEqual(actual_result.index[-1],
+                         dt.datetime.fromtimestamp(start + 40 * 900))
+
+        
+    @patch.object(Stock, 'fetch_data')
+    def test_get_data_uses_prefetched_once(self, mock_fetch_data):
+
+        Stock.bars_flight.calls.clear()
+        mock_fetch_data.return_value = self.mock_dataframe
+        self.mock_stock.prefetch('day', 200, self.mock_dataframe.iloc[:1])
+
+        first = self.mock_stock.get_data('day', limit=200)
+        second = self.mock_stock.get_data('day', limit=200)
+
+        self.assertEqual(len(first), 1)
+        self.assertEqual(len(second), 2)
+        self.assertEqual(mock_fetch_data.call_count, 1)
+
+
+    @patch.object(Stock, 'fetch_data')
+    def test_get_data_ignores_stale_prefetched(self, mock_fetch_data):
+
+        Stock.bars_flight.calls.clear()
+        mock_fetch_data.return_value = self.mock_dataframe
+        self.mock_stock.prefetched[('day', 200)] = (
+            self.mock_dataframe.iloc[:1], time.time() - Stock.prefetch_max_age - 1)
+
+        actual_result = self.mock_stock.get_data('day', limit=200)
+
+        self.assertEqual(len(actual_result), 2)
+        self.assertEqual(self.mock_stock.prefetched, {})
+
+
+    @requests_mock.Mocker()
+    def test_get_bulk_data(self, mock_request):
+
+        url = 'https://data.alpaca.markets/v1/bars/day'
+        mock_request.get(url, [
+            {'json': {'AAA': [{'t': 1, 'o': 1, 'h': 1, 'l': 1, 'c': 1, 'v': 1}],
+                      'BBB': []}},
+            {'json': {'CCC': [{'t': 1, 'o': 2, 'h': 2, 'l': 2, 'c': 2, 'v': 2}]}},
+            ])
+
+        actual_result = Stock.get_bulk_data({'AAA', 'BBB', 'CCC'}, 'day',
+                                            limit=200, chunk_size=2)
+
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(mock_request.request_history[0].qs['symbols'],
+                         ['aaa,bbb'])
+        self.assertEqual(sorted(actual_result), ['AAA', 'BBB', 'CCC'])
+        self.assertEqual(actual_result['CCC']['close'][0], 2)
+
+
+    @requests_mock.Mocker()
+    def test_get_open_position_closed(self, mock_request):
+
+        mock_request.get(Stock.trading_url + '/positions/FAKE', status_code=404,
+                         json={'message': 'position does not exist'})
+
+        self.assertIsNone(self.mock_stock.get_open_position())
+
+        
     ### ------------------- POTENTIAL GETTERS TESTS ------------------- ###
     
     def test_get_trend_potential(self):
@@ -109,8 +213,242 @@ class TestStockData(unittest.TestCase):
 
         pass
 
+
+    @patch.object(Stock, 'get_open_position')
+    def test_get_sell_signal(self, mock_get_open_position):
+
+        self.mock_stock.open_position()
+        record = self.mock_stock.position_record['FAKE']
+        record['scans_left'] = 1
+        mock_get_open_position.return_value = {'cost_basis': 100.,
+                                               'unrealized_plpc': -0.01}
+
+        self.mock_stock.get_sell_signal()
+
+        self.assertEqual(record['cost_basis'], 100.)
+        self.assertEqual(record['scans_left'], 0)
+        self.assertEqual(self.mock_stock.sell, True)
+
+    @patch.object(Stock, 'get_open_position')
+    def test_get_sell_signal_local(self, mock_get_open_position):
+
+        self.mock_stock.open_position()
+        record = self.mock_stock.position_record['FAKE']
+        mock_get_open_position.return_value = {'cost_basis': 1000.,
+                                               'avg_entry_price': 100.,
+                                               'unrealized_plpc': 0.01}
+
+        # Entry price unknown: read from the broker
+        self.mock_stock.set_price(101.)
+        self.mock_stock.get_sell_signal()
+
+        self.mock_stock.set_price(103.)
+        self.mock_stock.get_sell_signal()
+
+        self.assertEqual(mock_get_open_position.call_count, 1)
+        self.assertAlmostEqual(record['unrealized_plpc'], 0.03)
+        self.assertAlmostEqual(record['max_unrealized_plpc'], 0.03)
+
+        self.mock_stock.set_price(102.)
+        self.mock_stock.get_sell_signal()
+
+        self.assertEqual(record['scans_left'], 4)
+
+
+    @patch.object(Stock, 'get_open_position')
+    def test_get_sell_signal_reconciles(self, mock_get_open_position):
+
+        self.mock_stock.open_position()
+        self.mock_stock.position_record['FAKE']['avg_entry_price'] = 100.
+        mock_get_open_position.return_value = {'cost_basis': 1000.,
+                                               'unrealized_plpc': 0.01}
+
+        # Stale price
+        self.mock_stock.set_price(101., time.time() - Stock.price_max_age - 1)
+        self.mock_stock.get_sell_signal()
+        self.assertEqual(mock_get_open_position.call_count, 1)
+
+        self.mock_stock.set_price(101.)
+
+        for _ in range(Stock.reconcile_every + 1):
+            self.mock_stock.get_sell_signal()
+
+        self.assertEqual(mock_get_open_position.call_count, 2)
+
+
+    @patch.object(Stock, 'get_open_position', return_value=None)
+    def test_get_sell_signal_closed_by_broker(self, mock_get_open_position):
+
+        self.mock_stock.open_position()
+
+        self.mock_stock.get_sell_signal()
+
+        self.assertEqual(self.mock_stock.sell, True)
+        self.assertEqual(self.mock_stock.position_record['FAKE']['scans_left'], 5)
+
+
+    def test_close_position(self):
+
+        self.mock_stock.open_position()
+        self.mock_stock.close_position()
+
+        self.assertIsNotNone(self.mock_stock.position_record['FAKE']['sold on'])
+        self.assertEqual(list(self.mock_stock.position_record), ['FAKE'])
+        self.assertEqual(self.mock_stock.open, False)
+
+    ### ------------------- NEW BAR SKIP TESTS ------------------- ###
+
+    def execution_data(self, last_time, highs=(1., 2., 3.)):
+
+        return pd.DataFrame({'time': [last_time - 120, last_time - 60, last_time],
+                             'high': highs, 'close': [1., 2., 3.]})
+
+
+    @patch.object(Stock, 'get_execution_data')
+    def test_execution_skipped_until_new_bar(self, mock_get_execution_data):
+
+        metrics.reset()
+        now = time.time() // 60 * 60
+        mock_get_execution_data.return_value = self.execution_data(now)
+
+        self.mock_stock.get_execution_potential()
+        self.mock_stock.potential = 0
+        self.mock_stock.get_execution_potential()
+
+        # The bar period is not over: nothing fetched
+        self.assertEqual(mock_get_execution_data.call_count, 1)
+        self.assertEqual(self.mock_stock.potential, 2)
+        self.assertEqual(metrics.get('skipped.execution.period'), 1)
+
+        # Period over, same newest bar
+        mock_get_execution_data.return_value = self.execution_data(now - 60)
+        self.mock_stock.evaluated[('execution', '1Min')] = (now - 60, 2, 0., 0.1)
+        self.mock_stock.get_execution_potential()
+
+        self.assertEqual(mock_get_execution_data.call_count, 2)
+        self.assertEqual(self.mock_stock.volatility, 0.1)
+        self.assertEqual(metrics.get('skipped.execution.bar'), 1)
+
+        # New bar
+        mock_get_execution_data.return_value = self.execution_data(now, (3., 2., 1.))
+        self.mock_stock.get_execution_potential()
+
+        self.assertEqual(self.mock_stock.potential, 0)
+        self.assertEqual(self.mock_stock.evaluated[('execution', '1Min')][:2],
+                         (now, 0))
+
+
+    def test_last_bar_time(self):
+
+        moment = dt.datetime(2021, 3, 1, 10, 30)
+        data = pd.DataFrame({'close': [1.]}, index=pd.Index([moment], name='time'))
+
+        self.assertEqual(Stock.last_bar_time(data), moment.timestamp())
+        self.assertEqual(Stock.last_bar_time(self.execution_data(120)), 120.)
+
+    ### ------------------- TREND MEMO TESTS ------------------- ###
+
+    def trending_trend_data(self):
+
+        closes = [float(i) for i in range(100, 160)]
+        lows = closes[:-6] + [157., 156., 155., 154., 153., 152.]
+
+        trend_data = pd.DataFrame({'close': closes, 'low': lows})
+        trend_data['sma50'] = [c - 5 for c in closes]
+
+        return trend_data
+
+
+    @patch.object(Stock, 'get_trend_data')
+    def test_get_trend_potential_memoized_per_day(self, mock_get_trend_data):
+
+        Stock.trend_memo.clear()
+        mock_get_trend_data.return_value = self.trending_trend_data()
+
+        self.mock_stock.get_trend_potential()
+        self.mock_stock.potential = 0
+        self.mock_stock.get_trend_potential()
+
+        self.assertEqual(mock_get_trend_data.call_count, 1)
+        self.assertEqual(self.mock_stock.potential, 2)
+
+
+    @patch.object(Stock, 'get_trend_data')
+    def test_get_trend_potential_memo_keyed_by_partial_bar_rule(self,
+                                                    mock_get_trend_data):
+
+        Stock.trend_memo.clear()
+        mock_get_trend_data.return_value = self.trending_trend_data()
+
+        Stock('FAKE').get_trend_potential()
+        Stock('FAKE', include_partial_bar=False).get_trend_potential()
+
+        self.assertEqual(mock_get_trend_data.call_count, 2)
+
+
+    def test_get_trend_memo_discards_previous_days(self):
+
+        Stock.trend_memo.clear()
+        Stock.trend_memo['2000-01-01'] = {('FAKE',): True}
+
+        actual_result = Stock.get_trend_memo()
+
+        self.assertEqual(actual_result, {})
+        self.assertEqual(len(Stock.trend_memo), 1)
+
+
+    def test_drop_partial_bar(self):
+
+        today = dt.datetime.now().timestamp()
+        yesterday = today - 86400
+        data = pd.DataFrame({'time': [yesterday, today], 'close': [1., 2.]})
+
+        actual_result = Stock.drop_partial_bar(data)
+
+        self.assertEqual(list(actual_result['close']), [1.])
+
+
+    def test_drop_partial_bar_west_of_new_york(self):
+
+        # Today's daily bar is stamped at 00:00 New York time, which is
+        # still yesterday in Los Angeles
+        midnight = eastern.localize(dt.datetime.combine(
+                        dt.datetime.now(eastern).date(), dt.time()))
+        data = pd.DataFrame({'time': [midnight.timestamp() - 86400,
+                                      midnight.timestamp()],
+                             'close': [1., 2.]})
+
+        tz = os.environ.get('TZ')
+        os.environ['TZ'] = 'America/Los_Angeles'
+        time.tzset()
+
+        try:
+            actual_result = Stock.drop_partial_bar(data)
+        finally:
+            if tz is None:
+                del os.environ['TZ']
+            else:
+                os.environ['TZ'] = tz
+            time.tzset()
+
+        self.assertEqual(list(actual_result['close']), [1.])
+
     ### ------------------- STATIC METHODS TESTS ------------------- ###
 
+    def test_get_tactical_distance(self):
+
+        self.assertAlmostEqual(Stock.get_tactical_distance(45., 50.), 0.1)
+        self.assertEqual(Stock.get_tactical_distance(55., 50.), 0.)
+        self.assertEqual(Stock.get_tactical_distance(float('nan'), 50.), None)
+
+
+    def test_get_execution_distance(self):
+
+        self.assertAlmostEqual(Stock.get_execution_distance([10., 9., 9.9]), 0.1)
+        self.assertEqual(Stock.get_execution_distance([1., 2., 3.]), 0.)
+        self.assertEqual(Stock.get_execution_distance([1.]), None)
+
+ 
     def test_is_in_range_true_default_range(self):
 
         x = 95
@@ -0,0 +1,75 @@
+import unittest
+
+import logging
+
+import record_handler as record
+from stock_data import Stock
+from stock_registry import StockRegistry
+
+logging.disable(logging.CRITICAL)
+
+class TestStockRegistry(unittest.TestCase):
+
+    def setUp(self):
+
+        self.registry = StockRegistry(tactical_timeframe='15Min')
+
+
+    def test_one_stock_per_symbol(self):
+
+        stock = self.registry.get('AAA')
+
+        self.assertIs(self.registry.get('AAA'), stock)
+        self.assertIs(self.registry.find('AAA'), stock)
+        self.assertIsNone(self.registry.find('BBB'))
+        self.assertEqual(len(self.registry), 1)
+        self.assertIn('AAA', self.registry)
+
+
+    def test_stock_settings(self):
+
+        self.assertEqual(self.registry.get('AAA').tactical_timeframe, '15Min')
+        self.assertEqual(self.registry.get('BBB', open=True).open, True)
+
+
+    def test_get_many(self):
+
+        actual_result = self.registry.get_many(['AAA', 'BBB', 'AAA'])
+
+        self.assertEqual(len(actual_result), 2)
+        self.assertEqual(set(self.registry), actual_result)
+
+
+    def test_positions_share_watchlist_stocks(self):
+
+        initial = self.registry.get_many(['AAA', 'BBB'])
+        positions = [{'AAA': {'scans_left': 3}, 'sold on': None}]
+
+        bought = record.stocks_from_positions_list(positions, self.registry)
+
+        stock, = bought
+        self.assertIs(stock, self.registry.get('AAA'))
+        self.assertEqual(stock.open, True)
+        self.assertEqual(stock.position_record, {'AAA': {'scans_left': 3}})
+        self.assertEqual(len(initial | bought), 2)
+
+
+class TestStockIdentity(unittest.TestCase):
+
+    def test_equal_by_symbol(self):
+
+        self.assertEqual(Stock('AAA'), Stock('AAA'))
+        self.assertNotEqual(Stock('AAA'), Stock('BBB'))
+        self.assertNotEqual(Stock('AAA'), 'AAA')
+
+
+    def test_set_membership_by_symbol(self):
+
+        stocks = {Stock('AAA'), Stock('AAA'), Stock('BBB')}
+
+        self.assertEqual(len(stocks), 2)
+        self.assertIn(Stock('AAA'), stocks)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+from unittest.mock import Mock, patch
+import os
+import json
+import tempfile
+
+import logging
+
+import scan_data
+from stock_data import Stock
+from strategy_host import (DataPlane, Strategy, StrategyHost, SymbolClaims,
+                           load_strategies)
+
+logging.disable(logging.CRITICAL)
+
+class TestSymbolClaims(unittest.TestCase):
+
+    def test_claim_and_release(self):
+
+        claims = SymbolClaims()
+
+        self.assertTrue(claims.claim('AAA', 'fast'))
+        self.assertTrue(claims.claim('AAA', 'fast'))
+        self.assertFalse(claims.claim('AAA', 'slow'))
+
+        # Only the holder releases the symbol
+        claims.release('AAA', 'slow')
+        self.assertEqual(claims.owner('AAA'), 'fast')
+
+        claims.release('AAA', 'fast')
+        self.assertTrue(claims.claim('AAA', 'slow'))
+
+
+class TestDataPlane(unittest.TestCase):
+
+    @patch.object(Stock, 'fetch_data')
+    def test_bars_shared_by_strategies(self, mock_fetch_data):
+
+        mock_fetch_data.return_value = Mock()
+        originals = (Stock.bars_flight, Stock.fetch_pacer)
+        data_plane = DataPlane(cache_age=60)
+
+        fast = Strategy('fast', stoch_windows=(5, 3, 3)).registry.get('AAA')
+        slow = Strategy('slow').registry.get('AAA')
+
+        data_plane.install()
+
+        try:
+            fast.get_data('15Min', limit=0)
+            slow.get_data('15Min', limit=0)
+            slow.get_data('1Min')
+        finally:
+            data_plane.uninstall()
+
+        self.assertEqual(mock_fetch_data.call_count, 2)
+        self.assertIsNot(fast, slow)
+        self.assertEqual((Stock.bars_flight, Stock.fetch_pacer), originals)
+
+
+class TestStrategyHost(unittest.TestCase):
+
+    def setUp(self):
+
+        self.cwd = os.getcwd()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp_dir.name)
+
+        with open('open_positions.json', 'w') as f:
+            f.write('[]')
+
+        self.strategies = [Strategy('daily'),
+                           Strategy('fast', tactical_timeframe='15Min')]
+
+
+    def tearDown(self):
+
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+
+    def test_duplicate_names(self):
+
+        with self.assertRaises(ValueError):
+            StrategyHost([Strategy('fast'), Strategy('fast')])
+
+
+    @patch('scan_data.build_watchlist', return_value={'AAA', 'BBB'})
+    def test_initialize(self, mock_build_watchlist):
+
+        host = StrategyHost(self.strategies)
+        host.initialize()
+
+        daily, fast = [strategy.stocks for strategy in self.strategies]
+
+        self.assertEqual(mock_build_watchlist.call_count, 1)
+        self.assertEqual({stock.symbol for stock in fast['initial']}, {'AAA', 'BBB'})
+        self.assertEqual({stock.tactical_timeframe for stock in fast['initial']},
+                         {'15Min'})
+        self.assertIsNot(daily['registry'].get('AAA'), fast['registry'].get('AAA'))
+        self.assertEqual(fast['strategy'], 'fast')
+        self.assertIs(fast['claims'], daily['claims'])
+        self.assertTrue(os.path.exists('scan_journal-fast.jsonl'))
+
+
+    @patch('scan_data.build_watchlist', return_value={'AAA'})
+    def test_claimed_symbol_not_bought(self, mock_build_watchlist):
+
+        host = StrategyHost(self.strategies)
+        host.initialize()
+        daily, fast = [strategy.stocks for strategy in self.strategies]
+
+        stock = fast['registry'].get('AAA')
+
+        self.assertTrue(scan_data.claim(daily, daily['registry'].get('AAA')))
+        self.assertFalse(scan_data.claim(fast, stock))
+
+        scan_data.release(daily, daily['registry'].get('AAA'))
+        self.assertTrue(scan_data.claim(fast, stock))
+
+
+    def test_load_strategies(self):
+
+        with open('strategies.json', 'w') as f:
+            json.dump({'fast': {'tactical_timeframe': '15Min',
+                                'stoch_windows': [5, 3, 3]}}, f)
+
+        strategy, = load_strategies('strategies.json')
+        stock = strategy.registry.get('AAA')
+
+        self.assertEqual(strategy.name, 'fast')
+        self.assertEqual(stock.stoch_windows, (5, 3, 3))
+        self.assertEqual(stock.strategy, 'fast')
+
+
+if __name__ == '__main__':
+    unittest.main()
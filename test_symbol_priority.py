@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import Mock
+
+import logging
+
+from symbol_priority import PriorityScheduler
+
+logging.disable(logging.CRITICAL)
+
+class TestPriorityScheduler(unittest.TestCase):
+
+    def setUp(self):
+
+        self.near = Mock(symbol='NEAR')
+        self.far = Mock(symbol='FAR')
+        self.stocks = {self.near, self.far}
+        self.scheduler = PriorityScheduler(scale=0.1, max_skip=4)
+
+
+    def run_passes(self, passes):
+
+        scanned = []
+
+        for _ in range(passes):
+
+            due = self.scheduler.due(self.stocks)
+            scanned.append([stock.symbol for stock in due])
+
+            for stock in due:
+                distance = 0.005 if stock is self.near else 0.5
+                self.scheduler.reschedule(stock, distance)
+
+        return scanned
+
+    ### ------------------- SCHEDULING TESTS ------------------- ###
+
+    def test_new_stocks_due_immediately(self):
+
+        actual_result = self.scheduler.due(self.stocks)
+
+        self.assertEqual(set(actual_result), self.stocks)
+
+
+    def test_far_stocks_scanned_less_often(self):
+
+        actual_result = self.run_passes(6)
+
+        self.assertEqual([s.count('NEAR') for s in actual_result], [1] * 6)
+        self.assertEqual([s.count('FAR') for s in actual_result],
+                         [1, 0, 0, 0, 1, 0])
+
+
+    def test_closest_first(self):
+
+        self.run_passes(4)
+
+        actual_result = self.scheduler.due(self.stocks)
+
+        self.assertEqual([s.symbol for s in actual_result], ['NEAR', 'FAR'])
+
+
+    def test_removed_stocks_dropped(self):
+
+        self.run_passes(1)
+        self.stocks.discard(self.near)
+
+        actual_result = self.scheduler.due(self.stocks)
+
+        self.assertEqual(actual_result, [])
+        self.assertNotIn(self.near, self.scheduler.entries)
+
+
+    def test_unknown_distance_rescanned_next_pass(self):
+
+        self.scheduler.due(self.stocks)
+        self.scheduler.reschedule(self.near, None)
+        self.scheduler.skip(self.far)
+
+        actual_result = self.scheduler.due(self.stocks)
+
+        self.assertEqual(set(actual_result), self.stocks)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,66 +1,245 @@
-import schedule
+import sys
 import time
+import argparse
+import subprocess
+from datetime import timedelta
 from threading import Lock
 
 import scan_data as scan
 from alpaca import Alpaca
 from stock_data import Stock
 from scan_data import ScanThread
+from signal_sink import SignalSink
+from bar_ring import BarRing
+from ttf_logger import setup_logging
 
+# Number of threads evaluating stocks concurrently in each stage. Workers
+# of a stage share its request pacing, so they overlap API latency but do
+# not raise the request rate
+STAGE_WORKERS = {
+    'Trend': 4,
+    'Tactical': 2,
+    'Standby': 2,
+    'Execute': 2,
+    'Sell': 1,
+    }
 
-def main():
+
+def main(data=None):
     
-    loop_lock = Lock()
     thread_lock = Lock()
-    data = scan.initialize_data()
+
+    if data is None:
+        data = scan.initialize_data()
+
+    run_threads(stage_threads(data, thread_lock))
+
+
+def stage_threads(data, thread_lock, prefix=''):
+    """
+    Scan threads of the five stages over a stocks dictionary, sharing one
+    loop lock. Thread names are prefixed with prefix, e.g. the name of a
+    strategy when several run in one process (see strategy_host)
+    """
+
+    loop_lock = Lock()
 
     trend = ScanThread(scan.trend_scan,
-                        'Trend',
-                        (data, loop_lock, 900), thread_lock)
+                        prefix + 'Trend',
+                        (data, loop_lock, 900), thread_lock,
+                        STAGE_WORKERS['Trend'])
 
     tactical = ScanThread(scan.tactical_scan,
-                        'Tactical',
-                        (data, loop_lock, 300), thread_lock)
+                        prefix + 'Tactical',
+                        (data, loop_lock, 300), thread_lock,
+                        STAGE_WORKERS['Tactical'])
     
     execute = ScanThread(scan.execute_scan,
-                        'Execute',
-                        (data, loop_lock), thread_lock)
+                        prefix + 'Execute',
+                        (data, loop_lock), thread_lock,
+                        STAGE_WORKERS['Execute'])
     
     standby = ScanThread(scan.standby_scan,
-                        'Standby',
-                        (data, loop_lock), thread_lock)
+                        prefix + 'Standby',
+                        (data, loop_lock), thread_lock,
+                        STAGE_WORKERS['Standby'])
 
     sell = ScanThread(scan.sell_scan,
-                        'Sell',
-                        (data, loop_lock), thread_lock)
-                        
-    trend.start()
-    tactical.start()
-    standby.start()
-    execute.start()
-    sell.start()
-    
-    trend.join()
-    tactical.join()
-    standby.join()
-    execute.join()
-    sell.join()
+                        prefix + 'Sell',
+                        (data, loop_lock), thread_lock,
+                        STAGE_WORKERS['Sell'])
+
+    return [trend, tactical, standby, execute, sell]
+
+
+def run_threads(threads):
+    """
+    Start the scan threads and wait for the end of the session
+    """
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    if Stock.signal_sink is not None:
+        Stock.signal_sink.flush()
+
+
+def sleep_until(calendar, moment):
+
+    wait = (moment - calendar.now()).total_seconds()
+
+    if wait > 0:
+        time.sleep(wait)
+
+
+def run_sessions(calendar, lead_time=timedelta(minutes=3),
+                 warm_up_time=timedelta(minutes=30)):
+    """
+    Run main() a lead time before each market session, skipping weekends
+    and holidays according to the exchange calendar. The universe is built
+    and warmed up (history prefetched, trend verdicts computed) a warm-up
+    time before the session
+    """
+
+    while True:
+
+        data = None
+
+        if not calendar.is_open():
+
+            next_open = calendar.next_open()
+            sleep_until(calendar, next_open - warm_up_time)
+
+            data = scan.initialize_data()
+            scan.warm_up(data)
+
+            sleep_until(calendar, next_open - lead_time)
+
+        main(data)
+
 
+def import_profile(module='tripletimeframe_main', top=15):
+    """
+    Import the module in a fresh interpreter with -X importtime and return
+    a report of the total cold import time and of the slowest imports
+    (cumulative time, microseconds), heaviest first
+    """
 
+    result = subprocess.run([sys.executable, '-X', 'importtime',
+                             '-c', 'import ' + module],
+                            stderr=subprocess.PIPE, universal_newlines=True,
+                            check=True)
+
+    # 'import time: <self us> | <cumulative us> | <indented name>'
+    imports = []
+
+    for line in result.stderr.splitlines():
+
+        fields = line.split('|')
+
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+
+        name = fields[2].rstrip()
+        depth = len(name) - len(name.lstrip())
+        imports.append((int(fields[1]), name.strip(), depth))
+
+    # Top level imports are the least indented ones
+    top_depth = min(depth for _, _, depth in imports)
+    total = sum(cumulative for cumulative, _, depth in imports
+                if depth == top_depth)
+    slowest = sorted(imports, reverse=True)[:top]
+
+    lines = ['import {}: {:.1f} ms'.format(module, total / 1000)]
+    lines += ['{:>10.1f} ms  {}'.format(cumulative / 1000, name)
+              for cumulative, name, _ in slowest]
+
+    return '\n'.join(lines)
+
+
+def profile(args):
+    """
+    Profiling run mode (--profile): one dry run cycle of every stage over
+    the chosen data source, with a CPU and allocation report written to
+    the profile directory (see stage_profiler). Return the report path
+    """
+
+    import stage_profiler
+
+    positions = []
+
+    if args.source == 'fake':
+
+        count = len(args.symbols) if args.symbols else 100
+        fake, symbols = stage_profiler.fake_source(count)
+        positions = symbols[:3]
+
+    else:
+        symbols = args.symbols or Alpaca().get_watchlist_symbols()
+
+    stocks = stage_profiler.profile_data(symbols, positions=args.source == 'alpaca')
+    stage_profiler.open_positions(stocks, positions)
+
+    try:
+        profiles = stage_profiler.profile_stages(stocks, fill=args.profile_all)
+    finally:
+        if args.source == 'fake':
+            fake.stop()
+
+    return stage_profiler.write_report(profiles, args.profile_dir, args.top)
 
-schedule.every().monday.at("11:27").do(main)
-schedule.every().tuesday.at("11:27").do(main)
-schedule.every().wednesday.at("11:27").do(main)
-schedule.every().thursday.at("11:27").do(main)
-schedule.every().friday.at("11:27").do(main)
 
 DEBUG = True
 
 if __name__ == "__main__":
-    
-    if DEBUG:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--import-profile', action='store_true',
+                        help='report the cold import times and exit')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile one dry run cycle of every stage and exit')
+    parser.add_argument('--source', choices=('alpaca', 'fake'), default='alpaca',
+                        help='data source of the profile run')
+    parser.add_argument('--symbols', nargs='+',
+                        help='symbols of the profile run (default: watchlist, '
+                             'or 100 symbols with the fake source)')
+    parser.add_argument('--profile-all', action='store_true',
+                        help='profile every stage over all the symbols, '
+                             'whatever the signals')
+    parser.add_argument('--profile-dir', default='profile',
+                        help='directory of the profile report')
+    parser.add_argument('--top', type=int, default=15,
+                        help='functions and allocation sites per stage')
+    parser.add_argument('--strategies',
+                        help='JSON file of the strategies to run in one '
+                             'process over shared data (see strategy_host)')
+    args = parser.parse_args()
+
+    if args.import_profile:
+        print(import_profile())
+        sys.exit()
+
+    setup_logging()
+
+    if args.profile:
+        print(profile(args))
+        sys.exit()
+
+    Stock.signal_sink = SignalSink()
+    Stock.bar_ring = BarRing()
+
+    if args.strategies:
+
+        import strategy_host
+
+        host = strategy_host.StrategyHost(strategy_host.load_strategies(args.strategies))
+        host.initialize()
+        host.run()
+
+    elif DEBUG:
         main()
     else:
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+        run_sessions(scan.calendar)
@@ -1,10 +1,25 @@
+import os
 import logging
 import logging.config
 from logging import StreamHandler
 from logging.handlers import TimedRotatingFileHandler
 from functools import wraps
 
-logging.config.fileConfig('ttf_logging.conf')
+# Logging configuration shipped next to this module
+config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'ttf_logging.conf')
+
+
+def setup_logging(config=config_path, log_dir='.'):
+    """
+    Configure the loggers from the config file, writing the log files in
+    log_dir. Called by the entry point: importing the modules configures
+    nothing, so until this is called the loggers only report warnings and
+    errors to stderr (logging's last resort handler)
+    """
+
+    logging.config.fileConfig(config, defaults={'log_dir': log_dir})
+
 
 debug_logger = logging.getLogger('DEBUG_LOGGER')
 error_logger = logging.getLogger('ERROR_LOGGER')
@@ -3,7 +3,11 @@ from time import sleep
 from ttf_logger import debug_logger
 
 import requests
-from bs4 import BeautifulSoup
+
+from lazy_import import LazyModule
+
+# bs4 (and its lxml parser) load only when a watchlist is scraped
+bs4 = LazyModule('bs4')
 
 yahoo_home_url = 'https://finance.yahoo.com'
 
@@ -13,7 +17,7 @@ def get_yahoo_watchlist_urls(section_url):
     watchlist sections.
     """
     section_r = requests.get(section_url).text
-    section_soup = BeautifulSoup(section_r, 'lxml')
+    section_soup = bs4.BeautifulSoup(section_r, 'lxml')
     section_watchlists = section_soup.tbody.contents
 
     all_url_list = [row.find('a')['href'] for row in section_watchlists]
@@ -38,7 +42,7 @@ def get_all_yahoo_watchlist_symbols(url_list):
         
         watchlist_url = yahoo_home_url + url
         watchlist_r = requests.get(watchlist_url).text
-        watchlist_soup = BeautifulSoup(watchlist_r, 'lxml')
+        watchlist_soup = bs4.BeautifulSoup(watchlist_r, 'lxml')
         watchlist_table = watchlist_soup.find(class_='cwl-symbols').tbody.contents
 
         for row in watchlist_table: